@@ -0,0 +1,72 @@
+"""
+Import-time guard for the report entry point
+
+Runs `python -X importtime -c "import cloud_main"` in a fresh interpreter and
+fails if startup pulls in pandas or BeautifulSoup, or takes longer than the
+threshold. Run from the repository root:
+
+    python benchmarks/import_time.py            # default threshold
+    python benchmarks/import_time.py 0.5        # custom threshold in seconds
+"""
+
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the stages that need them
+HEAVY_MODULES = ['pandas', 'numpy', 'bs4', 'lxml', 'requests', 'dotenv']
+
+DEFAULT_THRESHOLD = 0.3  # seconds, cumulative for `import cloud_main`
+
+
+def measure_imports(module='cloud_main'):
+    """
+    Import `module` in a fresh interpreter
+    Returns {top-level module name: cumulative microseconds}
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        timings[name] = max(timings.get(name, 0), int(cumulative))
+    return timings
+
+
+def main():
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_THRESHOLD
+    timings = measure_imports('cloud_main')
+    total = timings.get('cloud_main', 0) / 1e6
+
+    print(f"import cloud_main: {total:.3f}s (threshold {threshold:.3f}s)")
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:10]
+    for name, micros in slowest:
+        print(f"   {micros / 1e6:7.3f}s  {name}")
+
+    failures = []
+    heavy = [name for name in HEAVY_MODULES if name in timings]
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if total > threshold:
+        failures.append(f"startup took {total:.3f}s, over the {threshold:.3f}s threshold")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+End-to-end load test for the report pipeline
+Replays synthetic postings (see synthetic_jobs.py) through the real
+generate_and_send_report flow, offline: scraping is replaced by the
+generator and mail goes to a local SMTP sink. Reports time, throughput and
+peak memory for each stage, and how long each stage-graph stage took. A
+stage the chosen options should run but that never ran fails the test, so
+a renamed or bypassed stage can't quietly drop out of the report. Every
+size runs in a fresh interpreter so memory numbers don't bleed between
+sizes. Run from the repository root:
+
+    python benchmarks/load_test.py                          # 1k, 100k and 1M postings
+    python benchmarks/load_test.py --sizes 1000,10000 --streaming
+    python benchmarks/load_test.py --frames --recipients 20 --no-memory
+    python benchmarks/load_test.py --sizes 1000 --sent-history --outbox
+    python benchmarks/load_test.py --sizes 1000 --plan-sources
+
+1M postings with memory tracking on needs a few GB of RAM unless --streaming is used.
+Link checking, the sent history, the outbox and the source planner are off
+unless asked for (--verify-links makes real HEAD requests to the synthetic
+links).
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Functions timed as stages: the module they're looked up in, and how to
+# count the items each one handles
+STAGES = {
+    'plan_sources': ('source_stats', lambda args, kwargs, size: len(args[0])),
+    'scrape_ai_jobs': ('report_pipeline', lambda args, kwargs, size: size),
+    'stream_top_jobs': ('report_pipeline', lambda args, kwargs, size: size),
+    'filter_top_jobs': ('report_pipeline', lambda args, kwargs, size: len(args[0])),
+    'rank_candidates': ('report_pipeline', lambda args, kwargs, size: len(args[0])),
+    'verify_links': ('report_pipeline', lambda args, kwargs, size: len(args[1])),
+    'save_data': ('report_pipeline', lambda args, kwargs, size: len(args[1])),
+    'create_html_email': ('report_pipeline', lambda args, kwargs, size: len(args[1])),
+    'create_plain_text_email': ('report_pipeline', lambda args, kwargs, size: len(args[1])),
+    'send_email': ('report_pipeline', lambda args, kwargs, size: 1),
+}
+
+
+def expected_stages(options, config):
+    """
+    The STAGES and stage-graph stages a run with these options goes through
+    (mirrors the branches in report_pipeline.run_report)
+    """
+    stages = {'create_html_email', 'create_plain_text_email', 'send_email'}
+    graph_stages = {'plan', 'html', 'text', 'smtp'}
+    if options.plan_sources:
+        stages.add('plan_sources')
+    if options.streaming:
+        stages.add('stream_top_jobs')
+    else:
+        stages.add('scrape_ai_jobs')
+        stages.add('rank_candidates' if options.verify_links or options.sent_history else 'filter_top_jobs')
+        if config.SAVE_DATA_TO_CSV:
+            stages.add('save_data')
+            graph_stages.add('csv')
+    if options.verify_links:
+        stages.add('verify_links')
+    if options.sent_history:
+        graph_stages.add('history')
+    return stages, graph_stages
+
+
+def _instrument(module, name, count_items, size, results, track_memory):
+    original = getattr(module, name)
+
+    def timed(*args, **kwargs):
+        if track_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stage = results.setdefault(name, {'calls': 0, 'seconds': 0.0, 'items': 0, 'peak_mb': None})
+            stage['calls'] += 1
+            stage['seconds'] += elapsed
+            stage['items'] += count_items(args, kwargs, size)
+            if track_memory:
+                peak = (tracemalloc.get_traced_memory()[1] - baseline) / 1024 / 1024
+                stage['peak_mb'] = max(stage['peak_mb'] or 0.0, peak)
+
+    setattr(module, name, timed)
+
+
+def _instrument_graph(module, graph_stages):
+    """Replace module.StageGraph with one that adds each stage's time to graph_stages"""
+
+    class TimedStageGraph(module.StageGraph):
+        def finish(self):
+            running = self.pool is not None
+            super().finish()
+            if running:
+                for name, seconds in self.timings.items():
+                    stage = graph_stages.setdefault(name, {'runs': 0, 'seconds': 0.0})
+                    stage['runs'] += 1
+                    stage['seconds'] += seconds
+
+    module.StageGraph = TimedStageGraph
+
+
+def run_single(options):
+    """Run one report over `options.single` postings and print the stage timings as JSON"""
+    workdir = tempfile.mkdtemp(prefix='job-load-test-')
+    sys.path.insert(0, REPO_ROOT)
+    sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+    from smtp_sink import SMTPSink
+    from synthetic_jobs import generate_postings
+
+    sink = SMTPSink().start()
+    os.environ.update({
+        'JOB_STATE_DIR': os.path.join(workdir, 'state'),
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(sink.port),
+        'SMTP_USE_SSL': 'false',
+        'SENDER_EMAIL': 'load-test@example.com',
+        'SENDER_PASSWORD': 'unused',
+        'RECIPIENT_EMAIL': 'recipient0@example.com',
+        'RECORD_MODE': 'false' if options.frames else 'true',
+        'STREAMING_MODE': 'true' if options.streaming else 'false',
+        'ENRICH_JOB_DETAILS': 'false',
+        # Link checks make real HEAD requests (1,000 postings: ~12s against ~0.1s without)
+        'VERIFY_LINKS': 'true' if options.verify_links else 'false',
+        'USE_SENT_HISTORY': 'true' if options.sent_history else 'false',
+        'USE_OUTBOX': 'true' if options.outbox else 'false',
+        'PLAN_SOURCES': 'true' if options.plan_sources else 'false',
+        'RUN_TIME_BUDGET': '86400',
+    })
+    os.chdir(workdir)
+
+    import cloud_main
+    import report_pipeline
+    import source_stats
+    from job_scraper import SOURCES
+    from records import dedupe_records, to_frame
+
+    config = cloud_main.config
+    config.RECIPIENT_EMAILS = [f"recipient{number}@example.com" for number in range(options.recipients)]
+    size = options.single
+
+    def postings():
+        return generate_postings(size, duplicate_rate=options.duplicate_rate,
+                                 description_chars=options.description_chars)
+
+    def replay_plan(kwargs):
+        # The scrapers plan the sources before fetching when given a SourceStats
+        if kwargs.get('source_stats') is None:
+            return
+        deadline = kwargs.get('deadline')
+        planned, notes = source_stats.plan_sources(SOURCES, kwargs['source_stats'],
+                                                   time_budget=deadline.remaining() if deadline else None)
+        if kwargs.get('source_plan') is not None:
+            kwargs['source_plan'].extend(notes)
+
+    def replay_scrape(**kwargs):
+        replay_plan(kwargs)
+        jobs = dedupe_records(postings(), subset=('title', 'company'))
+        return jobs if kwargs.get('as_records') else to_frame(jobs)
+
+    def replay_iter(**kwargs):
+        replay_plan(kwargs)
+        yield from postings()
+
+    report_pipeline.scrape_ai_jobs = replay_scrape
+    report_pipeline.iter_ai_jobs = replay_iter
+
+    expected, expected_graph = expected_stages(options, config)
+    stages = {}
+    for name in sorted(expected, key=list(STAGES).index):
+        module_name, count_items = STAGES[name]
+        _instrument(sys.modules[module_name], name, count_items, size, stages, options.memory)
+    graph_stages = {}
+    _instrument_graph(report_pipeline, graph_stages)
+
+    if options.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        cloud_main.generate_and_send_report()
+    total = time.perf_counter() - started
+
+    sink.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+    missing = sorted(expected - set(stages)) + [f"graph stage {name}" for name in sorted(expected_graph - set(graph_stages))]
+    if missing:
+        raise RuntimeError(f"Stages never ran: {', '.join(missing)}")
+    print(json.dumps({
+        'size': size,
+        'total_seconds': total,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'messages_received': sink.messages,
+        'stages': {name: stages[name] for name in STAGES if name in stages},
+        'graph_stages': graph_stages,
+    }))
+
+
+def print_report(result):
+    print(f"\n{result['size']:,} postings: {result['total_seconds']:.2f}s total, "
+          f"max RSS {result['max_rss_mb']:.0f} MB, {result['messages_received']} emails received")
+    print(f"   {'stage':<26}{'calls':>6}{'seconds':>10}{'items/s':>14}{'peak MB':>10}")
+    for name, stage in result['stages'].items():
+        rate = stage['items'] / stage['seconds'] if stage['seconds'] else float('inf')
+        peak = f"{stage['peak_mb']:.1f}" if stage['peak_mb'] is not None else '-'
+        print(f"   {name:<26}{stage['calls']:>6}{stage['seconds']:>10.3f}{rate:>14,.0f}{peak:>10}")
+    for name, stage in result['graph_stages'].items():
+        print(f"   {'graph: ' + name:<26}{stage['runs']:>6}{stage['seconds']:>10.3f}{'-':>14}{'-':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='comma-separated posting counts')
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--description-chars', type=int, default=300)
+    parser.add_argument('--recipients', type=int, default=3)
+    parser.add_argument('--streaming', action='store_true', help='run with STREAMING_MODE on')
+    parser.add_argument('--frames', action='store_true', help='use pandas DataFrames (RECORD_MODE off)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc (faster)')
+    parser.add_argument('--verify-links', action='store_true', help='check the top jobs\' links (needs network)')
+    parser.add_argument('--sent-history', action='store_true', help='run with USE_SENT_HISTORY on')
+    parser.add_argument('--outbox', action='store_true', help='send through the outbox (USE_OUTBOX on)')
+    parser.add_argument('--plan-sources', action='store_true', help='plan the sources (PLAN_SOURCES on)')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.single is not None:
+        run_single(options)
+        return 0
+
+    child_args = [
+        '--duplicate-rate', str(options.duplicate_rate),
+        '--description-chars', str(options.description_chars),
+        '--recipients', str(options.recipients),
+    ]
+    child_args += ['--streaming'] if options.streaming else []
+    child_args += ['--frames'] if options.frames else []
+    child_args += [] if options.memory else ['--no-memory']
+    child_args += ['--verify-links'] if options.verify_links else []
+    child_args += ['--sent-history'] if options.sent_history else []
+    child_args += ['--outbox'] if options.outbox else []
+    child_args += ['--plan-sources'] if options.plan_sources else []
+    for size in [int(size) for size in options.sizes.split(',')]:
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', str(size)] + child_args,
+                               capture_output=True, text=True)
+        if child.returncode != 0:
+            print(f"\n{size:,} postings: FAILED\n{child.stderr}")
+            return 1
+        print_report(json.loads(child.stdout.strip().splitlines()[-1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Micro-benchmarks for the data-stage hot paths
+Times filter_top_jobs, dedupe, title and location tagging, the Arbeitnow
+keyword filter, RemoteOK page parsing (whole-page and streaming) and the
+email builders at several input sizes and compares
+them with the baseline stored in benchmarks/baseline.json. Exits non-zero if
+any benchmark got slower than the threshold allows. Run from the repository root:
+
+    python benchmarks/micro.py                   # compare with the baseline
+    python benchmarks/micro.py --save            # record a new baseline
+    python benchmarks/micro.py -k filter         # only benchmarks whose name contains 'filter'
+
+Timings are stored relative to a fixed pure-Python calibration loop timed
+alongside each benchmark, so a baseline recorded on one machine is still
+meaningful on a faster or slower (or busier) one.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import timeit
+from contextlib import redirect_stdout
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from synthetic_jobs import generate_postings
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+DEFAULT_THRESHOLD = 1.5  # Fail if more than 1.5x slower than the baseline
+
+KEYWORDS = ['AI Engineer', 'Machine Learning', 'Data Scientist', 'ML Engineer']
+
+BENCHMARKS = []  # (name, size, setup); setup(size) returns the zero-argument callable to time
+
+
+def benchmark(name, sizes):
+    """Register a setup function to be timed at each size"""
+    def register(setup):
+        for size in sizes:
+            BENCHMARKS.append((name, size, setup))
+        return setup
+    return register
+
+
+def _records(size, duplicate_rate=0.1):
+    return list(generate_postings(size, duplicate_rate=duplicate_rate, description_chars=200))
+
+
+def _frame(records):
+    import pandas as pd
+    return pd.DataFrame(records)
+
+
+@benchmark('filter_top_jobs[records]', [100, 1000, 10000])
+def bench_filter_records(size):
+    from job_scraper import filter_top_jobs
+    jobs = _records(size)
+    return lambda: filter_top_jobs(jobs, keywords=KEYWORDS, top_n=5)
+
+
+@benchmark('filter_top_jobs[frame]', [100, 1000, 10000])
+def bench_filter_frame(size):
+    from job_scraper import filter_top_jobs
+    jobs = _frame(_records(size))
+    return lambda: filter_top_jobs(jobs, keywords=KEYWORDS, top_n=5)
+
+
+@benchmark('select_top_jobs[stream]', [100, 1000, 10000])
+def bench_select_stream(size):
+    from job_scraper import select_top_jobs
+    jobs = _records(size)
+    return lambda: select_top_jobs(iter(jobs), keywords=KEYWORDS, top_n=5)
+
+
+@benchmark('dedupe_records', [100, 1000, 10000])
+def bench_dedupe_records(size):
+    from records import dedupe_records
+    jobs = _records(size, duplicate_rate=0.3)
+    return lambda: dedupe_records(jobs, subset=('title', 'company'))
+
+
+@benchmark('drop_duplicates[frame]', [100, 1000, 10000])
+def bench_drop_duplicates(size):
+    jobs = _frame(_records(size, duplicate_rate=0.3))
+    return lambda: jobs.drop_duplicates(subset=['title', 'company'], keep='first')
+
+
+@benchmark('classify_jobs[records]', [100, 1000, 10000])
+def bench_classify_records(size):
+    from title_classifier import classify_jobs, classify_title
+    jobs = _records(size, duplicate_rate=0.3)
+
+    def run():
+        classify_title.cache_clear()
+        return classify_jobs(jobs)
+    return run
+
+
+@benchmark('classify_jobs[frame]', [100, 1000, 10000])
+def bench_classify_frame(size):
+    from title_classifier import classify_jobs, classify_title
+    jobs = _frame(_records(size, duplicate_rate=0.3))
+
+    def run():
+        classify_title.cache_clear()
+        return classify_jobs(jobs)
+    return run
+
+
+@benchmark('locate_jobs[records]', [100, 1000, 10000])
+def bench_locate_records(size):
+    from location_parser import locate_jobs, parse_location
+    jobs = _records(size)
+
+    def run():
+        parse_location.cache_clear()
+        return locate_jobs(jobs)
+    return run
+
+
+@benchmark('locate_jobs[frame]', [100, 1000, 10000])
+def bench_locate_frame(size):
+    from location_parser import locate_jobs, parse_location
+    jobs = _frame(_records(size))
+
+    def run():
+        parse_location.cache_clear()
+        return locate_jobs(jobs)
+    return run
+
+
+@benchmark('parse_arbeitnow_jobs', [100, 1000, 10000])
+def bench_arbeitnow_filter(size):
+    from job_scraper import parse_arbeitnow_jobs
+    content = json.dumps({'data': [
+        {
+            'title': job['title'],
+            'company_name': job['company'],
+            'location': job['location'],
+            'url': job['link'],
+            'description': job['description'],
+            'tags': ['python', 'remote'],
+        }
+        for job in generate_postings(size, description_chars=1500)
+    ]})
+    return lambda: parse_arbeitnow_jobs(content, max_jobs=size)
+
+
+def _remoteok_page(size):
+    from html import escape
+    return ('<html><body><table>' + ''.join(
+        f'<tr class="job" data-url="/remote-jobs/{n}"><td class="company_and_position">'
+        f'<h2 itemprop="title">{escape(job["title"])}</h2><h3 itemprop="name">{escape(job["company"])}</h3>'
+        f'<div class="description">{escape(job["description"])}</div></td></tr>'
+        for n, job in enumerate(generate_postings(size, description_chars=1500))
+    ) + '</table></body></html>').encode('utf-8')
+
+
+@benchmark('parse_remoteok_jobs', [100, 1000])
+def bench_remoteok_parse(size):
+    from job_scraper import parse_remoteok_jobs
+    content = _remoteok_page(size)
+    return lambda: parse_remoteok_jobs(content, max_jobs=size)
+
+
+@benchmark('stream_parse[remoteok]', [100, 1000])
+def bench_remoteok_stream_parse(size):
+    from job_scraper import STREAM_CHUNK_SIZE, SOURCES_BY_NAME, _parse_rows
+    from stream_parser import iter_rows
+    source = SOURCES_BY_NAME['RemoteOK']
+    content = _remoteok_page(size)
+    chunks = [content[start:start + STREAM_CHUNK_SIZE] for start in range(0, len(content), STREAM_CHUNK_SIZE)]
+    return lambda: _parse_rows(iter_rows(chunks, source['is_row']), source['row_parser'])
+
+
+@benchmark('create_html_email', [5, 50, 500])
+def bench_html_email(size):
+    from email_sender import create_html_email
+    jobs = _records(size)
+    return lambda: create_html_email(jobs, jobs, [('RemoteOK', 'time budget')])
+
+
+@benchmark('create_compact_html_email', [5, 50, 500])
+def bench_compact_email(size):
+    from email_sender import create_compact_html_email
+    jobs = _records(size)
+    return lambda: create_compact_html_email(jobs, jobs, [('RemoteOK', 'time budget')])
+
+
+@benchmark('create_plain_text_email', [5, 50, 500])
+def bench_text_email(size):
+    from email_sender import create_plain_text_email
+    jobs = _records(size)
+    return lambda: create_plain_text_email(jobs, jobs, [('RemoteOK', 'time budget')])
+
+
+def measure(function, repeat=5):
+    """Best-of-`repeat` seconds per call"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def calibrate():
+    """Seconds for a fixed mix of dict, string and loop work, used to normalise timings"""
+    def workload():
+        seen = {}
+        for number in range(20000):
+            key = f"job {number % 5000}"
+            seen[key] = seen.get(key, 0) + 1
+        return sorted(seen)
+    return measure(workload)
+
+
+def measure_relative(function):
+    """
+    (seconds per call, calibration seconds), calibrated right next to the
+    benchmark so a busy machine skews both alike
+    """
+    with redirect_stdout(io.StringIO()):
+        unit = calibrate()
+        seconds = measure(function)
+        unit = min(unit, calibrate())
+    return seconds, unit
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--save', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fail when slower than baseline by this factor')
+    parser.add_argument('-k', dest='pattern', default='', help='only run benchmarks whose name contains this')
+    options = parser.parse_args()
+
+    baseline = load_baseline()
+    results = dict(baseline.get('results', {})) if options.pattern else {}
+    regressions = []
+
+    print(f"{'benchmark':<28}{'size':>7}{'per call':>12}{'baseline':>12}{'ratio':>8}")
+    for name, size, setup in BENCHMARKS:
+        if options.pattern not in name:
+            continue
+        key = f"{name}/{size}"
+        try:
+            function = setup(size)
+        except ImportError as e:
+            print(f"{name:<28}{size:>7}  skipped ({e.name} not installed)")
+            continue
+        seconds, unit = measure_relative(function)
+        previous = baseline.get('results', {}).get(key)
+        if previous is not None and seconds / unit / previous > options.threshold:
+            # Measure once more before calling it a regression, to ride out noise
+            seconds, unit = min((seconds, unit), measure_relative(function), key=lambda pair: pair[0] / pair[1])
+        relative = seconds / unit
+        results[key] = relative
+
+        if previous is None:
+            print(f"{name:<28}{size:>7}{seconds * 1e6:>10.1f}us{'new':>12}")
+            continue
+        ratio = relative / previous
+        flag = ''
+        if ratio > options.threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{name:<28}{size:>7}{seconds * 1e6:>10.1f}us{previous * unit * 1e6:>10.1f}us{ratio:>7.2f}x{flag}")
+
+    if options.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'unit': 'multiples of the calibration loop', 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline saved to {os.path.relpath(BASELINE_FILE)}")
+        return 0
+
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} benchmark(s) more than {options.threshold}x slower than baseline: "
+              f"{', '.join(regressions)}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Local SMTP stand-in for load tests
+Accepts any login and every message, counts them and throws them away.
+Plain SMTP only, so point the app at it with SMTP_USE_SSL=false:
+
+    python benchmarks/smtp_sink.py 2525
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 SMTP_USE_SSL=false python cloud_main.py
+"""
+
+import socketserver
+import sys
+import threading
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost SMTP sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 104857600\r\n')
+            elif command.startswith('HELO'):
+                self.reply('250 localhost')
+            elif command.startswith('AUTH'):
+                self.reply('235 Authentication successful')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                with self.server.lock:
+                    self.server.messages += 1
+                    self.server.bytes_received += size
+                self.reply('250 OK: queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+if __name__ == "__main__":
+    sink = SMTPSink(port=int(sys.argv[1]) if len(sys.argv) > 1 else 2525)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port} (Ctrl+C to stop)")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nReceived {sink.messages} messages ({sink.bytes_received} bytes)")
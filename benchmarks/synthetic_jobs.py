@@ -0,0 +1,99 @@
+"""
+Synthetic job postings for load tests
+Generates postings shaped like the scrapers' output, in any quantity, with a
+configurable share of duplicates, skewed title and company distributions and
+description sizes. Postings are yielded one at a time, so a million of them
+need no more memory than the consumer keeps.
+"""
+
+import random
+from datetime import datetime
+from itertools import accumulate
+
+# (role, weight): roughly how often each shows up on the AI boards
+ROLES = [
+    ('Machine Learning Engineer', 18),
+    ('AI Engineer', 15),
+    ('Data Scientist', 14),
+    ('ML Engineer', 10),
+    ('Software Engineer, ML Platform', 8),
+    ('Research Scientist', 6),
+    ('NLP Engineer', 5),
+    ('Computer Vision Engineer', 4),
+    ('Data Engineer', 8),
+    ('Product Manager, AI', 4),
+    ('Backend Engineer', 5),
+    ('Solutions Architect', 3),
+]
+
+SENIORITY = [('', 40), ('Senior ', 30), ('Staff ', 10), ('Lead ', 8), ('Junior ', 7), ('Principal ', 5)]
+
+TEAMS = ['Search', 'Ads', 'Payments', 'Ranking', 'Platform', 'Growth', 'Safety', 'Infrastructure',
+         'Recommendations', 'Forecasting', 'Fraud', 'Speech', 'Vision', 'Agents', 'Evaluation']
+
+LOCATIONS = ['Remote', 'Remote', 'Remote', 'Berlin, Germany', 'London, UK', 'New York, NY',
+             'San Francisco, CA', 'Toronto, Canada', 'Amsterdam, Netherlands', 'Remote (EU)', 'Remote (US)']
+
+SOURCES = ['RemoteOK', 'WeWorkRemotely', 'Arbeitnow', 'Himalayas']
+
+WORDS = ('model data pipeline training inference team build ship production python pytorch '
+         'research customers scale evaluation experiments deploy monitoring features latency '
+         'collaborate design systems ownership impact remote benefits equity learning').split()
+
+
+def _description(rng, chars):
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:chars]
+
+
+def generate_postings(count, duplicate_rate=0.1, companies=2000, company_skew=1.1, description_chars=300,
+                      roles=None, seed=42):
+    """
+    Yield `count` job dicts
+
+    Args:
+        duplicate_rate: Share of postings that repeat the title and company of
+            a recent one (cross-posted to another board), 0 to 1
+        companies: Number of distinct companies
+        company_skew: Zipf exponent; higher means a few companies post most jobs
+        description_chars: Length of each description, 0 for none
+        roles: (role, weight) pairs to draw titles from, default ROLES
+        seed: Same seed, same postings
+    """
+    rng = random.Random(seed)
+    roles = roles or ROLES
+    role_names, role_weights = zip(*roles)
+    seniority_names, seniority_weights = zip(*SENIORITY)
+    company_cum_weights = list(accumulate(1 / (rank ** company_skew) for rank in range(1, companies + 1)))
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    recent = []  # Ring buffer of recent (title, company) pairs to duplicate from
+    for number in range(count):
+        if recent and rng.random() < duplicate_rate:
+            title, company = rng.choice(recent)
+        else:
+            role = rng.choices(role_names, role_weights)[0]
+            seniority = rng.choices(seniority_names, seniority_weights)[0]
+            title = f"{seniority}{role} - {rng.choice(TEAMS)} #{number}"
+            company = f"Company {rng.choices(range(companies), cum_weights=company_cum_weights)[0]:05d}"
+            if len(recent) < 1000:
+                recent.append((title, company))
+            else:
+                recent[number % 1000] = (title, company)
+
+        posting = {
+            'title': title,
+            'company': company,
+            'location': rng.choice(LOCATIONS),
+            'link': f"https://jobs.example.com/postings/{number}",
+            'scraped_date': today,
+            'source': rng.choice(SOURCES),
+        }
+        if description_chars:
+            posting['description'] = _description(rng, description_chars)
+        yield posting
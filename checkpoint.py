@@ -0,0 +1,159 @@
+"""
+On-disk checkpoints for a report run
+Each stage's output is saved under checkpoints/<run_id>/ so a crashed or
+interrupted run can be resumed without re-scraping or re-sending
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Present in a run's directory while it waits for a scheduled send to deliver it
+STAGED_MARKER = 'staged'
+
+
+def new_run_id():
+    """
+    Run ids sort by start time, e.g. 20260105-090000-3f9a1c; the random
+    suffix keeps runs started in the same second apart
+    """
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def latest_run_id(root):
+    """Most recent run id under root, or None"""
+    if not os.path.isdir(root):
+        return None
+    runs = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    return runs[-1] if runs else None
+
+
+def _staged_within(path, max_age):
+    """True if the run at `path` was staged for a later send less than max_age seconds ago"""
+    try:
+        return time.time() - os.path.getmtime(os.path.join(path, STAGED_MARKER)) < max_age
+    except OSError:
+        return False
+
+
+def prune_checkpoints(root, keep=5, staged_max_age=None):
+    """
+    Delete all but the `keep` most recent runs
+    Runs staged for a later send (see RunCheckpoint.mark_staged) in the last
+    staged_max_age seconds are left alone and don't count towards `keep`.
+    """
+    if not os.path.isdir(root):
+        return
+    runs = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    if staged_max_age:
+        runs = [run_id for run_id in runs if not _staged_within(os.path.join(root, run_id), staged_max_age)]
+    for run_id in runs[:-keep] if keep else runs:
+        shutil.rmtree(os.path.join(root, run_id), ignore_errors=True)
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.@-]', '_', name)
+
+
+class RunCheckpoint:
+    """
+    Checkpoint files for one run
+
+    - raw/<source>: raw listing page bytes as fetched
+    - parsed.json, ranked.json, rendered.json: stage outputs
+    - delivery.jsonl: one line per recipient the report was delivered to
+    - staged: present while a pre-warmed run waits for its send
+    """
+
+    def __init__(self, root, run_id=None):
+        self.run_id = run_id or new_run_id()
+        self.path = os.path.join(root, self.run_id)
+        os.makedirs(os.path.join(self.path, 'raw'), exist_ok=True)
+
+    def _stage_file(self, stage):
+        return os.path.join(self.path, f'{stage}.json')
+
+    def _write(self, path, data, mode='w'):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def has(self, stage):
+        return os.path.exists(self._stage_file(stage))
+
+    def age(self, stage):
+        """Seconds since a stage was saved, or None if it hasn't been"""
+        if not self.has(stage):
+            return None
+        return time.time() - os.path.getmtime(self._stage_file(stage))
+
+    def save(self, stage, data):
+        """Save a stage's output (anything JSON-serialisable)"""
+        self._write(self._stage_file(stage), json.dumps(data, default=str))
+
+    def load(self, stage):
+        with open(self._stage_file(stage), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_raw(self, source, content):
+        self._write(os.path.join(self.path, 'raw', _safe_name(source)), content, mode='wb')
+
+    @contextmanager
+    def raw_writer(self, source):
+        """
+        Binary file for saving a source's page chunk by chunk as it downloads;
+        it only counts as saved if the block exits without an error
+        """
+        path = os.path.join(self.path, 'raw', _safe_name(source))
+        with open(path + '.tmp', 'wb') as f:
+            yield f
+        os.replace(path + '.tmp', path)
+
+    def has_raw(self, source):
+        return os.path.exists(os.path.join(self.path, 'raw', _safe_name(source)))
+
+    def load_raw(self, source):
+        """Raw bytes fetched for a source in this run, or None"""
+        path = os.path.join(self.path, 'raw', _safe_name(source))
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def mark_staged(self):
+        """Flag this run as prepared for a later send, so other runs don't prune it"""
+        self._write(os.path.join(self.path, STAGED_MARKER), datetime.now().isoformat(timespec='seconds'))
+
+    def clear_staged(self):
+        try:
+            os.remove(os.path.join(self.path, STAGED_MARKER))
+        except FileNotFoundError:
+            pass
+
+    def mark_delivered(self, recipient):
+        """Record a successful send; appended and flushed so a crash can't lose it"""
+        record = {'recipient': recipient, 'sent_at': datetime.now().isoformat(timespec='seconds')}
+        with open(os.path.join(self.path, 'delivery.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def delivered(self):
+        """Recipients this run has already delivered to"""
+        path = os.path.join(self.path, 'delivery.jsonl')
+        if not os.path.exists(path):
+            return set()
+        recipients = set()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    recipients.add(json.loads(line)['recipient'])
+                except (ValueError, KeyError):
+                    continue  # Torn final line from a crash mid-write
+        return recipients
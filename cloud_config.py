@@ -6,11 +6,6 @@ SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
 SENDER_PASSWORD = os.environ.get('SENDER_PASSWORD')
 RECIPIENT_EMAIL = os.environ.get('RECIPIENT_EMAIL')
 
-# Validate that credentials are set
-if not SENDER_EMAIL or not SENDER_PASSWORD or not RECIPIENT_EMAIL:
-    print("Email credentials not set in environment variables!")
-    print("Please set: SENDER_EMAIL, SENDER_PASSWORD, RECIPIENT_EMAIL")
-
 # Can send to multiple recipients
 RECIPIENT_EMAILS = [
     RECIPIENT_EMAIL,
@@ -31,23 +26,180 @@ JOB_SEARCH_KEYWORDS = [
 
 TOP_N_JOBS = 5
 
+# Only consider these title levels / role families (empty = all); see title_classifier.py
+# Levels: intern, junior, mid, senior, lead, staff, principal, director
+# Families: mlops, research, data_science, product, mle, data_engineering, analytics, software, other
+SENIORITY_FILTER = []  # e.g. ['senior', 'staff']
+ROLE_FAMILY_FILTER = []  # e.g. ['mle', 'mlops', 'research']
+
+# Only consider jobs in these places (empty = anywhere); see location_parser.py.
+# Keys: 'countries' (ISO codes like 'US', 'DE'), 'regions' (north_america, latam,
+# europe, mea, apac), 'timezone_bands' (americas, emea, apac), 'remote_only'.
+# Jobs whose location doesn't say ("Remote", "Worldwide") pass country/region filters.
+LOCATION_FILTER = {}  # e.g. {'timezone_bands': ['emea'], 'remote_only': True}
+
 # Email Configuration
 EMAIL_SUBJECT = "Your Weekly AI Jobs Report"
 SEND_HTML_EMAIL = True
+# Compact HTML: styles inlined, whitespace stripped, and only as many jobs as
+# fit in EMAIL_MAX_KB (Gmail clips anything over ~102 KB). Raise TOP_N_JOBS to fill it.
+COMPACT_EMAIL = False
+EMAIL_MAX_KB = 90
+# Threads for the report stages that can overlap (CSV, HTML, text, SMTP login)
+STAGE_WORKERS = 4
 
 # Schedule Configuration
 SEND_DAY = 'monday'
 SEND_TIME = '09:00'
+SEND_TIMEZONE = None  # IANA name like 'Asia/Kolkata'; None uses the machine's local time
+
+# Multiple schedules (optional). Each is a cron expression with its own
+# timezone and recipients; when empty, SEND_DAY/SEND_TIME above is used.
+SCHEDULES = [
+    # {'name': 'india', 'cron': '30 9 * * mon', 'timezone': 'Asia/Kolkata', 'recipients': ['a@example.com']},
+    # {'name': 'us', 'cron': '0 9 * * mon', 'timezone': 'America/New_York', 'recipients': ['b@example.com']},
+    # A schedule may also set 'locations' (same keys as LOCATION_FILTER) to send its recipients
+    # only jobs there, e.g. 'locations': {'countries': ['IN'], 'timezone_bands': ['apac']}
+]
+SCHEDULER_WORKERS = 2  # Sends that may run at the same time (pre-warms get as many again)
+
+# Pre-warm: scrape and render this long before each send, so sending takes seconds.
+# A staged report older than PREWARM_MAX_AGE_MINUTES is rebuilt at send time.
+PREWARM_LEAD_MINUTES = 30  # 0 disables pre-warming
+PREWARM_MAX_AGE_MINUTES = 120
+PREWARM_WAIT_SECONDS = 300  # How long a send waits for a pre-warm still in progress
+
+# Daemon mode (python daemon.py): local trigger/status port, bound to 127.0.0.1 only
+DAEMON_PORT = int(os.environ.get('DAEMON_PORT', '8765'))
+# Shared secret POST /run must send in the X-Daemon-Token header; ad-hoc runs are refused without one
+DAEMON_TOKEN = os.environ.get('DAEMON_TOKEN', '')
 
 # Data Storage
 SAVE_DATA_TO_CSV = True
 CSV_FILENAME = 'jobs_data_{date}.csv'
 
+# Outgoing mail server (point at a local SMTP stand-in for load tests)
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '465'))
+SMTP_USE_SSL = os.environ.get('SMTP_USE_SSL', 'true').lower() == 'true'
+
+# Outbox: reports are queued in SQLite and sent at a rate the mail provider
+# accepts; anything not sent when a run ends goes out on the next run
+USE_OUTBOX = os.environ.get('USE_OUTBOX', 'false').lower() == 'true'
+SEND_RATE_PER_MINUTE = 20  # Per sender account
+SEND_BURST = 5
+DAILY_SEND_LIMIT = 400  # Gmail allows ~500/day for personal accounts; stay under it
+SEND_SPREAD_SECONDS = 0  # Spread a big send over this many seconds (0 sends as fast as the rate allows)
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BASE_SECONDS = 60  # Doubles after each failed attempt
+OUTBOX_LEASE_SECONDS = 300  # A message being sent is queued again if its sender hasn't finished by then
+
+# Local state (caches, history) kept between runs
+STATE_DIR = os.environ.get('JOB_STATE_DIR', '.job_state')
+
+# Detail-page enrichment (description, salary, location, posting date)
+ENRICH_JOB_DETAILS = os.environ.get('ENRICH_JOB_DETAILS', 'false').lower() == 'true'
+ENRICH_MAX_WORKERS = 8
+ENRICH_PER_HOST_LIMIT = 2  # Concurrent requests allowed per job board
+DETAIL_CACHE_FILE = os.path.join(STATE_DIR, 'detail_cache.json')
+
+# Parsed listing pages, keyed by a hash of the page body; unchanged pages skip parsing
+PARSE_CACHE_DIR = os.path.join(STATE_DIR, 'parse_cache')
+PARSE_CACHE_MAX_AGE_DAYS = 14
+PARSE_CACHE_MAX_MB = 20
+
+# Concurrent scraping: boards are fetched on FETCH_WORKERS threads and parsed
+# in PARSE_WORKERS processes (0 = fetch and parse one board at a time)
+FETCH_WORKERS = 4
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '0'))
+# Parse HTML listing pages as they download instead of after (the parse
+# cache is bypassed for those pages, since they're parsed before their hash is known)
+STREAM_PARSE = os.environ.get('STREAM_PARSE', 'false').lower() == 'true'
+
+# Distributed mode: each source page becomes a unit in a local SQLite queue
+# that SCRAPE_WORKERS processes (plus any started with `python work_queue.py
+# worker <file>`) lease, scrape and commit; expired leases are re-queued
+DISTRIBUTED_SCRAPE = os.environ.get('DISTRIBUTED_SCRAPE', 'false').lower() == 'true'
+SCRAPE_WORKERS = 2
+WORK_QUEUE_FILE = os.path.join(STATE_DIR, 'work_queue.sqlite')
+WORK_LEASE_SECONDS = 120
+
+# Streaming mode: jobs flow through dedupe, the CSV archive and top-N
+# selection one at a time, so memory doesn't grow with the number of jobs
+STREAMING_MODE = os.environ.get('STREAMING_MODE', 'false').lower() == 'true'
+ARCHIVE_BATCH_SIZE = 500  # Rows per CSV write
+
+# Check the top jobs' links before sending and replace dead postings with
+# the next-best ones (up to LINK_CHECK_BACKUPS of them)
+VERIFY_LINKS = os.environ.get('VERIFY_LINKS', 'false').lower() == 'true'
+LINK_CHECK_BACKUPS = 10
+LINK_CHECK_WORKERS = 16
+LINK_CHECK_PER_HOST = 4  # Concurrent checks allowed per job board
+LINK_CHECK_TIME_BUDGET = 20  # Seconds; unchecked links are assumed alive
+LINK_CACHE_FILE = os.path.join(STATE_DIR, 'link_cache.json')
+LINK_CACHE_TTL_HOURS = 12
+
+# Per-recipient sent history: jobs someone has already been sent are skipped
+# and the next-best ones (up to SENT_HISTORY_BACKUPS of them) take their place.
+# A Bloom filter in fixed-size slices keeps lookups cheap; beyond
+# SENT_HISTORY_MAX_FILTERS slices the oldest history is forgotten.
+USE_SENT_HISTORY = os.environ.get('USE_SENT_HISTORY', 'false').lower() == 'true'
+SENT_HISTORY_BACKUPS = 20
+SENT_HISTORY_FILE = os.path.join(STATE_DIR, 'sent_history.sqlite')
+SENT_HISTORY_CAPACITY = 1000000  # (recipient, job) pairs per filter slice (~1.8 MB each)
+SENT_HISTORY_ERROR_RATE = 0.001
+SENT_HISTORY_MAX_FILTERS = 4
+
+# Queued report emails (see USE_OUTBOX)
+OUTBOX_FILE = os.path.join(STATE_DIR, 'outbox.sqlite')
+
+# Page-structure fingerprints from the last `python debug_scraper.py`, for drift checks
+STRUCTURE_SNAPSHOT_FILE = os.path.join(STATE_DIR, 'structure_snapshot.json')
+
+# Per-source statistics (latency, rows, relevant rows, failures) from past runs;
+# with PLAN_SOURCES the most productive boards are scraped first and get more
+# of the row and time budget, and boards that keep coming back empty are tried less
+PLAN_SOURCES = os.environ.get('PLAN_SOURCES', 'false').lower() == 'true'
+SOURCE_STATS_FILE = os.path.join(STATE_DIR, 'source_stats.json')
+
+# Sources that keep failing are skipped; this file remembers them between runs
+CIRCUIT_STATE_FILE = os.path.join(STATE_DIR, 'circuit_state.json')
+
+# Per-run stage checkpoints, used by --resume after a failed run
+CHECKPOINT_DIR = os.path.join(STATE_DIR, 'checkpoints')
+CHECKPOINT_KEEP_RUNS = 5
+
+# One-file copy of STATE_DIR (minus checkpoints) for runners that start empty:
+# `python state_snapshot.py export` after a run, `import` before the next.
+# Caches are left out, oldest first, to keep it under STATE_SNAPSHOT_MAX_MB.
+STATE_SNAPSHOT_FILE = os.environ.get('JOB_STATE_SNAPSHOT', 'job_state.snapshot')
+STATE_SNAPSHOT_MAX_MB = 50
+
+# Overall time budget for one run (seconds), shared out between stages.
+# Time a stage doesn't use rolls over to the later ones.
+RUN_TIME_BUDGET = int(os.environ.get('RUN_TIME_BUDGET', '600'))
+STAGE_BUDGET_SHARES = {
+    'scrape': 0.5,
+    'enrich': 0.2,
+    'verify': 0.05,
+    'deliver': 0.25,
+}
+
 # Cloud-specific settings
 IS_CLOUD_DEPLOYMENT = os.environ.get('CLOUD_DEPLOYMENT', 'false').lower() == 'true'
 
-print("Cloud configuration loaded")
-if SENDER_EMAIL:
-    print(f"   Sender: {SENDER_EMAIL}")
-if RECIPIENT_EMAIL:
-    print(f"   Recipient: {RECIPIENT_EMAIL}")
\ No newline at end of file
+# Pure-Python record mode: jobs are lists of dicts and pandas is never imported
+RECORD_MODE = os.environ.get('RECORD_MODE', 'false').lower() == 'true'
+
+def print_summary():
+    """Print the loaded settings (called at run time, not import time)"""
+    # Validate that credentials are set
+    if not SENDER_EMAIL or not SENDER_PASSWORD or not RECIPIENT_EMAIL:
+        print("Email credentials not set in environment variables!")
+        print("Please set: SENDER_EMAIL, SENDER_PASSWORD, RECIPIENT_EMAIL")
+
+    print("Cloud configuration loaded")
+    if SENDER_EMAIL:
+        print(f"   Sender: {SENDER_EMAIL}")
+    if RECIPIENT_EMAIL:
+        print(f"   Recipient: {RECIPIENT_EMAIL}")
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Settings selection for the command-line tools
+config.py (with the local .env) is what a local run uses, so it's the
+default; cloud_config.py is picked with --cloud or CLOUD_DEPLOYMENT=true, as
+in the GitHub Actions workflow. Which file exists says nothing: both always do.
+"""
+
+import importlib
+import os
+import sys
+
+
+def load_config(argv=None):
+    """
+    The settings module to use: cloud_config with --cloud (taken out of
+    `argv`, default sys.argv) or CLOUD_DEPLOYMENT=true, else config
+    """
+    argv = sys.argv if argv is None else argv
+    cloud = os.environ.get('CLOUD_DEPLOYMENT', 'false').lower() == 'true'
+    if '--cloud' in argv:
+        argv.remove('--cloud')
+        cloud = True
+    return importlib.import_module('cloud_config' if cloud else 'config')
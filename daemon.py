@@ -0,0 +1,212 @@
+"""
+Long-running daemon for the Weekly Job Report Emailer
+
+Runs the configured schedules (see scheduler.py) in one process that keeps its
+HTTP session, SMTP connection, compiled matchers and caches warm between runs,
+and listens on localhost for on-demand reports and status queries:
+
+    curl http://127.0.0.1:8765/status
+    curl -X POST http://127.0.0.1:8765/run -H "X-Daemon-Token: $DAEMON_TOKEN" \
+         -H 'Content-Type: application/json' -d '{}'
+    curl -X POST http://127.0.0.1:8765/run -H "X-Daemon-Token: $DAEMON_TOKEN" \
+         -H 'Content-Type: application/json' -d '{"recipients": ["me@example.com"]}'
+
+POST /run needs DAEMON_TOKEN in the X-Daemon-Token header and a JSON body,
+so neither another local user nor a web page posting to localhost can start
+a send. Recipients can only be narrowed to addresses in RECIPIENT_EMAILS.
+"""
+
+import hmac
+import json
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from checkpoint import new_run_id
+from email_sender import SMTPConnectionPool
+from scheduler import build_scheduler, job
+import config
+
+
+class ReportDaemon:
+    """
+    Owns the warm resources and the scheduler, and runs ad-hoc reports
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.smtp_pool = SMTPConnectionPool(config.SMTP_HOST, config.SMTP_PORT, use_ssl=config.SMTP_USE_SSL)
+        self.scheduler = build_scheduler(smtp_pool=self.smtp_pool)
+        self.adhoc_lock = threading.Lock()
+        # Ad-hoc runs don't queue behind scheduled sends on the scheduler's pool
+        self.adhoc_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='adhoc')
+        self.runs = []  # Most recent first: {'run_id', 'trigger', 'started', 'finished', 'success'}
+
+    def _record(self, trigger, run_id, runner):
+        run = {'run_id': run_id, 'trigger': trigger, 'started': datetime.now().isoformat(timespec='seconds'),
+               'finished': None, 'success': None}
+        self.runs.insert(0, run)
+        del self.runs[20:]
+        try:
+            run['success'] = bool(runner())
+        finally:
+            run['finished'] = datetime.now().isoformat(timespec='seconds')
+
+    def trigger(self, recipients=None):
+        """
+        Start an ad-hoc report right away, on its own worker
+        `recipients` must already be checked against RECIPIENT_EMAILS
+        (see allowed_recipients). Returns the run id, or None if an ad-hoc
+        report is already running.
+        """
+        if not self.adhoc_lock.acquire(blocking=False):
+            return None
+        run_id = f"{new_run_id()}-adhoc"
+
+        def run():
+            try:
+                self._record('adhoc', run_id, lambda: job(
+                    recipients=recipients or config.RECIPIENT_EMAILS,
+                    schedule_name='adhoc',
+                    run_id=run_id,
+                    smtp_pool=self.smtp_pool
+                ))
+            finally:
+                self.adhoc_lock.release()
+
+        self.adhoc_pool.submit(run)
+        return run_id
+
+    def status(self):
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'adhoc_running': self.adhoc_lock.locked(),
+            'schedules': [
+                {
+                    'name': entry['name'],
+                    'cron': entry['cron'].expression,
+                    'next_fire': entry['next_fire'].isoformat(),
+                    'last_fired': entry['last_fired'].isoformat() if entry['last_fired'] else None,
+                    'running': entry['running'].locked(),
+                }
+                for entry in self.scheduler.entries
+            ],
+            'recent_runs': self.runs,
+        }
+
+    def stop(self):
+        self.scheduler.stop(wait=False)
+        self.adhoc_pool.shutdown(wait=False)
+        self.smtp_pool.close()
+
+
+def allowed_recipients(recipients):
+    """
+    The configured addresses among `recipients` (a list of strings), or
+    raises ValueError naming any that aren't configured
+    """
+    if not isinstance(recipients, list) or not all(isinstance(recipient, str) for recipient in recipients):
+        raise ValueError('recipients must be a list of email addresses')
+    configured = {recipient.strip().lower(): recipient for recipient in config.RECIPIENT_EMAILS}
+    unknown = [recipient for recipient in recipients if recipient.strip().lower() not in configured]
+    if unknown:
+        raise ValueError(f"not in RECIPIENT_EMAILS: {', '.join(unknown)}")
+    return [configured[recipient.strip().lower()] for recipient in recipients]
+
+
+def make_handler(daemon):
+    """Request handler class bound to a ReportDaemon"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/status':
+                self._reply(200, daemon.status())
+            else:
+                self._reply(404, {'error': 'unknown endpoint'})
+
+        def do_POST(self):
+            if self.path != '/run':
+                self._reply(404, {'error': 'unknown endpoint'})
+                return
+            token = self.headers.get('X-Daemon-Token') or ''
+            if not config.DAEMON_TOKEN or not hmac.compare_digest(token.encode('utf-8'),
+                                                                  config.DAEMON_TOKEN.encode('utf-8')):
+                self._reply(403, {'error': 'missing or wrong X-Daemon-Token (set DAEMON_TOKEN to enable POST /run)'})
+                return
+            content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if content_type != 'application/json':
+                self._reply(415, {'error': 'body must be application/json'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                options = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._reply(400, {'error': 'body must be JSON'})
+                return
+            if not isinstance(options, dict):
+                self._reply(400, {'error': 'body must be a JSON object'})
+                return
+            recipients = None
+            if options.get('recipients') is not None:
+                try:
+                    recipients = allowed_recipients(options['recipients'])
+                except ValueError as e:
+                    self._reply(400, {'error': str(e)})
+                    return
+            run_id = daemon.trigger(recipients=recipients)
+            if run_id is None:
+                self._reply(409, {'error': 'an ad-hoc report is already running'})
+            else:
+                self._reply(202, {'run_id': run_id})
+
+        def log_message(self, format, *args):
+            print(f"[daemon] {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def start_daemon(host='127.0.0.1', port=None):
+    """
+    Start the scheduler and the local trigger server, and block until stopped
+    """
+    port = port or config.DAEMON_PORT
+    print("=" * 60)
+    print("JOB REPORT DAEMON STARTED")
+    print("=" * 60)
+    daemon = ReportDaemon()
+    server = ThreadingHTTPServer((host, port), make_handler(daemon))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Listening on http://{host}:{port} (GET /status, POST /run)")
+    if not config.DAEMON_TOKEN:
+        print("DAEMON_TOKEN is not set: POST /run is disabled")
+    print("=" * 60)
+
+    def shutdown(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        daemon.scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        daemon.stop()
+        print("\n" + "=" * 60)
+        print("DAEMON STOPPED")
+        print("=" * 60)
+
+
+if __name__ == "__main__":
+    start_daemon(port=int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,76 @@
+"""
+Run-level time budget split across pipeline stages
+A Deadline is handed down to scrapers, enrichment and delivery so each stage
+stops starting work, and cuts off in-flight requests, when its budget runs out
+"""
+
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is attempted after its deadline has passed"""
+
+
+class Deadline:
+    """
+    A point in time that work must finish by
+    """
+
+    def __init__(self, seconds=None, expires_at=None):
+        if expires_at is None:
+            expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.expires_at = expires_at
+
+    def remaining(self):
+        """Seconds left, or None if there is no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, what='work'):
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline passed before {what}")
+
+    def cap(self, timeout, what='work'):
+        """
+        Shrink a timeout so it never outlives the deadline
+        Raises DeadlineExceeded rather than return a timeout of zero, which
+        requests and socket reject.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline passed before {what}")
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) for t in timeout)
+        return min(timeout, remaining) if timeout is not None else remaining
+
+
+class RunBudget:
+    """
+    Overall time budget for one report run, shared out between stages
+
+    `shares` maps stage names, in pipeline order, to their relative weight.
+    Each stage gets its share of whatever time is left when it starts, counted
+    against itself and the stages after it, so time that a fast or skipped
+    stage doesn't use rolls over to the later ones.
+    """
+
+    def __init__(self, total_seconds, shares):
+        self.run_deadline = Deadline(total_seconds)
+        self.shares = dict(shares)
+
+    def stage(self, name):
+        """Start a stage and return its Deadline"""
+        remaining = self.run_deadline.remaining()
+        if remaining is None or name not in self.shares:
+            return Deadline(expires_at=self.run_deadline.expires_at)
+        stages = list(self.shares)
+        later_shares = sum(self.shares[stage] for stage in stages[stages.index(name):])
+        if not later_shares:
+            return Deadline(expires_at=self.run_deadline.expires_at)
+        return Deadline(remaining * self.shares[name] / later_shares)
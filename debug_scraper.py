@@ -1,116 +1,389 @@
-import requests
-from bs4 import BeautifulSoup
+"""
+Structure profiler for the job boards
+Fetches every source's listing page (plus any extra URLs) concurrently,
+profiles each page's structure in a single pass over the tree and compares
+the result with the last snapshot, so a board that changed its markup shows
+up before the weekly run instead of as a run that finds zero jobs.
 
-def debug_website_structure(url):
+    python debug_scraper.py                         # all sources, diff against the snapshot
+    python debug_scraper.py https://ai-jobs.net/    # extra URLs too
+    python debug_scraper.py --save-html --verbose   # keep the pages, print full profiles
+    python debug_scraper.py --accept                # after fixing a parser, take the new structure as baseline
+
+Exits with status 1 if a source's job rows disappeared or shrank sharply.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limiter import polite_get
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Legacy "does it look like a job list" patterns: (tag, substring of a class or None for any)
+PATTERNS = [
+    ('div', 'job'),
+    ('article', None),
+    ('li', 'job'),
+    ('div', 'card'),
+    ('div', 'listing'),
+    ('a', 'job'),
+]
+
+JOB_CLASS_KEYWORDS = ('job', 'position', 'listing', 'card', 'item', 'post')
+
+# What each parser in job_scraper.py looks for; these going missing is drift
+ROW_SELECTORS = {
+    'RemoteOK': 'tr.job',
+    'WeWorkRemotely': 'li.feature',
+    'Himalayas': 'div[data-test=job-card]',
+}
+
+MIN_ROWS = 5  # Siblings with the same selector before they count as a list of rows
+DRIFT_RATIO = 0.5  # A watched selector losing more than half its matches is drift
+
+
+def _selectors(element):
+    """Selector keys an element is counted under: tag.class for each class, tag[data-test=...]"""
+    keys = [f"{element.name}.{cls}" for cls in element.get('class') or ()]
+    data_test = element.get('data-test')
+    if data_test:
+        keys.append(f"{element.name}[data-test={data_test}]")
+    return keys
+
+
+def profile_html(content):
     """
-    Debug helper to inspect the actual HTML structure of a website
+    Profile a page in one traversal of the parse tree
+
+    Counts tags, classes and selectors, finds repeated sibling selectors
+    that contain links (candidate job rows) and matches PATTERNS, all while
+    walking the tree once.
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    from bs4 import BeautifulSoup, Tag
+
+    soup = BeautifulSoup(content, 'html.parser')
+    tags = Counter()
+    classes = Counter()
+    selectors = Counter()
+    siblings = Counter()  # (parent id, selector) -> count
+    linked = Counter()  # selector -> elements containing a link
+    patterns = {pattern: [0, None] for pattern in PATTERNS}  # pattern -> [count, first element]
+
+    # Explicit stack of [element, child iterator, selector keys, contains a link]
+    stack = [[soup, iter(soup.contents), (), False]]
+    while stack:
+        frame = stack[-1]
+        child = next(frame[1], None)
+        if child is None:
+            stack.pop()
+            if frame[3]:
+                for key in frame[2]:
+                    linked[key] += 1
+                if stack:
+                    stack[-1][3] = True
+            continue
+        if not isinstance(child, Tag):
+            continue
+
+        tags[child.name] += 1
+        class_names = child.get('class') or ()
+        classes.update(class_names)
+        keys = _selectors(child)
+        for key in keys:
+            selectors[key] += 1
+            siblings[(id(frame[0]), key)] += 1
+        for pattern in PATTERNS:
+            tag, class_pattern = pattern
+            if child.name == tag and (class_pattern is None
+                                      or any(class_pattern in name.lower() for name in class_names)):
+                match = patterns[pattern]
+                match[0] += 1
+                if match[1] is None:
+                    match[1] = child
+        stack.append([child, iter(child.contents), keys, child.name == 'a' and child.has_attr('href')])
+
+    rows = {}
+    for (_, key), count in siblings.items():
+        rows[key] = max(rows.get(key, 0), count)
+    rows = {key: count for key, count in rows.items() if count >= MIN_ROWS and linked[key] >= count / 2}
+    return {
+        'soup': soup,
+        'tags': tags,
+        'classes': classes,
+        'selectors': selectors,
+        'rows': {key: [count, linked[key]] for key, count in rows.items()},
+        'patterns': patterns,
     }
-    
-    print(f"Fetching: {url}")
-    print("=" * 60)
-    
+
+
+def profile_json(content):
+    """Shape of a JSON API response: item count and the keys of the first item"""
+    data = json.loads(content)
+    items = data.get('data', data) if isinstance(data, dict) else data
+    items = items if isinstance(items, list) else []
+    first = items[0] if items and isinstance(items[0], dict) else {}
+    return {'items': len(items), 'keys': sorted(first)}
+
+
+def fingerprint(profile, watched=None):
+    """Compact, JSON-friendly summary of an HTML profile for the snapshot"""
+    job_classes = {name: count for name, count in profile['classes'].items()
+                   if any(keyword in name.lower() for keyword in JOB_CLASS_KEYWORDS)}
+    rows = dict(sorted(profile['rows'].items(), key=lambda item: -item[1][0])[:15])
+    structure = json.dumps([sorted(rows), sorted(job_classes)])
+    result = {
+        'digest': hashlib.sha1(structure.encode('utf-8')).hexdigest()[:12],
+        'tags': dict(profile['tags'].most_common(15)),
+        'classes': dict(sorted(job_classes.items(), key=lambda item: -item[1])[:40]),
+        'rows': rows,
+    }
+    if watched:
+        result['watched'] = {watched: profile['selectors'].get(watched, 0)}
+    return result
+
+
+def profile_page(name, url, headers=None, save_html=False):
+    """Fetch and fingerprint one page; failures are recorded in the fingerprint, not raised"""
+    started = time.time()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = polite_get(url, headers=headers or HEADERS, source=name, max_retries=1)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Save HTML to file for inspection
-        with open('debug_page.html', 'w', encoding='utf-8') as f:
-            f.write(soup.prettify())
-        print("HTML saved to 'debug_page.html'\n")
-        
-        # Find all common job-related elements
-        print("ANALYZING PAGE STRUCTURE:")
-        print("-" * 60)
-        
-        # Check for common patterns
-        patterns = [
-            ('div', 'job'),
-            ('article', None),
-            ('li', 'job'),
-            ('div', 'card'),
-            ('div', 'listing'),
-            ('a', 'job'),
-        ]
-        
-        for tag, class_pattern in patterns:
-            if class_pattern:
-                elements = soup.find_all(tag, class_=lambda x: x and class_pattern in x.lower() if x else False)
-            else:
-                elements = soup.find_all(tag)
-            
-            if elements and len(elements) > 0:
-                print(f"\nFound {len(elements)} <{tag}> elements" + (f" with '{class_pattern}' in class" if class_pattern else ""))
-                
-                # Show first element structure
-                first = elements[0]
-                print(f"   Classes: {first.get('class', 'No class')}")
-                print(f"   Sample text: {first.get_text(strip=True)[:100]}...")
-                
-                # Look for links
-                links = first.find_all('a')
-                if links:
-                    print(f"   Contains {len(links)} links")
-                    print(f"   First link: {links[0].get('href', 'No href')}")
-        
-        print("\n" + "=" * 60)
-        print("COMMON CLASS NAMES FOUND:")
-        print("-" * 60)
-        
-        # Find all unique class names
-        all_classes = set()
-        for element in soup.find_all(class_=True):
-            classes = element.get('class', [])
-            if isinstance(classes, list):
-                all_classes.update(classes)
-        
-        # Filter for job-related classes
-        job_related = [c for c in all_classes if any(keyword in c.lower() 
-                      for keyword in ['job', 'position', 'listing', 'card', 'item', 'post'])]
-        
-        for cls in sorted(job_related)[:20]:  # Show first 20
-            print(f"   .{cls}")
-        
-        if not job_related:
-            print("No obvious job-related classes found")
-            print("Showing all classes (first 30):")
-            for cls in sorted(all_classes)[:30]:
-                print(f"   .{cls}")
-        
     except Exception as e:
-        print(f"Error: {e}")
+        return {'name': name, 'url': url, 'error': str(e)}, None
+
+    content = response.content
+    result = {'name': name, 'url': url, 'status': response.status_code, 'bytes': len(content)}
+    profile = None
+    try:
+        if content.lstrip()[:1] in (b'{', b'['):
+            result['json'] = profile_json(content)
+        else:
+            profile = profile_html(content)
+            result.update(fingerprint(profile, ROW_SELECTORS.get(name)))
+            if save_html:
+                filename = f"debug_{''.join(c if c.isalnum() else '_' for c in name)}.html"
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(profile['soup'].prettify())
+                result['saved_to'] = filename
+    except Exception as e:
+        result['error'] = f"could not profile: {e}"
+    result['seconds'] = round(time.time() - started, 2)
+    return result, profile
+
+
+def profile_pages(targets, max_workers=8, save_html=False):
+    """Profile (name, url, headers) targets concurrently; returns [(fingerprint, profile)] in target order"""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda target: profile_page(*target, save_html=save_html), targets))
+
+
+def diff_fingerprints(previous, current):
+    """
+    Compare two fingerprints of the same page
+    Returns (drifted, [changes]); drifted means the job rows look broken
+    """
+    changes = []
+    drifted = False
+    if 'error' in current:
+        return 'error' not in previous, [f"fetch failed: {current['error']}"]
+    if 'error' in previous:
+        changes.append("fetching works again")
+
+    if 'json' in current or 'json' in previous:
+        old, new = previous.get('json', {}), current.get('json', {})
+        missing = sorted(set(old.get('keys', [])) - set(new.get('keys', [])))
+        if missing:
+            drifted = True
+            changes.append(f"item keys gone: {', '.join(missing)}")
+        added = sorted(set(new.get('keys', [])) - set(old.get('keys', [])))
+        if added:
+            changes.append(f"new item keys: {', '.join(added)}")
+        if old.get('items') and not new.get('items'):
+            drifted = True
+            changes.append("no items returned")
+        return drifted, changes
+
+    for selector, count in current.get('watched', {}).items():
+        before = previous.get('watched', {}).get(selector)
+        if count == 0 or (before and count < before * DRIFT_RATIO):
+            drifted = True
+            changes.append(f"{selector} matches {count} elements (was {before})")
+
+    old_rows, new_rows = previous.get('rows', {}), current.get('rows', {})
+    for selector, (count, _) in old_rows.items():
+        now = new_rows.get(selector, [0, 0])[0]
+        if now < count * DRIFT_RATIO:
+            changes.append(f"row candidate {selector}: {count} -> {now}")
+    for selector in new_rows.keys() - old_rows.keys():
+        changes.append(f"new row candidate {selector} ({new_rows[selector][0]})")
+
+    old_classes, new_classes = set(previous.get('classes', {})), set(current.get('classes', {}))
+    if old_classes - new_classes:
+        changes.append(f"job classes gone: {', '.join(sorted(old_classes - new_classes)[:10])}")
+    if new_classes - old_classes:
+        changes.append(f"new job classes: {', '.join(sorted(new_classes - old_classes)[:10])}")
+    return drifted, changes
+
+
+def load_snapshot(snapshot_file):
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return {}
+    try:
+        with open(snapshot_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('pages', {})
+    except Exception as e:
+        print(f"Could not read structure snapshot: {e}")
+        return {}
+
+
+def save_snapshot(pages, snapshot_file):
+    try:
+        os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+        tmp_file = snapshot_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'pages': pages}, f, indent=1)
+        os.replace(tmp_file, snapshot_file)
+    except Exception as e:
+        print(f"Could not save structure snapshot: {e}")
+
+
+def print_profile(profile):
+    """Detailed structure report for one page (the old interactive output)"""
+    print("ANALYZING PAGE STRUCTURE:")
+    print("-" * 60)
+    for (tag, class_pattern), (count, first) in profile['patterns'].items():
+        if not count:
+            continue
+        print(f"\nFound {count} <{tag}> elements" + (f" with '{class_pattern}' in class" if class_pattern else ""))
+        print(f"   Classes: {first.get('class', 'No class')}")
+        print(f"   Sample text: {first.get_text(strip=True)[:100]}...")
+        link = first.find('a') if first.name != 'a' else first
+        if link is not None:
+            print(f"   First link: {link.get('href', 'No href')}")
+
+    print("\nCANDIDATE JOB ROWS (repeated siblings containing links):")
+    print("-" * 60)
+    rows = sorted(profile['rows'].items(), key=lambda item: -item[1][0])
+    for selector, (count, linked) in rows[:15]:
+        print(f"   {selector:<50}{count:>5} rows, {linked} with links")
+    if not rows:
+        print("   None found")
+
+    print("\nCOMMON CLASS NAMES FOUND:")
+    print("-" * 60)
+    job_related = [name for name in profile['classes']
+                   if any(keyword in name.lower() for keyword in JOB_CLASS_KEYWORDS)]
+    for name in sorted(job_related)[:20]:
+        print(f"   .{name}")
+    if not job_related:
+        print("No obvious job-related classes found")
+        print("Showing all classes (first 30):")
+        for name in sorted(profile['classes'])[:30]:
+            print(f"   .{name}")
+
+
+def debug_website_structure(url):
+    """
+    Debug helper to inspect the actual HTML structure of a website
+    """
+    print(f"Fetching: {url}")
+    print("=" * 60)
+    result, profile = profile_page(url, url, save_html=True)
+    if 'error' in result:
+        print(f"Error: {result['error']}")
+        return result
+    if profile is None:
+        print(f"JSON response: {result['json']['items']} items, keys: {', '.join(result['json']['keys'])}")
+        return result
+    print(f"HTML saved to '{result['saved_to']}'\n")
+    print_profile(profile)
+    return result
+
+
+def check_sources(extra_urls=(), snapshot_file=None, max_workers=8, save_html=False, update=True,
+                  accept=False, verbose=False):
+    """
+    Profile every source (and extra URLs) and diff against the last snapshot
+    Drifted pages keep their old fingerprint in the snapshot until `accept`
+    is passed (once the parser has been fixed). Returns True if any page's
+    job rows drifted.
+    """
+    from job_scraper import SOURCES
+
+    targets = [(source['name'], source['url'], source['headers']) for source in SOURCES]
+    targets += [(url, url, HEADERS) for url in extra_urls]
+    previous = load_snapshot(snapshot_file)
+
+    started = time.time()
+    results = profile_pages(targets, max_workers=max_workers, save_html=save_html)
+    print(f"Profiled {len(results)} pages in {time.time() - started:.1f}s\n")
+
+    any_drift = False
+    pages = dict(previous)
+    for result, profile in results:
+        name = result['name']
+        if 'error' in result:
+            summary = f"ERROR {result['error']}"
+        elif 'json' in result:
+            summary = f"json, {result['json']['items']} items"
+        else:
+            top_rows = ', '.join(f"{key} x{count}" for key, (count, _) in list(result['rows'].items())[:2])
+            summary = f"{result['bytes'] // 1024} KB, {result['digest']}, rows: {top_rows or 'none'}"
+        print(f"{name:<16}{summary}")
+
+        old = previous.get(name)
+        drifted = False
+        if old is None:
+            print("   (no earlier snapshot)")
+        else:
+            drifted, changes = diff_fingerprints(old, result)
+            any_drift = any_drift or drifted
+            if drifted:
+                print("   DRIFT: the parser will probably find nothing")
+            for change in changes:
+                print(f"   {change}")
+            if not changes:
+                print("   unchanged")
+        if verbose and profile is not None:
+            print()
+            print_profile(profile)
+            print()
+        # Keep the last good fingerprint so a failed fetch or drift doesn't erase the baseline
+        if name not in pages or ('error' not in result and (accept or not drifted)):
+            pages[name] = result
+
+    if update and snapshot_file:
+        save_snapshot(pages, snapshot_file)
+        print(f"\nSnapshot saved to {snapshot_file}")
+    return any_drift
+
 
-# Test different job sites
 if __name__ == "__main__":
+    from config_loader import load_config
+    config = load_config()
+
+    parser = argparse.ArgumentParser(description="Profile the job boards' page structure and flag selector drift")
+    parser.add_argument('urls', nargs='*', help='extra URLs to profile alongside the sources')
+    parser.add_argument('--snapshot', default=config.STRUCTURE_SNAPSHOT_FILE, help='fingerprint file to diff against')
+    parser.add_argument('--no-update', dest='update', action='store_false', help="don't overwrite the snapshot")
+    parser.add_argument('--accept', action='store_true', help='take drifted pages as the new baseline')
+    parser.add_argument('--save-html', action='store_true', help='write each page to debug_<name>.html')
+    parser.add_argument('--verbose', action='store_true', help='print the full structure report for each page')
+    parser.add_argument('--workers', type=int, default=8)
+    options = parser.parse_args()
+
     print("JOB SITE STRUCTURE DEBUGGER")
     print("=" * 60)
-    
-    # List of sites to try
-    sites_to_test = [
-        "https://ai-jobs.net/",
-        "https://www.aimljobs.fyi/",
-        "https://aijobs.app/",
-    ]
-    
-    print("\nWhich site do you want to debug?")
-    for i, site in enumerate(sites_to_test, 1):
-        print(f"{i}. {site}")
-    print(f"{len(sites_to_test) + 1}. Enter custom URL")
-    
-    choice = input("\nEnter number (or press Enter for default): ").strip()
-    
-    if choice == '' or choice == '1':
-        url = sites_to_test[0]
-    elif choice.isdigit() and 1 <= int(choice) <= len(sites_to_test):
-        url = sites_to_test[int(choice) - 1]
-    elif choice == str(len(sites_to_test) + 1):
-        url = input("Enter URL: ").strip()
-    else:
-        url = sites_to_test[0]
-    
-    print()
-    debug_website_structure(url)
\ No newline at end of file
+    drift = check_sources(options.urls, snapshot_file=options.snapshot, max_workers=options.workers,
+                          save_html=options.save_html, update=options.update, accept=options.accept,
+                          verbose=options.verbose)
+    sys.exit(1 if drift else 0)
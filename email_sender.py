@@ -1,14 +1,32 @@
+import re
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.charset import Charset, QP
 from datetime import datetime
-import pandas as pd
+from functools import lru_cache
+from html import escape
+import threading
 
-def create_html_email(jobs_df, top_jobs_df):
+from records import iter_jobs
+
+def _optional_field(job, field):
+    """Return an optional job field (e.g. salary from enrichment) or '' if missing"""
+    value = job.get(field, '')
+    if value is None or value != value:  # None or NaN
+        return ''
+    return str(value).strip()
+
+def _describe_skipped(skipped_sources):
+    """One-line summary of sources missing from this report, e.g. 'RemoteOK (time budget)'"""
+    return ', '.join(f"{name} ({reason})" for name, reason in skipped_sources or [])
+
+def create_html_email(jobs_df, top_jobs_df, skipped_sources=None, total_jobs=None):
     """
     Create an HTML email body with job statistics and listings
+    Pass total_jobs (with jobs_df=None) when the full job list wasn't kept
     """
-    total_jobs = len(jobs_df)
+    total_jobs = len(jobs_df) if total_jobs is None else total_jobs
     top_jobs_count = len(top_jobs_df)
     current_date = datetime.now().strftime('%B %d, %Y')
     
@@ -85,19 +103,23 @@ def create_html_email(jobs_df, top_jobs_df):
                     <li><strong>Top AI/ML Positions:</strong> {top_jobs_count}</li>
                     <li><strong>Report Generated:</strong> {current_date}</li>
                 </ul>
+                {f'<p><em>Partial results - sources skipped this week: {_describe_skipped(skipped_sources)}</em></p>' if skipped_sources else ''}
             </div>
             
             <h2>Top AI Engineering Roles This Week</h2>
     """
     
     # Add job listings
-    if not top_jobs_df.empty:
-        for idx, job in top_jobs_df.iterrows():
+    if len(top_jobs_df) > 0:
+        for number, job in iter_jobs(top_jobs_df):
+            salary = _optional_field(job, 'salary')
+            salary_html = f'<div class="job-company">{salary}</div>' if salary else ''
             html += f"""
             <div class="job-card">
                 <div class="job-title">{job['title']}</div>
                 <div class="job-company">{job['company']}</div>
                 <div class="job-location">{job['location']}</div>
+                {salary_html}
                 <a href="{job['link']}" class="apply-btn">View Job</a>
             </div>
             """
@@ -114,11 +136,109 @@ def create_html_email(jobs_df, top_jobs_df):
     
     return html
 
-def create_plain_text_email(jobs_df, top_jobs_df):
+# Gmail clips HTML bodies over ~102 KB behind a "View entire message" link
+GMAIL_CLIP_BYTES = 102 * 1024
+
+# Compact mode: each class's CSS is written inline into the templates once,
+# since many clients drop <style> blocks
+COMPACT_STYLES = {
+    'body': 'margin:0;font-family:Arial,sans-serif;line-height:1.4;color:#333',
+    'header': 'background:#4CAF50;color:#fff;padding:12px;text-align:center',
+    'h1': 'margin:0;font-size:20px',
+    'stats': 'background:#f4f4f4;padding:8px 12px;margin:12px 0;border-radius:5px;font-size:13px',
+    'job-card': 'border:1px solid #ddd;padding:8px 12px;margin:6px 0;border-radius:5px',
+    'job-title': 'color:#2196F3;font-size:15px;font-weight:bold;text-decoration:none',
+    'job-meta': 'color:#666;font-size:13px',
+    'footer': 'text-align:center;padding:12px;color:#999;font-size:11px',
+}
+
+COMPACT_TEMPLATES = {
+    'head': """
+        <html><body class="body">
+            <div class="header"><h1 class="h1">Weekly AI Jobs Report</h1>{date}</div>
+            <div class="stats">
+                <b>{total_jobs}</b> jobs scraped, top <b>{top_jobs_count}</b> below{skipped}
+            </div>
+    """,
+    'card': """
+            <div class="job-card">
+                <a href="{link}" class="job-title">{title}</a>
+                <div class="job-meta">{meta}</div>
+            </div>
+    """,
+    'more': """
+            <p class="job-meta">{count} more jobs didn't fit in this email.</p>
+    """,
+    'empty': """
+            <p>No jobs found matching the criteria this week.</p>
+    """,
+    'foot': """
+            <div class="footer">Automated weekly report from your AI Job Tracker.</div>
+        </body></html>
+    """,
+}
+
+def _minify_template(template):
+    """Drop line breaks with their indentation and collapse any other runs of whitespace"""
+    template = re.sub(r'\s*\n\s*', '', template)
+    return re.sub(r'\s{2,}', ' ', template)
+
+@lru_cache(maxsize=1)
+def compile_compact_templates():
+    """COMPACT_TEMPLATES with styles inlined and whitespace stripped, built once"""
+    def inline(match):
+        return f'style="{COMPACT_STYLES[match.group(1)]}"'
+    return {name: _minify_template(re.sub(r'class="([\w-]+)"', inline, template))
+            for name, template in COMPACT_TEMPLATES.items()}
+
+def create_compact_html_email(jobs_df, top_jobs_df, skipped_sources=None, total_jobs=None,
+                              max_bytes=90 * 1024):
+    """
+    Create a small HTML email body: inline styles, no whitespace, one line per job
+
+    Job cards are added in rank order for as long as the body stays under
+    max_bytes (keep it below GMAIL_CLIP_BYTES); the rest are counted in a
+    closing note instead. Pass total_jobs (with jobs_df=None) when the full
+    job list wasn't kept.
+    """
+    templates = compile_compact_templates()
+    total_jobs = len(jobs_df) if total_jobs is None else total_jobs
+    skipped = f"<br><i>Partial results, skipped: {escape(_describe_skipped(skipped_sources))}</i>" \
+        if skipped_sources else ''
+    head = templates['head'].format(date=datetime.now().strftime('%B %d, %Y'), total_jobs=total_jobs,
+                                    top_jobs_count=len(top_jobs_df), skipped=skipped)
+    foot = templates['foot']
+    # Room for the "N more jobs" note, whatever N is
+    used = len(head.encode('utf-8')) + len(foot.encode('utf-8')) + len(templates['more'].format(count=10 ** 6))
+
+    parts = [head]
+    shown = 0
+    for _, job in iter_jobs(top_jobs_df):
+        meta = ' · '.join(escape(value) for value in (
+            str(job['company']), str(job['location']), _optional_field(job, 'salary')) if value)
+        card = templates['card'].format(link=escape(str(job['link']), quote=True), title=escape(str(job['title'])),
+                                        meta=meta)
+        size = len(card.encode('utf-8'))
+        if used + size > max_bytes:
+            break
+        parts.append(card)
+        used += size
+        shown += 1
+
+    if len(top_jobs_df) == 0:
+        parts.append(templates['empty'])
+    elif shown < len(top_jobs_df):
+        parts.append(templates['more'].format(count=len(top_jobs_df) - shown))
+        print(f"Compact email: {shown} of {len(top_jobs_df)} jobs fit in {max_bytes // 1024} KB")
+    parts.append(foot)
+    return ''.join(parts)
+
+def create_plain_text_email(jobs_df, top_jobs_df, skipped_sources=None, total_jobs=None):
     """
     Create a plain text email body
+    Pass total_jobs (with jobs_df=None) when the full job list wasn't kept
     """
-    total_jobs = len(jobs_df)
+    total_jobs = len(jobs_df) if total_jobs is None else total_jobs
     top_jobs_count = len(top_jobs_df)
     current_date = datetime.now().strftime('%B %d, %Y')
     
@@ -131,17 +251,20 @@ def create_plain_text_email(jobs_df, top_jobs_df):
     THIS WEEK'S STATISTICS:
     - Total Jobs Scraped: {total_jobs}
     - Top AI/ML Positions: {top_jobs_count}
+    {f"- Partial results, sources skipped: {_describe_skipped(skipped_sources)}" if skipped_sources else ''}
     
     TOP AI ENGINEERING ROLES THIS WEEK:
     
     """
     
-    if not top_jobs_df.empty:
-        for idx, job in top_jobs_df.iterrows():
+    if len(top_jobs_df) > 0:
+        for number, job in iter_jobs(top_jobs_df):
+            salary = _optional_field(job, 'salary')
+            salary_line = f"\n       Salary: {salary}" if salary else ''
             text += f"""
-    {idx + 1}. {job['title']}
+    {number}. {job['title']}
        Company: {job['company']}
-       Location: {job['location']}
+       Location: {job['location']}{salary_line}
        Apply: {job['link']}
     
     """
@@ -154,7 +277,79 @@ def create_plain_text_email(jobs_df, top_jobs_df):
     """
     return text
 
-def send_email(sender_email, sender_password, recipient_email, subject, html_body, text_body):
+class SMTPConnectionPool:
+    """
+    Keeps a logged-in SMTP connection per sender and reuses it while it's alive
+
+    Sending to several recipients (or, in the daemon, across several runs)
+    then pays for the TLS handshake and login once instead of per message.
+    """
+
+    def __init__(self, host='smtp.gmail.com', port=465, use_ssl=True):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def get(self, sender_email, sender_password, timeout=30):
+        """Return a logged-in connection, reconnecting if the old one went stale"""
+        server = self.connections.get(sender_email)
+        if server is not None and self._alive(server):
+            server.sock.settimeout(timeout)
+            return server
+        self.discard(sender_email)
+        server = _connect(self.host, self.port, self.use_ssl, timeout)
+        print("Logging in...")
+        server.login(sender_email, sender_password)
+        self.connections[sender_email] = server
+        return server
+
+    def connect(self, sender_email, sender_password, timeout=30):
+        """Log in ahead of the first send, e.g. while the report is still being rendered"""
+        with self.lock:
+            self.get(sender_email, sender_password, timeout)
+
+    def discard(self, sender_email):
+        server = self.connections.pop(sender_email, None)
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def close(self):
+        for sender_email in list(self.connections):
+            self.discard(sender_email)
+
+def _connect(host, port, use_ssl, timeout):
+    """Open an SMTP connection: implicit TLS (Gmail's port 465) or plain SMTP"""
+    print(f"Connecting to SMTP server {host}:{port}...")
+    if use_ssl:
+        return smtplib.SMTP_SSL(host, port, timeout=timeout)
+    return smtplib.SMTP(host, port, timeout=timeout)
+
+def _text_charset(body):
+    """us-ascii when it fits; otherwise UTF-8 as quoted-printable, which stays
+    close to the text's own size where base64 (the default) adds a third"""
+    if body.isascii():
+        return 'us-ascii'
+    charset = Charset('utf-8')
+    charset.body_encoding = QP
+    return charset
+
+def message_size(message):
+    """Bytes a MIME message takes on the wire, with its encoding and headers"""
+    return len(message.as_bytes())
+
+def send_email(sender_email, sender_password, recipient_email, subject, html_body, text_body, timeout=30,
+               pool=None, smtp_host='smtp.gmail.com', smtp_port=465, use_ssl=True, raise_errors=False):
     """
     Send email via Gmail SMTP
     
@@ -165,6 +360,10 @@ def send_email(sender_email, sender_password, recipient_email, subject, html_bod
         subject: Email subject
         html_body: HTML version of email
         text_body: Plain text version of email
+        timeout: Seconds to wait on the SMTP server before giving up
+        pool: Optional SMTPConnectionPool to reuse a connection across sends
+        smtp_host, smtp_port, use_ssl: Server to send through when no pool is given
+        raise_errors: Raise the SMTP error instead of printing it and returning False
     """
     try:
         # Create message
@@ -174,29 +373,47 @@ def send_email(sender_email, sender_password, recipient_email, subject, html_bod
         message['To'] = recipient_email
         
         # Attach both plain text and HTML versions
-        part1 = MIMEText(text_body, 'plain')
-        part2 = MIMEText(html_body, 'html')
+        part1 = MIMEText(text_body, 'plain', _text_charset(text_body))
+        part2 = MIMEText(html_body, 'html', _text_charset(html_body))
         
         message.attach(part1)
         message.attach(part2)
+        size = message_size(message)
+        if size > GMAIL_CLIP_BYTES:
+            print(f"Warning: email to {recipient_email} is {size / 1024:.1f} KB, Gmail will clip it")
+        
+        if pool is not None:
+            with pool.lock:
+                try:
+                    server = pool.get(sender_email, sender_password, timeout)
+                    print("Sending email...")
+                    server.send_message(message)
+                except Exception:
+                    pool.discard(sender_email)
+                    raise
+            print(f"Email sent successfully to {recipient_email} ({size / 1024:.1f} KB)")
+            return True
         
         # Connect to Gmail SMTP server
-        print("Connecting to Gmail SMTP server...")
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
+        with _connect(smtp_host, smtp_port, use_ssl, timeout) as server:
             print("Logging in...")
             server.login(sender_email, sender_password)
             print("Sending email...")
             server.send_message(message)
-            print(f"Email sent successfully to {recipient_email}")
+            print(f"Email sent successfully to {recipient_email} ({size / 1024:.1f} KB)")
             
         return True
         
     except Exception as e:
         print(f"Error sending email: {e}")
+        if raise_errors:
+            raise
         return False
 
 # Test function
 if __name__ == "__main__":
+    import pandas as pd
+
     # Sample data for testing
     sample_jobs = pd.DataFrame({
         'title': ['AI Engineer', 'ML Engineer', 'Data Scientist'],
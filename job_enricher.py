@@ -0,0 +1,305 @@
+"""
+Detail-page enrichment for scraped job listings
+Fetches each job's detail page and extracts description, salary, location and posting date
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+from rate_limiter import polite_get
+from records import is_frame, like, to_records
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+ENRICHED_FIELDS = ['description', 'salary', 'location', 'posted_date']
+
+# Locations the list-page scrapers fill in when they don't know better
+PLACEHOLDER_LOCATIONS = {'', 'remote', 'n/a'}
+
+MAX_DESCRIPTION_CHARS = 1000
+
+SALARY_PATTERN = re.compile(
+    r'(?:[$€£]\s?\d[\d,.]*\s?[kK]?(?:\s?(?:-|–|to)\s?[$€£]?\s?\d[\d,.]*\s?[kK]?)?)'
+    r'(?:\s?(?:per|/)\s?(?:year|yr|annum|month|hour|hr))?'
+)
+
+_STOP = object()
+
+# cache_file -> (mtime, cache) so a long-running process doesn't re-read the file every run
+_loaded_caches = {}
+
+
+def load_detail_cache(cache_file):
+    """Load the URL -> extracted details cache from disk"""
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    mtime = os.path.getmtime(cache_file)
+    if cache_file in _loaded_caches and _loaded_caches[cache_file][0] == mtime:
+        return _loaded_caches[cache_file][1]
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        _loaded_caches[cache_file] = (mtime, cache)
+        return cache
+    except Exception as e:
+        print(f"Could not read detail cache: {e}")
+        return {}
+
+
+def save_detail_cache(cache, cache_file, max_entries=5000):
+    """Persist the detail cache, keeping only the most recently fetched entries"""
+    if not cache_file:
+        return
+    if len(cache) > max_entries:
+        newest = sorted(cache.items(), key=lambda item: item[1].get('fetched_at', ''), reverse=True)
+        cache = dict(newest[:max_entries])
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+        _loaded_caches[cache_file] = (os.path.getmtime(cache_file), cache)
+    except Exception as e:
+        print(f"Could not save detail cache: {e}")
+
+
+def _clean_text(html_or_text):
+    """Strip tags and collapse whitespace"""
+    from bs4 import BeautifulSoup
+
+    if not html_or_text:
+        return ''
+    text = BeautifulSoup(str(html_or_text), 'html.parser').get_text(' ', strip=True)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _find_job_posting(node):
+    """Return the first JSON-LD object with @type JobPosting"""
+    if isinstance(node, list):
+        for item in node:
+            found = _find_job_posting(item)
+            if found:
+                return found
+    elif isinstance(node, dict):
+        node_type = node.get('@type')
+        if node_type == 'JobPosting' or (isinstance(node_type, list) and 'JobPosting' in node_type):
+            return node
+        if '@graph' in node:
+            return _find_job_posting(node['@graph'])
+    return None
+
+
+def _format_salary(base_salary):
+    """Turn a schema.org MonetaryAmount into a short display string"""
+    if not isinstance(base_salary, dict):
+        return str(base_salary) if base_salary else ''
+    currency = base_salary.get('currency', '')
+    value = base_salary.get('value', {})
+    if isinstance(value, dict):
+        low = value.get('minValue') or value.get('value')
+        high = value.get('maxValue')
+        unit = value.get('unitText', '')
+    else:
+        low, high, unit = value, None, ''
+    if not low:
+        return ''
+    amount = f"{low}-{high}" if high and high != low else f"{low}"
+    return ' '.join(part for part in [currency, amount, f"per {unit.lower()}" if unit else ''] if part)
+
+
+def _format_location(posting):
+    """Build a location string from a JobPosting"""
+    places = posting.get('jobLocation') or []
+    if isinstance(places, dict):
+        places = [places]
+    names = []
+    for place in places:
+        address = place.get('address', {}) if isinstance(place, dict) else {}
+        if isinstance(address, dict):
+            parts = [address.get('addressLocality'), address.get('addressRegion'), address.get('addressCountry')]
+            parts = [p.get('name') if isinstance(p, dict) else p for p in parts]
+            name = ', '.join(p for p in parts if p)
+            if name:
+                names.append(name)
+    if names:
+        return '; '.join(names)
+
+    requirements = posting.get('applicantLocationRequirements') or []
+    if isinstance(requirements, dict):
+        requirements = [requirements]
+    names = [r.get('name') for r in requirements if isinstance(r, dict) and r.get('name')]
+    if names:
+        return 'Remote (' + ', '.join(names) + ')'
+    if posting.get('jobLocationType') == 'TELECOMMUTE':
+        return 'Remote'
+    return ''
+
+
+def extract_job_details(content):
+    """
+    Extract description, salary, location and posting date from a detail page
+
+    Structured JobPosting data (JSON-LD) is used when the page has it,
+    otherwise falls back to meta tags and text heuristics.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    details = {'description': '', 'salary': '', 'location': '', 'posted_date': ''}
+
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            posting = _find_job_posting(json.loads(script.string or ''))
+        except (ValueError, TypeError):
+            continue
+        if posting:
+            details['description'] = _clean_text(posting.get('description', ''))
+            details['salary'] = _format_salary(posting.get('baseSalary'))
+            details['location'] = _format_location(posting)
+            details['posted_date'] = str(posting.get('datePosted', ''))[:10]
+            break
+
+    if not details['description']:
+        meta = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', property='og:description')
+        if meta and meta.get('content'):
+            details['description'] = _clean_text(meta['content'])
+
+    if not details['salary']:
+        match = SALARY_PATTERN.search(soup.get_text(' ', strip=True))
+        if match:
+            details['salary'] = match.group(0).strip()
+
+    if not details['posted_date']:
+        time_elem = soup.find('time', datetime=True)
+        if time_elem:
+            details['posted_date'] = time_elem['datetime'][:10]
+
+    details['description'] = details['description'][:MAX_DESCRIPTION_CHARS]
+    return details
+
+
+def fetch_job_details(url, timeout=10, session=None, deadline=None):
+    """Fetch a single detail page and extract its fields"""
+    response = polite_get(url, headers=HEADERS, timeout=timeout, session=session, max_retries=1,
+                          deadline=deadline)
+    response.raise_for_status()
+    return extract_job_details(response.content)
+
+
+def _interleave_by_host(urls):
+    """Order URLs round-robin across hosts so one host never hogs the queue"""
+    by_host = defaultdict(deque)
+    for url in urls:
+        by_host[urlparse(url).netloc].append(url)
+    ordered = []
+    while by_host:
+        for host in list(by_host):
+            ordered.append(by_host[host].popleft())
+            if not by_host[host]:
+                del by_host[host]
+    return ordered
+
+
+def enrich_jobs(jobs_df, max_workers=8, per_host_limit=2, timeout=10, cache_file=None, queue_size=None,
+                deadline=None):
+    """
+    Enrich job listings with details from each job's own page
+
+    A producer feeds uncached links into a bounded queue that a fixed pool of
+    workers drains. Each host allows at most per_host_limit requests in flight,
+    and a slow page only ever holds one worker for at most `timeout` seconds.
+    Results are cached by URL so a posting is fetched once over its lifetime.
+    When `deadline` passes, in-flight fetches are abandoned and jobs that
+    weren't reached keep their list-page fields.
+    """
+    rows = to_records(jobs_df)
+    if not rows or not any('link' in row for row in rows):
+        return jobs_df
+
+    print("Enriching job listings from detail pages...")
+    cache = load_detail_cache(cache_file)
+
+    links = list(dict.fromkeys(row.get('link') for row in rows
+                               if isinstance(row.get('link'), str) and row['link'].startswith('http')))
+    pending = _interleave_by_host([link for link in links if link not in cache])
+    print(f"  {len(links) - len(pending)} cached, {len(pending)} to fetch")
+
+    if pending:
+        work = queue.Queue(maxsize=queue_size or max_workers * 2)
+        host_slots = defaultdict(lambda: threading.BoundedSemaphore(per_host_limit))
+        slots_lock = threading.Lock()
+        results_lock = threading.Lock()
+        fetched = []
+        failures = []
+
+        def producer():
+            for link in pending:
+                if deadline is not None and deadline.expired():
+                    break
+                work.put(link)
+            for _ in range(workers_count):
+                work.put(_STOP)
+
+        def consumer():
+            while True:
+                link = work.get()
+                if link is _STOP:
+                    return
+                if deadline is not None and deadline.expired():
+                    failures.append(link)
+                    continue
+                with slots_lock:
+                    slot = host_slots[urlparse(link).netloc]
+                with slot:
+                    try:
+                        details = fetch_job_details(link, timeout=timeout, deadline=deadline)
+                    except Exception as e:
+                        print(f"  Could not fetch {link}: {e}")
+                        failures.append(link)
+                        continue
+                details['fetched_at'] = datetime.now().isoformat(timespec='seconds')
+                with results_lock:
+                    cache[link] = details
+                fetched.append(link)
+
+        workers_count = max(1, min(max_workers, len(pending)))
+        threads = [threading.Thread(target=consumer, daemon=True) for _ in range(workers_count)]
+        for thread in threads:
+            thread.start()
+        producer()
+        for thread in threads:
+            thread.join()
+
+        print(f"  Fetched {len(fetched)} of {len(pending)} detail pages ({len(failures)} failed)")
+        save_detail_cache(cache, cache_file)
+
+    enriched_count = 0
+    for row in rows:
+        for field in ENRICHED_FIELDS:
+            row.setdefault(field, '')
+        details = cache.get(row.get('link'))
+        if not details:
+            continue
+        enriched_count += 1
+        for field in ['description', 'salary', 'posted_date']:
+            if details.get(field) and not row[field]:
+                row[field] = details[field]
+        current = str(row['location'] or '').strip().lower()
+        if details.get('location') and current in PLACEHOLDER_LOCATIONS:
+            row['location'] = details['location']
+
+    print(f"Enriched {enriched_count} of {len(rows)} jobs")
+    enriched = like(jobs_df, rows)
+    if is_frame(jobs_df):
+        enriched.index = jobs_df.index
+    return enriched
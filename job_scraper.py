@@ -1,285 +1,501 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 from datetime import datetime
 import time
+import heapq
 import json
+import multiprocessing
+import queue
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import closing, nullcontext
+from functools import lru_cache
+from itertools import islice
+
+from rate_limiter import polite_get, CircuitBreaker, CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+from records import dedupe_records, is_frame, iter_unique, to_frame, to_records
+from title_classifier import classify_jobs, iter_classified, title_allowed, title_mask
+from location_parser import iter_located, locate_jobs, location_allowed, location_mask
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Bytes read from the network between parser feeds with STREAM_PARSE
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Parser processes aren't forked: the fetcher threads (and, in the daemon,
+# the scheduler and SMTP threads) may hold locks a forked child would
+# inherit locked forever. forkserver forks from a clean single-threaded
+# server; spawn is the fallback where it isn't available (Windows).
+PARSE_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def _parse_rows(rows, parse_row):
+    """Job dicts from listing rows (BeautifulSoup Tags or stream_parser Nodes), skipping rows that fail"""
+    jobs_data = []
+    for row in rows:
+        try:
+            job = parse_row(row)
+        except Exception as e:
+            continue
+        if job:
+            jobs_data.append(job)
+    return jobs_data
+
+def is_remoteok_row(tag, attrs):
+    return tag == 'tr' and 'job' in attrs.get('class', '').split()
+
+def parse_remoteok_row(job):
+    """One RemoteOK table row as a job dict, or None"""
+    # Try multiple approaches to extract data
+    # Method 1: Using itemprop
+    title_elem = job.find('h2', itemprop='title')
+    if not title_elem:
+        # Method 2: Find any h2
+        title_elem = job.find('h2')
+    if not title_elem:
+        # Method 3: Look in td with class
+        title_elem = job.find('td', class_='company_and_position')
+        if title_elem:
+            title_elem = title_elem.find('h2')
+
+    title = title_elem.get_text(strip=True) if title_elem else None
+
+    # Extract company
+    company_elem = job.find('h3', itemprop='name')
+    if not company_elem:
+        company_elem = job.find('h3', class_='company')
+    if not company_elem:
+        company_elem = job.find('h3')
+    company = company_elem.get_text(strip=True) if company_elem else 'N/A'
+
+    # Extract link
+    link_data = job.get('data-url')
+    if not link_data:
+        link_elem = job.find('a', class_='preventLink')
+        link_data = link_elem.get('href') if link_elem else None
+    link = f"https://remoteok.com{link_data}" if link_data else None
+
+    # Extract location
+    location = 'Remote'
+
+    if title and len(title) > 3 and link:
+        return {
+            'title': title,
+            'company': company,
+            'location': location,
+            'link': link,
+            'scraped_date': datetime.now().strftime('%Y-%m-%d'),
+            'source': 'RemoteOK'
+        }
+    return None
 
-def scrape_remoteok_ai_jobs(max_jobs=30):
+def parse_remoteok_jobs(content, max_jobs=30):
     """
-    Scrape AI jobs from RemoteOK - works reliably without JavaScript
+    Parse a RemoteOK listing page into job records
     """
-    jobs_data = []
-    url = "https://remoteok.com/remote-ai-jobs"
+    from bs4 import BeautifulSoup
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    }
+    soup = BeautifulSoup(content, 'html.parser')
 
-    try:
-        print(f"Scraping RemoteOK AI jobs...")
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+    # RemoteOK has job data in table rows
+    job_rows = soup.find_all('tr', class_='job')
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+    print(f"  Found {len(job_rows)} job listings")
 
-        # RemoteOK has job data in table rows
-        job_rows = soup.find_all('tr', class_='job')
+    return _parse_rows(job_rows[:max_jobs], parse_remoteok_row)
 
-        print(f"  Found {len(job_rows)} job listings")
+def is_weworkremotely_row(tag, attrs):
+    return tag == 'li' and 'feature' in attrs.get('class', '').split()
 
-        for job in job_rows[:max_jobs]:
-            try:
-                # Try multiple approaches to extract data
-                # Method 1: Using itemprop
-                title_elem = job.find('h2', itemprop='title')
-                if not title_elem:
-                    # Method 2: Find any h2
-                    title_elem = job.find('h2')
-                if not title_elem:
-                    # Method 3: Look in td with class
-                    title_elem = job.find('td', class_='company_and_position')
-                    if title_elem:
-                        title_elem = title_elem.find('h2')
-
-                title = title_elem.get_text(strip=True) if title_elem else None
-
-                # Extract company
-                company_elem = job.find('h3', itemprop='name')
-                if not company_elem:
-                    company_elem = job.find('h3', class_='company')
-                if not company_elem:
-                    company_elem = job.find('h3')
-                company = company_elem.get_text(strip=True) if company_elem else 'N/A'
-
-                # Extract link
-                link_data = job.get('data-url')
-                if not link_data:
-                    link_elem = job.find('a', class_='preventLink')
-                    link_data = link_elem.get('href') if link_elem else None
-                link = f"https://remoteok.com{link_data}" if link_data else None
-
-                # Extract location
-                location = 'Remote'
-
-                if title and len(title) > 3 and link:
-                    jobs_data.append({
-                        'title': title,
-                        'company': company,
-                        'location': location,
-                        'link': link,
-                        'scraped_date': datetime.now().strftime('%Y-%m-%d'),
-                        'source': 'RemoteOK'
-                    })
+def parse_weworkremotely_row(job):
+    """One WeWorkRemotely list item as a job dict, or None"""
+    # Get the link element
+    link_elem = job.find('a', href=True)
+    if not link_elem:
+        return None
 
-            except Exception as e:
-                continue
+    # Title is in span with title class
+    title_elem = link_elem.find('span', class_='title')
+    title = title_elem.get_text(strip=True) if title_elem else None
 
-        print(f"Successfully parsed {len(jobs_data)} jobs from RemoteOK")
+    # Company is in span with company class
+    company_elem = link_elem.find('span', class_='company')
+    company = company_elem.get_text(strip=True) if company_elem else 'N/A'
 
-    except Exception as e:
-        print(f"Error scraping RemoteOK: {e}")
+    # Link
+    link = f"https://weworkremotely.com{link_elem['href']}"
 
-    return pd.DataFrame(jobs_data)
+    # Location/Region
+    region_elem = link_elem.find('span', class_='region')
+    location = region_elem.get_text(strip=True) if region_elem else 'Remote'
+
+    if title and len(title) > 3:
+        return {
+            'title': title,
+            'company': company,
+            'location': location,
+            'link': link,
+            'scraped_date': datetime.now().strftime('%Y-%m-%d'),
+            'source': 'WeWorkRemotely'
+        }
+    return None
 
-def scrape_weworkremotely_ai_jobs(max_jobs=20):
+def parse_weworkremotely_jobs(content, max_jobs=20):
     """
-    Scrape from WeWorkRemotely - Programming jobs section
+    Parse a WeWorkRemotely search page into job records
     """
-    jobs_data = []
-    url = "https://weworkremotely.com/remote-jobs/search?term=ai+machine+learning"
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-
-    try:
-        print(f"Scraping WeWorkRemotely...")
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Find job listings
+    job_listings = soup.find_all('li', class_='feature')
+
+    print(f"  Found {len(job_listings)} job listings")
+
+    return _parse_rows(job_listings[:max_jobs], parse_weworkremotely_row)
+
+def is_himalayas_row(tag, attrs):
+    return tag == 'div' and attrs.get('data-test') == 'job-card'
+
+def is_himalayas_fallback_row(tag, attrs):
+    # The <article> elements older layouts used instead of job cards
+    return tag == 'article'
+
+def parse_himalayas_row(job):
+    """One Himalayas job card as a job dict, or None"""
+    # Title
+    title_elem = job.find('h3')
+    if not title_elem:
+        title_elem = job.find('a')
+    title = title_elem.get_text(strip=True) if title_elem else None
+
+    # Company
+    company_elem = job.find('span', {'data-test': 'job-card-company'})
+    if not company_elem:
+        company_elem = job.find('div', class_=lambda x: x and 'company' in str(x).lower())
+    company = company_elem.get_text(strip=True) if company_elem else 'N/A'
+
+    # Link
+    link_elem = job.find('a', href=True)
+    link = None
+    if link_elem:
+        href = link_elem['href']
+        link = f"https://himalayas.app{href}" if not href.startswith('http') else href
+
+    # Location
+    location = 'Remote'
+
+    if title and len(title) > 3 and link:
+        return {
+            'title': title,
+            'company': company,
+            'location': location,
+            'link': link,
+            'scraped_date': datetime.now().strftime('%Y-%m-%d'),
+            'source': 'Himalayas'
+        }
+    return None
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+def parse_himalayas_jobs(content, max_jobs=25):
+    """
+    Parse a Himalayas.app listing page into job records
+    """
+    from bs4 import BeautifulSoup
 
-        # Find job listings
-        job_listings = soup.find_all('li', class_='feature')
+    soup = BeautifulSoup(content, 'html.parser')
 
-        print(f"  Found {len(job_listings)} job listings")
+    # Find job cards
+    job_cards = soup.find_all('div', {'data-test': 'job-card'})
+    if not job_cards:
+        job_cards = soup.find_all('article')
 
-        for job in job_listings[:max_jobs]:
-            try:
-                # Get the link element
-                link_elem = job.find('a', href=True)
-                if not link_elem:
-                    continue
-
-                # Title is in span with title class
-                title_elem = link_elem.find('span', class_='title')
-                title = title_elem.get_text(strip=True) if title_elem else None
-
-                # Company is in span with company class
-                company_elem = link_elem.find('span', class_='company')
-                company = company_elem.get_text(strip=True) if company_elem else 'N/A'
-
-                # Link
-                link = f"https://weworkremotely.com{link_elem['href']}"
-
-                # Location/Region
-                region_elem = link_elem.find('span', class_='region')
-                location = region_elem.get_text(strip=True) if region_elem else 'Remote'
-
-                if title and len(title) > 3:
-                    jobs_data.append({
-                        'title': title,
-                        'company': company,
-                        'location': location,
-                        'link': link,
-                        'scraped_date': datetime.now().strftime('%Y-%m-%d'),
-                        'source': 'WeWorkRemotely'
-                    })
+    print(f"  Found {len(job_cards)} job listings")
 
-            except Exception as e:
-                continue
+    return _parse_rows(job_cards[:max_jobs], parse_himalayas_row)
 
-        print(f"Successfully parsed {len(jobs_data)} jobs from WeWorkRemotely")
+# AI/ML keywords for filtering Arbeitnow's general job board
+AI_KEYWORDS = [
+    'ai', 'artificial intelligence', 'machine learning', 'ml engineer',
+    'data scientist', 'deep learning', 'nlp', 'computer vision',
+    'neural network', 'pytorch', 'tensorflow', 'llm', 'generative ai'
+]
 
-    except Exception as e:
-        print(f"Error scraping WeWorkRemotely: {e}")
-
-    return pd.DataFrame(jobs_data)
-
-def scrape_himalayas_ai_jobs(max_jobs=25):
+def parse_arbeitnow_jobs(content, max_jobs=30):
     """
-    Scrape from Himalayas.app - excellent for remote AI/ML jobs
+    Parse the Arbeitnow job board API response
+    Filter for English-language AI/ML jobs
     """
     jobs_data = []
-    url = "https://himalayas.app/jobs/ai-ml"
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
+    data = json.loads(content)
+    jobs = data.get('data', [])
+
+    print(f"  Found {len(jobs)} job listings")
+
+    for job in jobs:
+        try:
+            title = job.get('title', '')
+            description = job.get('description', '').lower()
+            tags = ' '.join(job.get('tags', [])).lower()
+
+            # Check if job is AI/ML related
+            is_ai_job = any(keyword in title.lower() or keyword in description or keyword in tags
+                           for keyword in AI_KEYWORDS)
+
+            # Kept as free text; location_parser resolves it (and LOCATION_FILTER filters on it) later
+            location = job.get('location', '')
+
+            if is_ai_job and len(jobs_data) < max_jobs:
+                jobs_data.append({
+                    'title': title,
+                    'company': job.get('company_name', 'N/A'),
+                    'location': location if location else 'Remote',
+                    'link': job.get('url', 'N/A'),
+                    'scraped_date': datetime.now().strftime('%Y-%m-%d'),
+                    'source': 'Arbeitnow'
+                })
+
+        except Exception as e:
+            continue
+
+    return jobs_data
+
+# Sources in the order they are tried, with how many jobs to take from each
+# (with PLAN_SOURCES, source_stats.plan_sources reorders them and adjusts
+# max_jobs from past runs).
+# parser_version is part of the parse cache key, so bumping it discards
+# results cached from an older version of the parser.
+# HTML sources also name their listing rows (is_row), any row type their
+# parser falls back to when a page has none (fallback_row), and how to read
+# one (row_parser), so STREAM_PARSE can parse their pages as they download.
+SOURCES = [
+    {
+        'name': 'RemoteOK',
+        'url': "https://remoteok.com/remote-ai-jobs",
+        'headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        },
+        'parser': parse_remoteok_jobs,
+        'is_row': is_remoteok_row,
+        'row_parser': parse_remoteok_row,
+        'parser_version': 1,
+        'max_jobs': 25,
+    },
+    {
+        'name': 'WeWorkRemotely',
+        'url': "https://weworkremotely.com/remote-jobs/search?term=ai+machine+learning",
+        'headers': BROWSER_HEADERS,
+        'parser': parse_weworkremotely_jobs,
+        'is_row': is_weworkremotely_row,
+        'row_parser': parse_weworkremotely_row,
+        'parser_version': 1,
+        'max_jobs': 20,
+    },
+    {
+        'name': 'Arbeitnow',
+        'url': "https://www.arbeitnow.com/api/job-board-api",
+        'headers': BROWSER_HEADERS,
+        'parser': parse_arbeitnow_jobs,
+        'parser_version': 1,
+        'max_jobs': 20,
+    },
+    {
+        'name': 'Himalayas',
+        'url': "https://himalayas.app/jobs/ai-ml",
+        'headers': BROWSER_HEADERS,
+        'parser': parse_himalayas_jobs,
+        'is_row': is_himalayas_row,
+        'fallback_row': is_himalayas_fallback_row,
+        'row_parser': parse_himalayas_row,
+        'parser_version': 1,
+        'max_jobs': 25,
+    },
+]
+
+SOURCES_BY_NAME = {source['name']: source for source in SOURCES}
+
+def fetch_source(source, breaker=None, deadline=None, checkpoint=None, stats=None):
+    """
+    Fetch a source's listing page and return the raw body
 
+    If `checkpoint` already holds this source's page it is reused instead
+    of fetched; freshly fetched pages are saved to it. Latency, size and
+    failures are recorded in `stats` (a SourceStats) if given.
+    """
+    content = checkpoint.load_raw(source['name']) if checkpoint else None
+    if content is not None:
+        print("  Using checkpointed page")
+        if stats is not None:
+            stats.record_fetch(source['name'], None, len(content))
+        return content
+
+    started = time.monotonic()
     try:
-        print(f"Scraping Himalayas.app...")
-        response = requests.get(url, headers=headers, timeout=15)
+        response = polite_get(source['url'], headers=source['headers'], source=source['name'],
+                              breaker=breaker, deadline=deadline)
         response.raise_for_status()
+    except (CircuitOpenError, DeadlineExceeded):
+        raise  # Not the board's fault
+    except Exception:
+        if stats is not None:
+            stats.record_failure(source['name'])
+        raise
+    if stats is not None:
+        stats.record_fetch(source['name'], time.monotonic() - started, len(response.content))
+    if checkpoint:
+        checkpoint.save_raw(source['name'], response.content)
+    return response.content
+
+def _streamable(source, checkpoint, stream_parse):
+    """True if a source's page should be parsed as it downloads (HTML, and not already checkpointed)"""
+    return stream_parse and source.get('is_row') is not None \
+        and not (checkpoint and checkpoint.has_raw(source['name']))
+
+def stream_source(source, max_jobs, breaker=None, deadline=None, checkpoint=None, stats=None):
+    """
+    Fetch an HTML source and parse it as it downloads, returning job dicts
+
+    Response chunks are fed straight to stream_parser.iter_rows, so each
+    listing row is read as soon as it has arrived and parsing overlaps the
+    transfer. The page is never held in memory (the checkpoint copy is
+    written chunk by chunk), and the download stops once max_jobs rows
+    have been read. The parse cache isn't used: by the time the body's hash
+    is known, the page has already been parsed.
+    """
+    from stream_parser import iter_rows, preferred_rows, response_encoding
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Find job cards
-        job_cards = soup.find_all('div', {'data-test': 'job-card'})
-        if not job_cards:
-            job_cards = soup.find_all('article')
-
-        print(f"  Found {len(job_cards)} job listings")
-
-        for job in job_cards[:max_jobs]:
-            try:
-                # Title
-                title_elem = job.find('h3')
-                if not title_elem:
-                    title_elem = job.find('a')
-                title = title_elem.get_text(strip=True) if title_elem else None
-
-                # Company
-                company_elem = job.find('span', {'data-test': 'job-card-company'})
-                if not company_elem:
-                    company_elem = job.find('div', class_=lambda x: x and 'company' in str(x).lower())
-                company = company_elem.get_text(strip=True) if company_elem else 'N/A'
-
-                # Link
-                link_elem = job.find('a', href=True)
-                link = None
-                if link_elem:
-                    href = link_elem['href']
-                    link = f"https://himalayas.app{href}" if not href.startswith('http') else href
-
-                # Location
-                location = 'Remote'
-
-                if title and len(title) > 3 and link:
-                    jobs_data.append({
-                        'title': title,
-                        'company': company,
-                        'location': location,
-                        'link': link,
-                        'scraped_date': datetime.now().strftime('%Y-%m-%d'),
-                        'source': 'Himalayas'
-                    })
-
-            except Exception as e:
-                continue
-
-        print(f"Successfully parsed {len(jobs_data)} jobs from Himalayas")
+    started = time.monotonic()
+    size = 0
 
-    except Exception as e:
-        print(f"Error scraping Himalayas: {e}")
+    def chunks(response, raw_file):
+        nonlocal size
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            if raw_file is not None:
+                raw_file.write(chunk)
+            yield chunk
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Deadline passed while downloading {source['url']}")
 
-    return pd.DataFrame(jobs_data)
+    try:
+        response = polite_get(source['url'], headers=source['headers'], source=source['name'],
+                              breaker=breaker, deadline=deadline, stream=True)
+        with closing(response), (checkpoint.raw_writer(source['name']) if checkpoint else nullcontext()) as raw_file:
+            response.raise_for_status()
+            is_row, fallback_row = source['is_row'], source.get('fallback_row')
+            if fallback_row:
+                rows = iter_rows(chunks(response, raw_file),
+                                 lambda tag, attrs: is_row(tag, attrs) or fallback_row(tag, attrs),
+                                 response_encoding(response.headers.get('Content-Type')))
+                picked = preferred_rows(rows, is_row, max_jobs)
+            else:
+                rows = iter_rows(chunks(response, raw_file), is_row,
+                                 response_encoding(response.headers.get('Content-Type')))
+                picked = islice(rows, max_jobs)
+            with closing(rows):
+                jobs_data = _parse_rows(picked, source['row_parser'])
+    except (CircuitOpenError, DeadlineExceeded):
+        raise  # Not the board's fault
+    except Exception:
+        if stats is not None:
+            stats.record_failure(source['name'])
+        raise
+    print(f"  Parsed {size / 1024:.0f} KB as it downloaded")
+    if stats is not None:
+        stats.record_fetch(source['name'], time.monotonic() - started, size)
+    return jobs_data
+
+def parse_source(source, content, max_jobs, parse_cache=None):
+    """
+    Parse a fetched page with the source's parser
+    A page whose exact body was parsed before is served from `parse_cache`
+    """
+    if parse_cache is None:
+        return source['parser'](content, max_jobs=max_jobs)
+
+    key = parse_cache.key(source, content, max_jobs)
+    jobs_data = _from_parse_cache(parse_cache, key)
+    if jobs_data is not None:
+        return jobs_data
+
+    jobs_data = source['parser'](content, max_jobs=max_jobs)
+    parse_cache.put(key, jobs_data)
+    return jobs_data
+
+def _from_parse_cache(parse_cache, key):
+    """Cached records for a page, with scraped_date brought up to today"""
+    jobs_data = parse_cache.get(key)
+    if jobs_data is not None:
+        print(f"  Page unchanged since last parse, reusing {len(jobs_data)} cached jobs")
+        today = datetime.now().strftime('%Y-%m-%d')
+        for job in jobs_data:
+            job['scraped_date'] = today
+    return jobs_data
+
+# Field order of the compact tuples parser processes send back
+RECORD_FIELDS = ('title', 'company', 'location', 'link', 'scraped_date', 'source')
+
+def _parse_to_tuples(name, content, max_jobs):
+    """
+    Runs in a parser process: parse a page and return plain tuples, so only
+    small picklable rows cross the process boundary
+    """
+    jobs_data = SOURCES_BY_NAME[name]['parser'](content, max_jobs=max_jobs)
+    return [tuple(job.get(field) for field in RECORD_FIELDS) for job in jobs_data]
 
-def scrape_arbeitnow_ai_jobs(max_jobs=30):
+def scrape_source(name, max_jobs=None, breaker=None, deadline=None, checkpoint=None, as_records=False,
+                  parse_cache=None, stats=None, stream_parse=False):
     """
-    Scrape from Arbeitnow.com - has a nice API-like structure
-    Filter for English-language AI/ML jobs
+    Fetch and parse one source, returning a DataFrame (empty on failure),
+    or a list of job dicts if as_records is set. With stream_parse, HTML
+    pages are parsed as they download (see stream_source).
     """
+    source = SOURCES_BY_NAME[name]
+    max_jobs = max_jobs or source['max_jobs']
     jobs_data = []
-    url = "https://www.arbeitnow.com/api/job-board-api"
-
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
 
     try:
-        print(f"Scraping Arbeitnow API...")
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        data = response.json()
-        jobs = data.get('data', [])
-
-        print(f"  Found {len(jobs)} job listings")
+        print(f"Scraping {name}...")
+        if _streamable(source, checkpoint, stream_parse):
+            jobs_data = stream_source(source, max_jobs, breaker=breaker, deadline=deadline,
+                                      checkpoint=checkpoint, stats=stats)
+        else:
+            content = fetch_source(source, breaker=breaker, deadline=deadline, checkpoint=checkpoint, stats=stats)
+            jobs_data = parse_source(source, content, max_jobs, parse_cache=parse_cache)
+        print(f"Successfully parsed {len(jobs_data)} jobs from {name}")
 
-        # AI/ML keywords for filtering
-        ai_keywords = [
-            'ai', 'artificial intelligence', 'machine learning', 'ml engineer',
-            'data scientist', 'deep learning', 'nlp', 'computer vision',
-            'neural network', 'pytorch', 'tensorflow', 'llm', 'generative ai'
-        ]
+    except Exception as e:
+        print(f"Error scraping {name}: {e}")
 
-        for job in jobs:
-            try:
-                title = job.get('title', '')
-                description = job.get('description', '').lower()
-                tags = ' '.join(job.get('tags', [])).lower()
-
-                # Check if job is AI/ML related
-                is_ai_job = any(keyword in title.lower() or keyword in description or keyword in tags
-                               for keyword in ai_keywords)
-
-                # Filter for English-speaking locations (US, UK, Remote, etc.)
-                location = job.get('location', '')
-
-                if is_ai_job and len(jobs_data) < max_jobs:
-                    jobs_data.append({
-                        'title': title,
-                        'company': job.get('company_name', 'N/A'),
-                        'location': location if location else 'Remote',
-                        'link': job.get('url', 'N/A'),
-                        'scraped_date': datetime.now().strftime('%Y-%m-%d'),
-                        'source': 'Arbeitnow'
-                    })
+    return jobs_data if as_records else to_frame(jobs_data)
 
-            except Exception as e:
-                continue
+def scrape_remoteok_ai_jobs(max_jobs=30, breaker=None, deadline=None):
+    """
+    Scrape AI jobs from RemoteOK - works reliably without JavaScript
+    """
+    return scrape_source('RemoteOK', max_jobs, breaker=breaker, deadline=deadline)
 
-        print(f"Successfully parsed {len(jobs_data)} AI/ML jobs from Arbeitnow")
+def scrape_weworkremotely_ai_jobs(max_jobs=20, breaker=None, deadline=None):
+    """
+    Scrape from WeWorkRemotely - Programming jobs section
+    """
+    return scrape_source('WeWorkRemotely', max_jobs, breaker=breaker, deadline=deadline)
 
-    except Exception as e:
-        print(f"Error scraping Arbeitnow: {e}")
+def scrape_himalayas_ai_jobs(max_jobs=25, breaker=None, deadline=None):
+    """
+    Scrape from Himalayas.app - excellent for remote AI/ML jobs
+    """
+    return scrape_source('Himalayas', max_jobs, breaker=breaker, deadline=deadline)
 
-    return pd.DataFrame(jobs_data)
+def scrape_arbeitnow_ai_jobs(max_jobs=30, breaker=None, deadline=None):
+    """
+    Scrape from Arbeitnow.com - has a nice API-like structure
+    Filter for English-language AI/ML jobs
+    """
+    return scrape_source('Arbeitnow', max_jobs, breaker=breaker, deadline=deadline)
 
-def create_sample_data():
+def create_sample_data(as_records=False):
     """
     Fallback: Create sample data if scraping fails
     """
@@ -344,101 +560,341 @@ def create_sample_data():
         },
     ]
 
-    return pd.DataFrame(sample_jobs)
+    return sample_jobs if as_records else to_frame(sample_jobs)
 
-def scrape_ai_jobs(max_pages=3):
+def _source_deadline(source, deadline):
     """
-    Main scraper function that tries multiple sources
-    Returns DataFrame with job listings
+    The scrape deadline, or an earlier one if the planner gave the source a
+    time limit (iter_ai_jobs sizes the limits for how many sources are
+    fetched at once)
     """
-    all_jobs = pd.DataFrame()
-
-    print("\n" + "=" * 60)
-    print("STARTING MULTI-SOURCE JOB SCRAPER")
-    print("=" * 60 + "\n")
-
-    # Try RemoteOK (most reliable)
-    print("Source 1: RemoteOK")
-    print("-" * 60)
+    limit = source.get('time_limit')
+    remaining = deadline.remaining()
+    if not limit or (remaining is not None and remaining <= limit):
+        return deadline
+    return Deadline(limit)
+
+def _count_relevant(jobs_data, matcher):
+    return sum(1 for job in jobs_data if matcher.search(str(job.get('title') or '')))
+
+def _skip_reason(name, breaker, deadline):
+    """Why a source can't be scraped right now, or None if it can"""
+    if deadline.expired():
+        return 'time budget'
+    if not breaker.allow(name):
+        return 'repeated failures'
+    return None
+
+def iter_sources_pipelined(breaker, deadline, skipped_sources, checkpoint=None, parse_cache=None,
+                           fetch_workers=4, parse_workers=2, queue_size=4, sources=None, stats=None,
+                           stream_parse=False):
+    """
+    Fetch all sources on a thread pool and parse them on a process pool
+
+    Fetcher threads hand raw page bytes to the parser processes through a
+    bounded queue, and at most 2 * parse_workers pages are being parsed at
+    once, so fetchers block rather than pile up bodies when parsing falls
+    behind. Workers send back compact tuples (RECORD_FIELDS), never soups.
+    Yields (source name, list of job dicts) once per source, in completion
+    order; skipped or failed sources yield an empty list. `sources`
+    defaults to SOURCES. With stream_parse, HTML pages are parsed by the
+    fetcher threads as they download (see stream_source) and skip the
+    parser processes.
+    """
+    sources = sources or SOURCES
+    fetched = queue.Queue(maxsize=queue_size)
+
+    def fetch(source):
+        name = source['name']
+        reason = _skip_reason(name, breaker, deadline)
+        if reason:
+            fetched.put((source, None, None, reason))
+            return
+        source_deadline = _source_deadline(source, deadline)
+        try:
+            if _streamable(source, checkpoint, stream_parse):
+                jobs_data = stream_source(source, source['max_jobs'], breaker=breaker, deadline=source_deadline,
+                                          checkpoint=checkpoint, stats=stats)
+                fetched.put((source, None, jobs_data, None))
+                return
+            content = fetch_source(source, breaker=breaker, deadline=source_deadline, checkpoint=checkpoint,
+                                   stats=stats)
+            fetched.put((source, content, None, None))
+        except Exception as e:
+            print(f"Error scraping {name}: {e}")
+            fetched.put((source, None, None, _skip_reason(name, breaker, source_deadline)))
+
+    def collect(futures):
+        for future in futures:
+            source, key = pending.pop(future)
+            try:
+                rows = future.result()
+            except Exception as e:
+                print(f"Error parsing {source['name']}: {e}")
+                yield source['name'], []
+                continue
+            jobs_data = [dict(zip(RECORD_FIELDS, row)) for row in rows]
+            print(f"Successfully parsed {len(jobs_data)} jobs from {source['name']}")
+            if parse_cache is not None:
+                parse_cache.put(key, jobs_data)
+            yield source['name'], jobs_data
+
+    fetchers = ThreadPoolExecutor(max_workers=fetch_workers)
+    parsers = ProcessPoolExecutor(max_workers=parse_workers,
+                                  mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+    pending = {}  # future -> (source, parse cache key)
     try:
-        remoteok_jobs = scrape_remoteok_ai_jobs(max_jobs=25)
-        if not remoteok_jobs.empty:
-            all_jobs = pd.concat([all_jobs, remoteok_jobs], ignore_index=True)
-            print(f"Added {len(remoteok_jobs)} jobs\n")
-        else:
-            print("No jobs found\n")
-    except Exception as e:
-        print(f"Failed: {e}\n")
-
-    time.sleep(2)  # Be respectful
+        for source in sources:
+            fetchers.submit(fetch, source)
+
+        for _ in sources:
+            source, content, jobs_data, reason = fetched.get()
+            name = source['name']
+            if jobs_data is not None:
+                print(f"Successfully parsed {len(jobs_data)} jobs from {name}")
+                yield name, jobs_data
+                continue
+            if content is None:
+                if reason:
+                    print(f"{name}: skipped ({reason})")
+                    skipped_sources.append((name, reason))
+                yield name, []
+                continue
 
-    # Try WeWorkRemotely
-    print("Source 2: WeWorkRemotely")
-    print("-" * 60)
-    try:
-        wwr_jobs = scrape_weworkremotely_ai_jobs(max_jobs=20)
-        if not wwr_jobs.empty:
-            all_jobs = pd.concat([all_jobs, wwr_jobs], ignore_index=True)
-            print(f"Added {len(wwr_jobs)} jobs\n")
-        else:
-            print("No jobs found\n")
-    except Exception as e:
-        print(f"Failed: {e}\n")
+            key = parse_cache.key(source, content, source['max_jobs']) if parse_cache is not None else None
+            cached = _from_parse_cache(parse_cache, key) if key else None
+            if cached is not None:
+                yield name, cached
+                continue
 
-    time.sleep(2)
+            # Backpressure: wait for a parse to finish before queueing another
+            while len(pending) >= 2 * parse_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+            pending[parsers.submit(_parse_to_tuples, name, content, source['max_jobs'])] = (source, key)
+
+        done, not_done = wait(pending, timeout=deadline.remaining())
+        yield from collect(done)
+        for future in not_done:
+            source, _ = pending.pop(future)
+            print(f"{source['name']}: skipped (time budget ran out while parsing)")
+            skipped_sources.append((source['name'], 'time budget'))
+            yield source['name'], []
+    finally:
+        fetchers.shutdown(wait=False)
+        parsers.shutdown(wait=False, cancel_futures=True)
+
+def _iter_sources_in_order(breaker, deadline, skipped_sources, checkpoint=None, parse_cache=None,
+                           parse_workers=0, fetch_workers=4, sources=None, stats=None, matcher=None,
+                           stream_parse=False):
+    """
+    Yield each source's job dicts in `sources` order (default SOURCES),
+    whichever way they are scraped; with `stats`, rows parsed and rows
+    matching `matcher` are recorded per source
+    """
+    sources = sources or SOURCES
+    if parse_workers:
+        # Sources finish in any order; hold early finishers until their turn
+        # so results (and which duplicate is kept) don't depend on timing
+        order = [source['name'] for source in sources]
+        finished = {}
+        for name, jobs_data in iter_sources_pipelined(
+                breaker, deadline, skipped_sources,
+                checkpoint=checkpoint,
+                parse_cache=parse_cache,
+                fetch_workers=fetch_workers,
+                parse_workers=parse_workers,
+                sources=sources,
+                stats=stats,
+                stream_parse=stream_parse):
+            if stats is not None:
+                stats.record_rows(name, len(jobs_data), _count_relevant(jobs_data, matcher))
+            finished[name] = jobs_data
+            while order and order[0] in finished:
+                jobs_data = finished.pop(order.pop(0))
+                if jobs_data:
+                    print(f"Added {len(jobs_data)} jobs from {jobs_data[0]['source']}")
+                yield jobs_data
+        print()
+        return
+
+    for number, source in enumerate(sources, 1):
+        name = source['name']
+        print(f"Source {number}: {name}")
+        print("-" * 60)
+        reason = _skip_reason(name, breaker, deadline)
+        if reason == 'time budget':
+            print("Skipped (scrape time budget used up)\n")
+            skipped_sources.append((name, reason))
+            continue
+        if reason:
+            print("Skipped (circuit open after repeated failures)\n")
+            skipped_sources.append((name, reason))
+            continue
+        source_deadline = _source_deadline(source, deadline)
+        try:
+            source_jobs = scrape_source(name, max_jobs=source['max_jobs'], breaker=breaker,
+                                        deadline=source_deadline, checkpoint=checkpoint, as_records=True,
+                                        parse_cache=parse_cache, stats=stats, stream_parse=stream_parse)
+            if stats is not None:
+                stats.record_rows(name, len(source_jobs), _count_relevant(source_jobs, matcher))
+            if source_jobs:
+                print(f"Added {len(source_jobs)} jobs\n")
+                yield source_jobs
+            else:
+                print("No jobs found\n")
+                reason = _skip_reason(name, breaker, source_deadline)
+                if reason:
+                    skipped_sources.append((name, reason))
+        except Exception as e:
+            print(f"Failed: {e}\n")
+
+def iter_ai_jobs(circuit_state_file=None, deadline=None, skipped_sources=None, checkpoint=None,
+                 parse_cache=None, parse_workers=0, fetch_workers=4, source_stats=None,
+                 keywords=None, source_plan=None, stream_parse=False):
+    """
+    Generator version of scrape_ai_jobs: yields job dicts source by source,
+    without deduplicating them or holding more than one page's jobs at a time
 
-    # Try Arbeitnow
-    print("Source 3: Arbeitnow")
-    print("-" * 60)
-    try:
-        arbeit_jobs = scrape_arbeitnow_ai_jobs(max_jobs=20)
-        if not arbeit_jobs.empty:
-            all_jobs = pd.concat([all_jobs, arbeit_jobs], ignore_index=True)
-            print(f"Added {len(arbeit_jobs)} jobs\n")
-        else:
-            print("No jobs found\n")
-    except Exception as e:
-        print(f"Failed: {e}\n")
+    Falls back to sample data if no source produced any jobs. The circuit
+    breaker state and source stats are saved and the parse cache pruned
+    once the generator is exhausted or closed.
+    """
+    breaker = CircuitBreaker(state_file=circuit_state_file)
+    deadline = deadline or Deadline()
+    if skipped_sources is None:
+        skipped_sources = []
 
-    time.sleep(2)
+    print("\n" + "=" * 60)
+    print("STARTING MULTI-SOURCE JOB SCRAPER")
+    print("=" * 60 + "\n")
 
-    # Try Himalayas
-    print("Source 4: Himalayas")
-    print("-" * 60)
+    sources = SOURCES
+    matcher = None
+    if source_stats is not None:
+        from source_stats import plan_sources
+        time_budget = deadline.remaining()
+        if time_budget is not None and parse_workers:
+            # The pipelined path fetches up to fetch_workers sources at once,
+            # so the per-source shares of a one-after-another budget scale up
+            time_budget *= max(1, min(fetch_workers, len(SOURCES)))
+        sources, notes = plan_sources(SOURCES, source_stats, time_budget=time_budget)
+        matcher = _keyword_matcher(tuple(keywords or AI_KEYWORDS))
+        print("Source plan:")
+        for note in notes:
+            print(f"  {note}")
+        print()
+        if source_plan is not None:
+            source_plan.extend(notes)
+
+    found_any = False
     try:
-        himalayas_jobs = scrape_himalayas_ai_jobs(max_jobs=25)
-        if not himalayas_jobs.empty:
-            all_jobs = pd.concat([all_jobs, himalayas_jobs], ignore_index=True)
-            print(f"Added {len(himalayas_jobs)} jobs\n")
-        else:
-            print("No Jobs Found\n")
-    except Exception as e:
-        print(f"Failed: {e}\n")
+        for source_jobs in _iter_sources_in_order(breaker, deadline, skipped_sources,
+                                                  checkpoint=checkpoint,
+                                                  parse_cache=parse_cache,
+                                                  parse_workers=parse_workers,
+                                                  fetch_workers=fetch_workers,
+                                                  sources=sources,
+                                                  stats=source_stats,
+                                                  matcher=matcher,
+                                                  stream_parse=stream_parse):
+            found_any = found_any or bool(source_jobs)
+            yield from source_jobs
+    finally:
+        breaker.end_run()
+        if source_stats is not None:
+            source_stats.end_run()
+        if parse_cache is not None:
+            parse_cache.prune()
 
     # If no jobs found from any source, use sample data
-    if all_jobs.empty:
+    if not found_any:
         print("No jobs scraped from any source!")
         print("Using sample data for demonstration...\n")
-        all_jobs = create_sample_data()
-
-    # Clean up data
-    if not all_jobs.empty:
-        # Remove duplicates
-        all_jobs = all_jobs.drop_duplicates(subset=['title', 'company'], keep='first')
-        all_jobs = all_jobs.reset_index(drop=True)
-
-    return all_jobs
+        yield from create_sample_data(as_records=True)
 
-def filter_top_jobs(df, keywords=['AI Engineer', 'Machine Learning', 'Data Scientist'], top_n=5):
+def scrape_ai_jobs(max_pages=3, circuit_state_file=None, deadline=None, skipped_sources=None,
+                   checkpoint=None, as_records=False, parse_cache=None, parse_workers=0,
+                   fetch_workers=4, source_stats=None, keywords=None, source_plan=None, stream_parse=False):
+    """
+    Main scraper function that tries multiple sources
+    Returns DataFrame with job listings (a list of dicts if as_records is set,
+    in which case pandas is never imported)
+
+    Requests are paced per host by the shared rate limiter, and sources that
+    keep failing are skipped by a circuit breaker whose state is kept in
+    circuit_state_file between runs. Once `deadline` passes, in-flight requests
+    are abandoned and the remaining sources are skipped; whatever arrived is
+    returned. Skipped sources are appended to `skipped_sources` as (name, reason).
+    Raw pages are saved to, and on resume reused from, `checkpoint`.
+    Pages identical to one parsed before are served from `parse_cache`.
+
+    With parse_workers > 0, sources are fetched concurrently and parsed in
+    that many processes (see iter_sources_pipelined); results keep the
+    order of SOURCES either way.
+
+    With `source_stats` (a SourceStats), each source's latency, size, rows
+    and rows matching `keywords` are recorded, and source_stats.plan_sources
+    picks the order, row caps and per-source time limits from past runs
+    instead. Its reasoning is appended to `source_plan`, one line per source.
+
+    With stream_parse, HTML pages are parsed as they download, overlapping
+    parsing with the transfer (see stream_source).
+    """
+    all_jobs = iter_ai_jobs(
+        circuit_state_file=circuit_state_file,
+        deadline=deadline,
+        skipped_sources=skipped_sources,
+        checkpoint=checkpoint,
+        parse_cache=parse_cache,
+        parse_workers=parse_workers,
+        fetch_workers=fetch_workers,
+        source_stats=source_stats,
+        keywords=keywords,
+        source_plan=source_plan,
+        stream_parse=stream_parse
+    )
+
+    # Clean up data: remove duplicates
+    all_jobs = dedupe_records(all_jobs, subset=('title', 'company'))
+
+    return all_jobs if as_records else to_frame(all_jobs)
+
+@lru_cache(maxsize=32)
+def _keyword_matcher(keywords):
+    """Compiled case-insensitive pattern for a keyword tuple, kept warm between runs"""
+    return re.compile('|'.join(keywords), re.IGNORECASE)
+
+def filter_top_jobs(df, keywords=['AI Engineer', 'Machine Learning', 'Data Scientist'], top_n=5,
+                    seniority=None, families=None, locations=None):
     """
     Filter and return top N jobs based on keywords
+    Accepts a DataFrame or a list of job dicts and returns the same kind
+
+    seniority and families, if given, restrict the jobs considered to those
+    title levels and role families (see title_classifier), and `locations`
+    to those passing that location filter (see location_parser)
     """
-    if df.empty:
+    if len(df) == 0:
         return df
 
-    # Create case-insensitive regex pattern
-    pattern = '|'.join(keywords)
-    mask = df['title'].str.contains(pattern, case=False, na=False)
+    if (seniority or families or locations) and is_frame(df):
+        if 'seniority' not in df.columns:
+            df = classify_jobs(df)
+        if 'timezone_band' not in df.columns:
+            df = locate_jobs(df)
+        df = df[title_mask(df, seniority, families) & location_mask(df, locations)]
+    elif seniority or families or locations:
+        df = [job for job in iter_located(iter_classified(df))
+              if title_allowed(job, seniority, families) and location_allowed(job, locations)]
+
+    if not is_frame(df):
+        matcher = _keyword_matcher(tuple(keywords))
+        filtered = [job for job in df if matcher.search(str(job.get('title') or ''))]
+        return df[:top_n] if len(filtered) < top_n else filtered[:top_n]
+
+    # Case-insensitive regex pattern
+    mask = df['title'].str.contains(_keyword_matcher(tuple(keywords)), na=False)
     filtered_df = df[mask]
 
     # If filtered results are too few, return all jobs up to top_n
@@ -447,6 +903,86 @@ def filter_top_jobs(df, keywords=['AI Engineer', 'Machine Learning', 'Data Scien
 
     return filtered_df.head(top_n)
 
+def select_top_jobs(jobs, keywords=['AI Engineer', 'Machine Learning', 'Data Scientist'], top_n=5,
+                    score=None, backups=0, seniority=None, families=None, locations=None):
+    """
+    Streaming filter_top_jobs: pick the top N from an iterable of job dicts
+    while holding at most top_n + backups of them
+
+    Jobs whose title matches a keyword win, ranked by score(job) (higher
+    first) and then by stream order; without a score function this returns
+    the same jobs as filter_top_jobs. If fewer than top_n match, the first
+    top_n jobs are returned instead, as filter_top_jobs does.
+
+    With backups, up to that many next-best jobs (further matches, then the
+    earliest of the rest) follow the top N, for callers that may need to
+    replace some of them.
+
+    seniority, families and locations restrict the jobs considered, as in
+    filter_top_jobs.
+    """
+    if seniority or families or locations:
+        jobs = (job for job in iter_located(iter_classified(jobs))
+                if title_allowed(job, seniority, families) and location_allowed(job, locations))
+    matcher = _keyword_matcher(tuple(keywords))
+    keep = top_n + backups
+    first = []  # (position, job) for the first `keep` jobs
+    heap = []  # Min-heap of (score, -position, job): the weakest kept match is on top
+    for position, job in enumerate(jobs):
+        if len(first) < keep:
+            first.append((position, job))
+        if not matcher.search(str(job.get('title') or '')):
+            continue
+        item = (score(job) if score else 0, -position, job)
+        if len(heap) < keep:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    matches = [(-negative_position, job) for _, negative_position, job
+               in sorted(heap, key=lambda item: item[:2], reverse=True)]
+    top = first[:top_n] if len(matches) < top_n else matches[:top_n]
+    chosen = {position for position, _ in top}
+    spares = []
+    for position, job in matches + first:
+        if len(spares) >= backups:
+            break
+        if position not in chosen:
+            chosen.add(position)
+            spares.append(job)
+    return [job for _, job in top] + spares
+
+def rank_candidates(jobs, keywords=['AI Engineer', 'Machine Learning', 'Data Scientist'], top_n=5, backups=10,
+                    seniority=None, families=None, locations=None):
+    """
+    The jobs filter_top_jobs would pick, followed by up to `backups`
+    next-best ones, as a list of dicts
+    """
+    return select_top_jobs(iter(to_records(jobs)), keywords=keywords, top_n=top_n, backups=backups,
+                           seniority=seniority, families=families, locations=locations)
+
+def stream_top_jobs(jobs, keywords, top_n=5, archive=None, score=None, backups=0, seniority=None,
+                    families=None, locations=None):
+    """
+    Run a job stream through dedupe, title and location tagging, optional
+    archiving and top-N selection
+    Returns (top jobs, number of unique jobs seen); memory stays at the top
+    N jobs (plus any backups) and the dedupe index however many jobs flow through
+    """
+    counted = {'jobs': 0}
+
+    def count(records):
+        for record in records:
+            counted['jobs'] += 1
+            yield record
+
+    stream = iter_located(iter_classified(count(iter_unique(jobs, subset=('title', 'company')))))
+    if archive is not None:
+        stream = archive.tap(stream)
+    top_jobs = select_top_jobs(stream, keywords=keywords, top_n=top_n, score=score, backups=backups,
+                               seniority=seniority, families=families, locations=locations)
+    return top_jobs, counted['jobs']
+
 # Test the scraper
 if __name__ == "__main__":
     print("\n" + "=" * 60)
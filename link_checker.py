@@ -0,0 +1,176 @@
+"""
+Pre-send link verification
+Checks that the top jobs' links still resolve, concurrently and within a fixed
+time budget, and replaces postings that have been taken down with the next
+ranked candidates
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from deadline import Deadline, DeadlineExceeded
+from rate_limiter import default_limiter, get_session
+from records import to_records
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+}
+
+# The posting is gone
+DEAD_STATUSES = {404, 410}
+
+# Servers that refuse HEAD; retry those with a GET whose body is never read
+HEAD_UNSUPPORTED_STATUSES = {400, 403, 405, 501}
+
+ALIVE = 'alive'
+DEAD = 'dead'
+UNKNOWN = 'unknown'  # Couldn't tell (timeout, throttled, bot wall); treated as alive
+
+
+def load_link_cache(cache_file):
+    """Load the URL -> {'status', 'checked_at'} cache from disk"""
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Could not read link cache: {e}")
+        return {}
+
+
+def save_link_cache(cache, cache_file, ttl_seconds):
+    """Persist the link cache, dropping expired entries"""
+    if not cache_file:
+        return
+    now = time.time()
+    cache = {url: entry for url, entry in cache.items() if now - entry.get('checked_at', 0) < ttl_seconds}
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"Could not save link cache: {e}")
+
+
+def check_link(url, timeout=5, session=None, deadline=None):
+    """
+    Return ALIVE, DEAD or UNKNOWN for a URL
+    Only 404/410 count as dead; anything inconclusive is UNKNOWN
+    """
+    import requests
+
+    if not url or not str(url).startswith('http'):
+        return UNKNOWN
+    http = session or get_session()
+    deadline = deadline or Deadline()
+    try:
+        default_limiter.wait(url, deadline)
+        response = http.head(url, headers=HEADERS, timeout=deadline.cap(timeout), allow_redirects=True)
+        if response.status_code in HEAD_UNSUPPORTED_STATUSES:
+            default_limiter.wait(url, deadline)
+            response = http.get(url, headers=HEADERS, timeout=deadline.cap(timeout), stream=True)
+            response.close()
+    except (requests.RequestException, DeadlineExceeded):
+        return UNKNOWN
+    default_limiter.record_response(url, response)
+
+    if response.status_code in DEAD_STATUSES:
+        return DEAD
+    if response.status_code < 400:
+        return ALIVE
+    return UNKNOWN
+
+
+def check_links(urls, max_workers=16, per_host_limit=4, timeout=5, deadline=None):
+    """
+    Check URLs concurrently, at most per_host_limit at a time per host
+    Returns {url: status}; URLs not finished by the deadline are UNKNOWN
+    """
+    deadline = deadline or Deadline()
+    host_slots = defaultdict(lambda: threading.BoundedSemaphore(per_host_limit))
+    slots_lock = threading.Lock()
+
+    def check(url):
+        with slots_lock:
+            slot = host_slots[urlparse(url).netloc]
+        with slot:
+            if deadline.expired():
+                return UNKNOWN
+            return check_link(url, timeout=timeout, deadline=deadline)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(check, url): url for url in urls}
+        done, _ = wait(futures, timeout=deadline.remaining())
+        results = {url: UNKNOWN for url in urls}
+        for future in done:
+            results[futures[future]] = future.result()
+        return results
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def verify_top_jobs(candidates, top_n=5, cache_file=None, ttl_hours=12, max_workers=16, per_host_limit=4,
+                    timeout=5, time_budget=20, deadline=None):
+    """
+    Keep the first top_n candidates whose links aren't dead
+
+    `candidates` is ranked best first (see rank_candidates). Links are
+    checked in waves: the current picks first, then only as many next-ranked
+    candidates as there are dead links to replace. Definite results are
+    cached for ttl_hours. Everything finishes within time_budget seconds (or
+    `deadline`, if sooner); links not checked in time are assumed alive.
+
+    Returns (selected jobs as dicts in rank order, dead jobs).
+    """
+    candidates = to_records(candidates)
+    budget = Deadline(time_budget)
+    if deadline is not None and deadline.remaining() is not None:
+        budget = Deadline(min(time_budget, deadline.remaining()))
+    ttl_seconds = ttl_hours * 3600
+    cache = load_link_cache(cache_file)
+    now = time.time()
+
+    def cached(url):
+        entry = cache.get(url)
+        if entry and now - entry.get('checked_at', 0) < ttl_seconds:
+            return entry['status']
+        return None
+
+    selected = []  # (rank, job)
+    dead = []
+    next_rank = 0
+    checked = cache_hits = 0
+    while len(selected) < top_n and next_rank < len(candidates):
+        wave = list(enumerate(candidates[next_rank:next_rank + top_n - len(selected)], next_rank))
+        next_rank += len(wave)
+        statuses = {job.get('link'): cached(job.get('link')) for _, job in wave}
+        cache_hits += sum(1 for status in statuses.values() if status)
+        to_check = [url for url, status in statuses.items() if status is None and url]
+        if to_check and not budget.expired():
+            results = check_links(to_check, max_workers=max_workers, per_host_limit=per_host_limit,
+                                  timeout=timeout, deadline=budget)
+            checked += len(to_check)
+            for url, status in results.items():
+                statuses[url] = status
+                if status != UNKNOWN:
+                    cache[url] = {'status': status, 'checked_at': time.time()}
+        for rank, job in wave:
+            if statuses.get(job.get('link')) == DEAD:
+                dead.append(job)
+            else:
+                selected.append((rank, job))
+
+    save_link_cache(cache, cache_file, ttl_seconds)
+    print(f"Checked {checked} links ({cache_hits} cached), {len(dead)} dead")
+    for job in dead:
+        print(f"  Dropped (link gone): {job.get('title')} at {job.get('company')}")
+    return [job for _, job in sorted(selected, key=lambda item: item[0])], dead
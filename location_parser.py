@@ -0,0 +1,216 @@
+"""
+Location parsing
+Resolves free-text job locations ("Remote (EU)", "Menlo Park, CA",
+"Berlin, Germany", "Anywhere, UTC-3 to UTC+3") to a country, a region, a
+remote flag and a timezone band, using the offline gazetteer bundled in
+gazetteer.csv. The gazetteer is indexed once into a hash of place-name
+token sequences, and results are memoized since the same strings repeat
+across thousands of postings.
+"""
+
+import csv
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from records import is_frame
+
+Location = namedtuple('Location', ['country', 'region', 'remote', 'timezone_band'])
+
+LOCATION_FIELDS = ['country', 'region', 'is_remote', 'timezone_band']
+
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+
+REGIONS = ['north_america', 'latam', 'europe', 'mea', 'apac']
+TIMEZONE_BANDS = ['americas', 'emea', 'apac']
+
+REMOTE_WORDS = {'remote', 'anywhere', 'worldwide', 'global', 'distributed', 'wfh'}
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|/", re.UNICODE)
+
+# "Menlo Park, CA" / "Toronto, ON": two-letter codes only count as states/provinces after a comma
+STATE_CODE_PATTERN = re.compile(r",\s*([A-Z]{2})\b")
+
+UTC_OFFSET_PATTERN = re.compile(r"\b(?:utc|gmt)\s*([+\-−])\s*(\d{1,2})(?::?(\d{2}))?", re.IGNORECASE)
+
+UNKNOWN = Location('', '', False, '')
+
+REGION_BANDS = {'north_america': 'americas', 'latam': 'americas', 'europe': 'emea', 'mea': 'emea', 'apac': 'apac'}
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer(gazetteer_file=GAZETTEER_FILE):
+    """
+    Index the gazetteer once: returns (place-name tokens -> row, longest
+    name in tokens, two-letter state/province code -> row, country -> region)
+    """
+    index = {}
+    states = {}
+    country_regions = {}
+    with open(gazetteer_file, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            row['utc_offset'] = float(row['utc_offset']) if row['utc_offset'] else None
+            if row['kind'] == 'country':
+                country_regions.setdefault(row['country'], row['region'])
+            if row['kind'] in ('state', 'province') and len(row['name']) == 2:
+                states[row['name'].upper()] = row  # Matched by STATE_CODE_PATTERN instead
+                continue
+            index.setdefault(tuple(TOKEN_PATTERN.findall(row['name'].lower())), row)
+    return index, max(len(tokens) for tokens in index), states, country_regions
+
+
+def timezone_band(utc_offset):
+    """'americas', 'emea' or 'apac' for a UTC offset in hours"""
+    if utc_offset is None:
+        return ''
+    if utc_offset <= -3:
+        return 'americas'
+    if utc_offset <= 4:
+        return 'emea'
+    return 'apac'
+
+
+def _matches(text):
+    """Gazetteer rows named in `text`, longest names first, left to right"""
+    index, longest, _, _ = load_gazetteer()
+    original = TOKEN_PATTERN.findall(text)
+    tokens = [token.lower() for token in original]
+    found = []
+    position = 0
+    while position < len(tokens):
+        for length in range(min(longest, len(tokens) - position), 0, -1):
+            row = index.get(tuple(tokens[position:position + length]))
+            # Short names (US, UK, EU, SF, EST...) only count when written in capitals
+            if row and (len(row['name']) > 3 or original[position].isupper()):
+                found.append(row)
+                position += length
+                break
+        else:
+            position += 1
+    return tokens, found
+
+
+@lru_cache(maxsize=20000)
+def parse_location(text):
+    """Return the Location (country, region, remote, timezone_band) for a location string"""
+    text = str(text or '').strip()
+    if not text:
+        return UNKNOWN
+    tokens, rows = _matches(text)
+    states = load_gazetteer()[2]
+    rows += [states[code] for code in STATE_CODE_PATTERN.findall(text) if code in states]
+
+    remote = any(token in REMOTE_WORDS for token in tokens) or 'work from home' in text.lower()
+    # Countries and states beat cities ("Cambridge, MA"), and any place beats bare regions and timezones
+    places = [row for row in rows if row['country'] and row['kind'] != 'city'] \
+        or [row for row in rows if row['country']]
+    countries = {row['country'] for row in places}
+    regions = {row['region'] for row in rows if row['region']}
+    offsets = [row['utc_offset'] for row in rows if row['utc_offset'] is not None]
+    offsets += [(-1 if sign in '-−' else 1) * (int(hours) + int(minutes or 0) / 60)
+                for sign, hours, minutes in UTC_OFFSET_PATTERN.findall(text)]
+
+    country = countries.pop() if len(countries) == 1 else ''
+    if places:
+        regions = {row['region'] for row in places}
+    region = regions.pop() if len(regions) == 1 else ''
+    bands = {timezone_band(offset) for offset in offsets}
+    band = bands.pop() if len(bands) == 1 else ''
+    if not band and region:
+        band = REGION_BANDS[region]
+    return Location(country, region, remote, band)
+
+
+def locate_jobs(jobs):
+    """
+    Add country, region, is_remote and timezone_band to every job
+    Accepts a DataFrame or a list of job dicts and returns the same kind;
+    a DataFrame gets region and timezone_band as categorical columns.
+    """
+    if not is_frame(jobs):
+        for job in jobs:
+            location = parse_location(job.get('location'))
+            job['country'], job['region'], job['is_remote'], job['timezone_band'] = location
+        return jobs
+
+    import pandas as pd
+    codes, locations = pd.factorize(jobs['location'].fillna('').astype(str))
+    table = pd.DataFrame([parse_location(location) for location in locations], columns=LOCATION_FIELDS).take(codes)
+    return jobs.assign(
+        country=table['country'].to_numpy(),
+        region=pd.Categorical(table['region'], categories=[''] + REGIONS),
+        is_remote=table['is_remote'].to_numpy(dtype=bool),
+        timezone_band=pd.Categorical(table['timezone_band'], categories=[''] + TIMEZONE_BANDS),
+    )
+
+
+def iter_located(jobs):
+    """Streaming locate_jobs for an iterable of job dicts"""
+    for job in jobs:
+        location = parse_location(job.get('location'))
+        job['country'], job['region'], job['is_remote'], job['timezone_band'] = location
+        yield job
+
+
+def location_allowed(job, locations=None):
+    """
+    True if a located job dict passes a location filter
+
+    `locations` is a dict with any of 'countries' (ISO codes), 'regions',
+    'timezone_bands' and 'remote_only'. Only what is known about a job can
+    exclude it: a worldwide remote posting passes a country filter, and
+    "Remote (EU)" passes a filter for any European country (but "Remote,
+    EST" doesn't pass a filter for Germany).
+    """
+    if not locations:
+        return True
+    if locations.get('remote_only') and not job.get('is_remote'):
+        return False
+    countries = locations.get('countries')
+    if countries and job.get('country') and job['country'] not in countries:
+        return False
+    if countries and not job.get('country'):
+        regions = _regions_of(countries)
+        if job.get('region') and job['region'] not in regions:
+            return False
+        if job.get('timezone_band') and job['timezone_band'] not in {REGION_BANDS[region] for region in regions}:
+            return False
+    regions = locations.get('regions')
+    if regions and job.get('region') and job['region'] not in regions:
+        return False
+    if regions and not job.get('region') and job.get('timezone_band') \
+            and job['timezone_band'] not in {REGION_BANDS[region] for region in regions}:
+        return False
+    bands = locations.get('timezone_bands')
+    if bands and job.get('timezone_band') and job['timezone_band'] not in bands:
+        return False
+    return True
+
+
+def _regions_of(countries):
+    country_regions = load_gazetteer()[3]
+    return {country_regions[country] for country in countries if country in country_regions}
+
+
+def location_mask(jobs_df, locations=None):
+    """Boolean Series of the located DataFrame rows location_allowed would keep"""
+    import pandas as pd
+    mask = pd.Series(True, index=jobs_df.index)
+    if not locations:
+        return mask
+    if locations.get('remote_only'):
+        mask &= jobs_df['is_remote']
+    for key, column in (('countries', 'country'), ('regions', 'region'), ('timezone_bands', 'timezone_band')):
+        if locations.get(key):
+            mask &= (jobs_df[column] == '') | jobs_df[column].isin(locations[key])
+    if locations.get('regions'):
+        mask &= (jobs_df['region'] != '') | (jobs_df['timezone_band'] == '') \
+            | jobs_df['timezone_band'].isin({REGION_BANDS[region] for region in locations['regions']})
+    if locations.get('countries'):
+        regions = _regions_of(locations['countries'])
+        unplaced = jobs_df['country'] == ''
+        mask &= ~unplaced | (jobs_df['region'] == '') | jobs_df['region'].isin(regions)
+        mask &= ~unplaced | (jobs_df['timezone_band'] == '') \
+            | jobs_df['timezone_band'].isin({REGION_BANDS[region] for region in regions})
+    return mask
@@ -0,0 +1,367 @@
+"""
+Durable outbox for report emails
+Rendered reports and one message per recipient are stored in SQLite, and a
+dispatcher drains them at a shaped rate: a token bucket per sender account,
+a daily cap, optional spreading of big sends over a time window, and retries
+with exponential backoff. Anything not delivered when a run ends stays queued
+and goes out on the next drain, even after a restart.
+
+Show or drain the outbox by hand with:
+
+    python outbox.py            # status
+    python outbox.py drain      # send whatever is due
+
+(add --cloud to use cloud_config.py's settings instead of config.py's)
+"""
+
+import json
+import os
+import smtplib
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+
+from deadline import Deadline, DeadlineExceeded
+from rate_limiter import TokenBucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    run_id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    text TEXT NOT NULL,
+    jobs TEXT,                              -- JSON list of the postings in the report
+    checkpoint_run_id TEXT,                 -- run whose checkpoint records the deliveries
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES reports (run_id),
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',  -- queued, sending, sent, failed
+    owner TEXT,                             -- dispatcher holding a 'sending' message
+    leased_until REAL,                      -- a 'sending' message is queued again after this
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    UNIQUE (run_id, recipient)
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS messages_sent ON messages (sender, sent_at);
+"""
+
+# Columns added since the first version of the schema, for outbox files created before them
+ADDED_COLUMNS = {
+    'reports': [('jobs', 'TEXT'), ('checkpoint_run_id', 'TEXT')],
+    'messages': [('owner', 'TEXT'), ('leased_until', 'REAL')],
+}
+
+# Gmail's "try again later" answers; retried after backoff, not failed
+QUOTA_MARKERS = ('4.7.0', '5.4.5', 'quota', 'rate limit', 'too many')
+
+# One token bucket per sender account for the whole process, shared by every
+# dispatcher, so back-to-back runs (or the daemon) can't each get a fresh burst
+_sender_buckets = {}
+_sender_buckets_lock = threading.Lock()
+
+
+class Outbox:
+    """
+    SQLite store of rendered reports and their per-recipient messages
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+                for column, column_type in columns:
+                    if column not in existing:
+                        db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def enqueue(self, run_id, sender, recipients, subject, html, text, jobs=None, checkpoint_run_id=None):
+        """
+        Store a report and queue it for each recipient (already-queued ones are left alone)
+        `jobs` (JSON-serialisable) and checkpoint_run_id are handed back with
+        each of its messages, so whoever drains the outbox can record the delivery.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('INSERT OR IGNORE INTO reports (run_id, subject, html, text, jobs, checkpoint_run_id, created_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (run_id, subject, html, text, json.dumps(jobs) if jobs is not None else None,
+                        checkpoint_run_id, now))
+            db.executemany(
+                'INSERT OR IGNORE INTO messages (run_id, sender, recipient, next_attempt_at, created_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(run_id, sender, recipient, now, now) for recipient in recipients]
+            )
+            db.execute('COMMIT')
+
+    def _requeue_expired(self, db, now):
+        """Put back messages whose sender's lease ran out (a dispatcher that crashed or hung)"""
+        db.execute("UPDATE messages SET status = 'queued', owner = NULL, leased_until = NULL "
+                   "WHERE status = 'sending' AND leased_until < ?", (now,))
+
+    def due(self, senders, now=None, limit=100):
+        """
+        Queued messages from `senders` whose next attempt is due, oldest first
+        Another dispatcher may take them first: claim() each before sending it.
+        """
+        now = now or time.time()
+        placeholders = ', '.join('?' for _ in senders)
+        with self._connect() as db:
+            self._requeue_expired(db, now)
+            rows = db.execute(
+                "SELECT m.id, m.run_id, m.sender, m.recipient, m.attempts, r.subject, r.html, r.text, "
+                "r.jobs, r.checkpoint_run_id "
+                "FROM messages m JOIN reports r ON r.run_id = m.run_id "
+                f"WHERE m.status = 'queued' AND m.next_attempt_at <= ? AND m.sender IN ({placeholders}) "
+                "ORDER BY m.next_attempt_at, m.id LIMIT ?",
+                (now, *senders, limit)
+            ).fetchall()
+        fields = ('id', 'run_id', 'sender', 'recipient', 'attempts', 'subject', 'html', 'text', 'jobs',
+                  'checkpoint_run_id')
+        messages = [dict(zip(fields, row)) for row in rows]
+        for message in messages:
+            message['jobs'] = json.loads(message['jobs']) if message['jobs'] else None
+        return messages
+
+    def claim(self, message_id, owner, lease_seconds=300):
+        """
+        Take a queued message for sending, for up to `lease_seconds`
+        Returns False if another dispatcher got it first. A claimed message
+        is finished with mark_sent, mark_retry, mark_failed or release.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                self._requeue_expired(db, now)
+                cursor = db.execute(
+                    "UPDATE messages SET status = 'sending', owner = ?, leased_until = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (owner, now + lease_seconds, message_id)
+                )
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+        return cursor.rowcount == 1
+
+    def release(self, message_id):
+        """Give a claimed message back without counting an attempt"""
+        with self._connect() as db:
+            db.execute("UPDATE messages SET status = 'queued', owner = NULL, leased_until = NULL WHERE id = ?",
+                       (message_id,))
+
+    def next_attempt_at(self, senders):
+        """When the earliest queued message from `senders` becomes due, or None if nothing is queued"""
+        placeholders = ', '.join('?' for _ in senders)
+        with self._connect() as db:
+            row = db.execute(f"SELECT MIN(next_attempt_at) FROM messages WHERE status = 'queued' "
+                             f"AND sender IN ({placeholders})", tuple(senders)).fetchone()
+        return row[0]
+
+    def queued(self, sender):
+        """Number of messages still waiting to go out from an account"""
+        with self._connect() as db:
+            row = db.execute("SELECT COUNT(*) FROM messages WHERE sender = ? AND status = 'queued'",
+                             (sender,)).fetchone()
+        return row[0]
+
+    def mark_sent(self, message_id):
+        with self._connect() as db:
+            db.execute("UPDATE messages SET status = 'sent', sent_at = ?, attempts = attempts + 1, last_error = NULL, "
+                       "owner = NULL, leased_until = NULL WHERE id = ?", (time.time(), message_id))
+
+    def mark_retry(self, message_id, error, retry_at):
+        with self._connect() as db:
+            db.execute("UPDATE messages SET status = 'queued', owner = NULL, leased_until = NULL, "
+                       "attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                       (str(error), retry_at, message_id))
+
+    def defer(self, message_id, until, reason):
+        """Push a message back without counting it as a failed attempt"""
+        with self._connect() as db:
+            db.execute("UPDATE messages SET last_error = ?, next_attempt_at = ? WHERE id = ?",
+                       (reason, until, message_id))
+
+    def mark_failed(self, message_id, error):
+        with self._connect() as db:
+            db.execute("UPDATE messages SET status = 'failed', owner = NULL, leased_until = NULL, "
+                       "attempts = attempts + 1, last_error = ? WHERE id = ?", (str(error), message_id))
+
+    def sent_since(self, sender, since):
+        """Messages sent from an account since a timestamp (for quotas that must survive restarts)"""
+        with self._connect() as db:
+            row = db.execute("SELECT COUNT(*) FROM messages WHERE sender = ? AND sent_at >= ?",
+                             (sender, since)).fetchone()
+        return row[0]
+
+    def sent_recipients(self, run_id):
+        with self._connect() as db:
+            rows = db.execute("SELECT recipient FROM messages WHERE run_id = ? AND status = 'sent'", (run_id,))
+            return {row[0] for row in rows.fetchall()}
+
+    def counts(self, run_id=None):
+        """{status: number of messages}, for one run or all of them"""
+        with self._connect() as db:
+            if run_id:
+                rows = db.execute('SELECT status, COUNT(*) FROM messages WHERE run_id = ? GROUP BY status', (run_id,))
+            else:
+                rows = db.execute('SELECT status, COUNT(*) FROM messages GROUP BY status')
+            return dict(rows.fetchall())
+
+    def purge(self, older_than_days=30):
+        """Delete finished messages, and reports nothing refers to any more"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._connect() as db:
+            db.execute("DELETE FROM messages WHERE status IN ('sent', 'failed') AND created_at < ?", (cutoff,))
+            db.execute('DELETE FROM reports WHERE run_id NOT IN (SELECT DISTINCT run_id FROM messages)')
+
+
+def is_permanent(error):
+    """True for SMTP errors that retrying won't fix (bad recipient, rejected message)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # Fixable by the operator; keep the mail until then
+    code = getattr(error, 'smtp_code', None)
+    message = str(getattr(error, 'smtp_error', error)).lower()
+    if any(marker in message for marker in QUOTA_MARKERS):
+        return False
+    return code is not None and 500 <= code < 600
+
+
+class OutboxDispatcher:
+    """
+    Drains an Outbox at a rate each sender account can sustain
+    """
+
+    def __init__(self, outbox, credentials, rate_per_minute=20, burst=5, daily_limit=400,
+                 spread_seconds=0, max_attempts=5, retry_base_seconds=60, lease_seconds=300):
+        self.outbox = outbox
+        self.credentials = credentials  # sender -> password
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.daily_limit = daily_limit
+        self.spread_seconds = spread_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{id(self):x}"
+        self.buckets = {}
+
+    def _bucket(self, sender):
+        """The process-wide bucket for a sender, paced for this dispatcher's settings"""
+        if sender not in self.buckets:
+            rate = self.rate_per_minute / 60
+            pending = self.outbox.queued(sender)
+            if self.spread_seconds and pending:
+                # Pace a big send evenly over the window instead of at full speed
+                rate = min(rate, max(pending / self.spread_seconds, 1 / 3600))
+            with _sender_buckets_lock:
+                bucket = _sender_buckets.get(sender)
+                if bucket is None:
+                    bucket = TokenBucket(rate, capacity=self.burst)
+                    # Don't let a restart hand out a fresh burst on top of what was just sent
+                    bucket.tokens = max(0, self.burst - self.outbox.sent_since(sender, time.time() - 60))
+                    _sender_buckets[sender] = bucket
+            with bucket.lock:
+                bucket.base_rate = rate
+                bucket.rate = min(bucket.rate, rate)
+            self.buckets[sender] = bucket
+        return self.buckets[sender]
+
+    def _retry_delay(self, attempts):
+        return self.retry_base_seconds * (2 ** attempts)
+
+    def drain(self, send, deadline=None, on_sent=None):
+        """
+        Send due messages until the outbox is empty or `deadline` passes
+
+        `send(message, password)` delivers one message and raises on failure.
+        Only mail from accounts in `credentials` is sent, and only messages
+        this dispatcher has claimed, so several can drain one outbox. Retries
+        that come due before the deadline are attempted in this drain.
+        `on_sent(message)` is called after each delivery, whichever run
+        queued the message. Returns the number of messages sent.
+        """
+        deadline = deadline or Deadline()
+        senders = list(self.credentials)
+        sent = 0
+        while not deadline.expired():
+            messages = self.outbox.due(senders)
+            if not messages:
+                next_at = self.outbox.next_attempt_at(senders)
+                remaining = deadline.remaining()
+                if next_at is None or (remaining is not None and next_at - time.time() > remaining):
+                    break
+                time.sleep(max(0.0, min(next_at - time.time(), 60)))
+                continue
+
+            for message in messages:
+                sender = message['sender']
+                if self.outbox.sent_since(sender, time.time() - 86400) >= self.daily_limit:
+                    print(f"Daily limit of {self.daily_limit} reached for {sender}, deferring {message['recipient']}")
+                    self.outbox.defer(message['id'], time.time() + 3600, 'daily limit reached')
+                    continue
+                try:
+                    self._bucket(sender).acquire(deadline)
+                except DeadlineExceeded:
+                    return sent
+                if not self.outbox.claim(message['id'], self.owner, self.lease_seconds):
+                    continue  # Another dispatcher is sending it
+                try:
+                    send(message, self.credentials[sender])
+                except DeadlineExceeded:
+                    self.outbox.release(message['id'])  # Out of time before it went out; it stays queued
+                    return sent
+                except Exception as e:
+                    if is_permanent(e) or message['attempts'] + 1 >= self.max_attempts:
+                        print(f"Giving up on {message['recipient']}: {e}")
+                        self.outbox.mark_failed(message['id'], e)
+                    else:
+                        delay = self._retry_delay(message['attempts'])
+                        print(f"Will retry {message['recipient']} in {delay:.0f}s")
+                        self.outbox.mark_retry(message['id'], e, time.time() + delay)
+                        self._bucket(sender).slow_down()
+                    continue
+                self.outbox.mark_sent(message['id'])
+                self._bucket(sender).speed_up()
+                sent += 1
+                if on_sent:
+                    on_sent(message)
+        return sent
+
+
+if __name__ == "__main__":
+    from config_loader import load_config
+    config = load_config()
+
+    outbox = Outbox(config.OUTBOX_FILE)
+    if len(sys.argv) > 1 and sys.argv[1] == 'drain':
+        from email_sender import SMTPConnectionPool
+        from report_pipeline import drain_outbox, open_sent_history
+        pool = SMTPConnectionPool(config.SMTP_HOST, config.SMTP_PORT, use_ssl=config.SMTP_USE_SSL)
+        history = open_sent_history(config) if config.USE_SENT_HISTORY else None
+        sent = drain_outbox(config, outbox, pool, Deadline(config.RUN_TIME_BUDGET), history)
+        pool.close()
+        if history:
+            history.save()
+        print(f"Sent {sent} messages")
+    print(f"Outbox: {outbox.counts() or 'empty'}")
@@ -0,0 +1,117 @@
+"""
+Content-addressed cache of parsed listing pages
+Entries are keyed by a hash of the response body, the source and its parser
+version, so an unchanged page skips HTML parsing entirely even when the board
+sends no useful caching headers
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# A .tmp file this old is left over from a writer that died; younger ones
+# may still be being written by another process sharing the directory
+TMP_GRACE_SECONDS = 600
+
+
+class ParseCache:
+    """
+    One JSON file per parsed page under `directory`
+
+    Entries not used for `max_age_days` are dropped, then the least recently
+    used ones until the cache fits in `max_bytes`. A body hash can't go stale,
+    so age only matters for reclaiming space.
+    """
+
+    def __init__(self, directory, max_age_days=14, max_bytes=20 * 1024 * 1024):
+        self.directory = directory
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source, content, max_jobs=None):
+        """Hash of the body plus everything that changes what the parser returns"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        digest = hashlib.sha256(content)
+        digest.update(f"|{source['name']}|v{source.get('parser_version', 1)}|{max_jobs}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        """Cached job records for a key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            print(f"Could not read parse cache entry: {e}")
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass  # Evicted by another process since we read it; the records are still good
+        self.hits += 1
+        return entry['records']
+
+    def put(self, key, records):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            # Unique per writer, so processes and threads saving the same page don't collide
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'cached_at': time.time(), 'records': records}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Could not save parse cache entry: {e}")
+
+    @staticmethod
+    def _remove(path):
+        """Delete a file another process may have deleted (or be replacing) already"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """
+        Evict expired entries, then least recently used ones until under
+        max_bytes. Safe to run while other processes use the directory.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith('.tmp'):
+                if now - stat.st_mtime > TMP_GRACE_SECONDS:
+                    self._remove(path)
+            elif now - stat.st_mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
@@ -0,0 +1,305 @@
+"""
+Per-host rate limiting and circuit breaking for outgoing HTTP requests
+Token buckets adapt to 429/503 responses and Retry-After headers; the circuit
+breaker skips sources that keep failing, with its state persisted between runs
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from deadline import DeadlineExceeded
+
+# Statuses that mean "slow down" rather than "this request is wrong"
+THROTTLE_STATUSES = {429, 503}
+
+# Fail fast on dead hosts, but give slow pages time to finish downloading
+DEFAULT_TIMEOUT = (5, 15)
+
+# Never sleep longer than this on a single Retry-After
+MAX_RETRY_AFTER = 30
+
+# Pause before the first retry of a failed request; it doubles with each further retry
+RETRY_BACKOFF = 0.5
+
+
+class CircuitOpenError(Exception):
+    """Raised when a source is skipped because its circuit is open"""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `capacity` banked
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self, deadline=None):
+        """Block until a token is available"""
+        wait = self.reserve()
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining is not None and wait > remaining:
+                raise DeadlineExceeded("Deadline would pass while waiting for the rate limiter")
+        if wait > 0:
+            time.sleep(wait)
+
+    def slow_down(self, retry_after=None, min_rate=0.1):
+        """Halve the rate and, if given, pause the bucket for Retry-After seconds"""
+        with self.lock:
+            self.rate = max(min_rate, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def speed_up(self):
+        """Recover additively towards the configured rate after a success"""
+        with self.lock:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class HostRateLimiter:
+    """
+    One adaptive token bucket per host
+    """
+
+    def __init__(self, rate=2.0, capacity=2):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self.buckets[host]
+
+    def wait(self, url, deadline=None):
+        self.bucket(url).acquire(deadline)
+
+    def record_response(self, url, response):
+        """Adapt the host's rate to the response status"""
+        bucket = self.bucket(url)
+        if response.status_code in THROTTLE_STATUSES:
+            bucket.slow_down(parse_retry_after(response.headers.get('Retry-After')))
+        elif response.status_code < 400:
+            bucket.speed_up()
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Per-source circuit breaker
+
+    After `failure_threshold` consecutive failed fetches (a fetch fails once
+    its retries are used up) a source is skipped for the rest of the run. A source that trips in `trip_runs` consecutive runs is
+    skipped for the next `cooldown_runs` runs, then gets one trial run.
+    """
+
+    def __init__(self, state_file=None, failure_threshold=3, trip_runs=2, cooldown_runs=2):
+        self.state_file = state_file
+        self.failure_threshold = failure_threshold
+        self.trip_runs = trip_runs
+        self.cooldown_runs = cooldown_runs
+        self.failures = {}
+        self.tripped = set()
+        self.lock = threading.Lock()
+        self.state = self._load()
+        self.skipped = {source for source, entry in self.state.items() if entry.get('skip_runs', 0) > 0}
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Could not read circuit breaker state: {e}")
+            return {}
+
+    def allow(self, source):
+        """True if requests to this source may go ahead"""
+        with self.lock:
+            return source not in self.tripped and source not in self.skipped
+
+    def record_success(self, source):
+        with self.lock:
+            self.failures[source] = 0
+
+    def record_failure(self, source):
+        with self.lock:
+            self.failures[source] = self.failures.get(source, 0) + 1
+            if self.failures[source] >= self.failure_threshold and source not in self.tripped:
+                self.tripped.add(source)
+                print(f"  Circuit opened for {source} after {self.failures[source]} failures")
+
+    def end_run(self):
+        """Roll per-run results into the persisted state and save it"""
+        with self.lock:
+            for source in set(self.state) | set(self.failures) | self.tripped:
+                entry = self.state.setdefault(source, {'tripped_runs': 0, 'skip_runs': 0})
+                if source in self.skipped:
+                    entry['skip_runs'] = max(0, entry.get('skip_runs', 0) - 1)
+                elif source in self.tripped:
+                    entry['tripped_runs'] = entry.get('tripped_runs', 0) + 1
+                    if entry['tripped_runs'] >= self.trip_runs:
+                        entry['skip_runs'] = self.cooldown_runs
+                        entry['tripped_runs'] = 0
+                    entry['last_failure'] = datetime.now().isoformat(timespec='seconds')
+                elif source in self.failures:
+                    entry['tripped_runs'] = 0
+            self._save()
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"Could not save circuit breaker state: {e}")
+
+
+# Shared across scrapers and enrichment so limits hold per host, not per caller
+default_limiter = HostRateLimiter()
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared requests session so connections to each board are reused"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+        return _session
+
+
+def _read_before_deadline(response, deadline, chunk_size=65536):
+    """Download a streamed body, abandoning it if the deadline passes mid-transfer"""
+    chunks = []
+    try:
+        for chunk in response.iter_content(chunk_size):
+            chunks.append(chunk)
+            if deadline.expired():
+                raise DeadlineExceeded(f"Deadline passed while downloading {response.url}")
+    finally:
+        response.close()
+    response._content = b''.join(chunks)
+    return response
+
+
+def _back_off(attempt, deadline=None):
+    """Sleep before retry number `attempt` (1 for the first), never past the deadline"""
+    delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is not None:
+        delay = min(delay, max(0.0, remaining))
+    time.sleep(delay)
+
+
+def polite_get(url, headers=None, timeout=DEFAULT_TIMEOUT, source=None, breaker=None,
+               limiter=None, session=None, max_retries=2, deadline=None, stream=False):
+    """
+    GET a URL through the per-host rate limiter and circuit breaker
+
+    Connection errors, timeouts, throttling statuses and server errors are
+    retried up to `max_retries` times, waiting RETRY_BACKOFF seconds before
+    the first retry and twice as long before each further one. The breaker
+    counts one failure per call, once the retries are used up. Raises
+    CircuitOpenError once the source's circuit opens, and DeadlineExceeded
+    if `deadline` passes before the body has arrived.
+    With stream=True the body is left unread: the caller reads it with
+    iter_content (checking the deadline itself) and closes the response.
+    """
+    import requests
+
+    source = source or urlparse(url).netloc
+    limiter = limiter or default_limiter
+    http = session or get_session()
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            _back_off(attempt, deadline)
+        if breaker and not breaker.allow(source):
+            raise CircuitOpenError(f"{source} skipped (circuit open)")
+        if deadline is not None:
+            deadline.check(f"fetching {url}")
+        limiter.wait(url, deadline)
+        try:
+            if stream:
+                response = http.get(url, headers=headers, stream=True,
+                                    timeout=deadline.cap(timeout) if deadline is not None else timeout)
+            elif deadline is not None:
+                response = http.get(url, headers=headers, timeout=deadline.cap(timeout), stream=True)
+                response = _read_before_deadline(response, deadline)
+            else:
+                response = http.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Deadline passed while fetching {url}") from e
+            last_error = e
+            continue
+
+        limiter.record_response(url, response)
+        if response.status_code in THROTTLE_STATUSES or response.status_code >= 500:
+            if stream:
+                response.close()
+            last_error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after and retry_after > MAX_RETRY_AFTER:
+                break
+            continue
+
+        if breaker:
+            breaker.record_success(source)
+        return response
+
+    if breaker:
+        breaker.record_failure(source)
+    raise last_error
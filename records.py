@@ -0,0 +1,166 @@
+"""
+Helpers for passing job listings around either as a pandas DataFrame or as a
+plain list of dicts ("record mode")
+
+Record mode lets the scrape -> filter -> render -> send path run without
+importing pandas at all; pandas is only imported here when a DataFrame is
+actually asked for.
+"""
+
+import csv
+
+
+def is_frame(jobs):
+    """True for a pandas DataFrame, False for a list of dicts"""
+    return hasattr(jobs, 'iterrows')
+
+
+def to_records(jobs):
+    """List of dicts for either representation (copies, safe to modify)"""
+    if is_frame(jobs):
+        return jobs.to_dict('records')
+    return [dict(job) for job in jobs]
+
+
+def to_frame(records):
+    import pandas as pd
+    return pd.DataFrame(records)
+
+
+def like(jobs, records):
+    """Return `records` in the same representation as `jobs`"""
+    return to_frame(records) if is_frame(jobs) else records
+
+
+def iter_jobs(jobs):
+    """
+    Yield (number, job) pairs for display
+
+    DataFrames keep their historical numbering (index + 1); record lists are
+    numbered by position.
+    """
+    if is_frame(jobs):
+        for idx, job in jobs.iterrows():
+            yield idx + 1, job
+    else:
+        for number, job in enumerate(jobs, 1):
+            yield number, job
+
+
+def iter_unique(records, subset=('title', 'company')):
+    """Yield records whose `subset` fields haven't been seen yet (keep first)"""
+    seen = set()
+    for record in records:
+        key = tuple(record.get(field) for field in subset)
+        if key not in seen:
+            seen.add(key)
+            yield record
+
+
+def dedupe_records(records, subset=('title', 'company')):
+    """Drop later records whose `subset` fields repeat an earlier one (keep first)"""
+    return list(iter_unique(records, subset))
+
+
+def to_checkpoint(jobs):
+    """JSON-friendly form of either representation, keeping a DataFrame's index"""
+    if is_frame(jobs):
+        return jobs.to_dict('split')
+    return {'records': jobs}
+
+
+def from_checkpoint(data):
+    if 'records' in data:
+        return data['records']
+    import pandas as pd
+    return pd.DataFrame(data['data'], index=data['index'], columns=data['columns'])
+
+
+def write_csv(jobs, filename):
+    """Write jobs to CSV with the same layout as DataFrame.to_csv(index=False)"""
+    if is_frame(jobs):
+        jobs.to_csv(filename, index=False)
+        return
+    fieldnames = []
+    for job in jobs:
+        fieldnames.extend(field for field in job if field not in fieldnames)
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(jobs)
+
+
+class BatchCsvWriter:
+    """
+    Write a stream of records to CSV in batches as they pass through
+
+        archive = BatchCsvWriter('jobs.csv')
+        for job in archive.tap(jobs):
+            ...
+        archive.close()
+
+    Columns come from the first record; later records may leave fields out.
+    If the file can't be written, archiving stops (the error is kept in
+    `error`) but records keep flowing through.
+    """
+
+    def __init__(self, filename, batch_size=500):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.batch = []
+        self.rows_written = 0
+        self.error = None
+        self._file = None
+        self._writer = None
+
+    def write(self, record):
+        if self.error is not None:
+            return
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        try:
+            if self._writer is None:
+                self._file = open(self.filename, 'w', newline='', encoding='utf-8')
+                self._writer = csv.DictWriter(self._file, fieldnames=list(self.batch[0]), extrasaction='ignore')
+                self._writer.writeheader()
+            self._writer.writerows(self.batch)
+            self.rows_written += len(self.batch)
+        except OSError as e:
+            self.error = e
+        self.batch = []
+
+    def tap(self, records):
+        """Pass records through unchanged, archiving each one"""
+        for record in records:
+            self.write(record)
+            yield record
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+
+def merge_into_csv(source, filename, updates, key=('title', 'company')):
+    """
+    Copy the CSV at `source` to `filename` row by row, replacing each row
+    that has the same `key` fields as one of the `updates` records with
+    that record's fields; fields the CSV didn't have become new columns
+    """
+    by_key = {tuple(str(record.get(field, '')) for field in key): record for record in updates}
+    with open(source, 'r', newline='', encoding='utf-8') as f_in, \
+            open(filename, 'w', newline='', encoding='utf-8') as f_out:
+        reader = csv.DictReader(f_in)
+        fieldnames = list(reader.fieldnames or [])
+        for record in updates:
+            fieldnames.extend(field for field in record if field not in fieldnames)
+        writer = csv.DictWriter(f_out, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for row in reader:
+            update = by_key.get(tuple(row.get(field, '') for field in key))
+            writer.writerow({**row, **update} if update else row)
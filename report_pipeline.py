@@ -0,0 +1,496 @@
+"""
+One report run, shared by main.py and cloud_main.py
+Scrapes, ranks, renders and delivers the weekly report with the settings
+of whichever config module the entry point passes in.
+"""
+
+from datetime import datetime
+import os
+import sys
+
+# Import our modules (pandas, requests and BeautifulSoup are only loaded by
+# the stages that need them, so `--test` and record mode start fast)
+from job_scraper import scrape_ai_jobs, filter_top_jobs, iter_ai_jobs, stream_top_jobs, rank_candidates
+from email_sender import create_html_email, create_compact_html_email, create_plain_text_email, send_email, SMTPConnectionPool
+from deadline import RunBudget, DeadlineExceeded
+from checkpoint import RunCheckpoint, prune_checkpoints
+from parse_cache import ParseCache
+from records import to_checkpoint, from_checkpoint, to_records, write_csv, merge_into_csv, BatchCsvWriter
+from source_stats import SourceStats
+from stage_graph import StageGraph
+from title_classifier import classify_jobs
+from location_parser import locate_jobs
+
+def save_data(config, df, filename=None):
+    """Save scraped data to CSV"""
+    if filename is None:
+        date_str = datetime.now().strftime('%Y-%m-%d')
+        filename = config.CSV_FILENAME.format(date=date_str)
+    
+    write_csv(df, filename)
+    print(f"Data saved to {filename}")
+
+def save_archive(archive, filename, enriched=None):
+    """
+    Save a streamed CSV archive as `filename`, with the detail-page fields
+    of the `enriched` top jobs merged into their rows
+    """
+    if archive.error is not None:
+        print(f"Could not save CSV: {archive.error}")
+        discard_archive(archive)
+        return
+    if not archive.rows_written:
+        return
+    try:
+        if enriched:
+            merge_into_csv(archive.filename, filename, to_records(enriched))
+        else:
+            os.replace(archive.filename, filename)
+    except Exception as e:
+        print(f"Could not save CSV: {e}")
+        return
+    finally:
+        discard_archive(archive)
+    print(f"Data saved to {filename}\n")
+
+def discard_archive(archive):
+    try:
+        os.remove(archive.filename)
+    except FileNotFoundError:
+        pass
+
+def verify_links(config, candidates, budget, top_n):
+    """Drop top jobs whose links are dead, backfilling from the next candidates"""
+    from link_checker import verify_top_jobs
+    print("Step 2b: Checking job links...")
+    top_jobs, dead_jobs = verify_top_jobs(
+        candidates,
+        top_n=top_n,
+        cache_file=config.LINK_CACHE_FILE,
+        ttl_hours=config.LINK_CACHE_TTL_HOURS,
+        max_workers=config.LINK_CHECK_WORKERS,
+        per_host_limit=config.LINK_CHECK_PER_HOST,
+        time_budget=config.LINK_CHECK_TIME_BUDGET,
+        deadline=budget.stage('verify')
+    )
+    print()
+    return top_jobs
+
+def render_html(config, jobs_df, top_jobs, skipped_sources, total_jobs):
+    """HTML body for one report (the plain-text body is create_plain_text_email)"""
+    if config.COMPACT_EMAIL:
+        return create_compact_html_email(jobs_df, top_jobs, skipped_sources, total_jobs=total_jobs,
+                                         max_bytes=config.EMAIL_MAX_KB * 1024)
+    return create_html_email(jobs_df, top_jobs, skipped_sources, total_jobs=total_jobs)
+
+def plan_editions(config, recipients, top_jobs, history=None):
+    """Group recipients by the jobs they'll get: [(jobs, recipients)]"""
+    if history:
+        return history.plan(recipients, top_jobs, top_n=config.TOP_N_JOBS)
+    return [(top_jobs, recipients)]
+
+def open_sent_history(config):
+    from sent_history import SentHistory
+    return SentHistory(
+        config.SENT_HISTORY_FILE,
+        capacity=config.SENT_HISTORY_CAPACITY,
+        error_rate=config.SENT_HISTORY_ERROR_RATE,
+        max_filters=config.SENT_HISTORY_MAX_FILTERS
+    )
+
+def record_outbox_delivery(config, message, history=None):
+    """
+    Record one message the outbox delivered against the run that queued it:
+    in that run's checkpoint (if it's still there) and in the sent history
+    """
+    run_id = message['checkpoint_run_id']
+    if run_id and os.path.isdir(os.path.join(config.CHECKPOINT_DIR, run_id)):
+        RunCheckpoint(config.CHECKPOINT_DIR, run_id).mark_delivered(message['recipient'])
+    if history and message['jobs']:
+        history.record(message['recipient'], message['jobs'])
+
+def drain_outbox(config, outbox, pool, deadline, history=None):
+    """Send whatever is due in the outbox, from this run or earlier ones; returns the number sent"""
+    from outbox import OutboxDispatcher
+    dispatcher = OutboxDispatcher(
+        outbox,
+        credentials={config.SENDER_EMAIL: config.SENDER_PASSWORD},
+        rate_per_minute=config.SEND_RATE_PER_MINUTE,
+        burst=config.SEND_BURST,
+        daily_limit=config.DAILY_SEND_LIMIT,
+        spread_seconds=config.SEND_SPREAD_SECONDS,
+        max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+        retry_base_seconds=config.OUTBOX_RETRY_BASE_SECONDS,
+        lease_seconds=config.OUTBOX_LEASE_SECONDS
+    )
+    return dispatcher.drain(lambda message, password: send_email(
+        message['sender'], password, message['recipient'], message['subject'],
+        message['html'], message['text'], timeout=deadline.cap(30), pool=pool, raise_errors=True
+    ), deadline=deadline, on_sent=lambda message: record_outbox_delivery(config, message, history))
+
+def deliver_via_outbox(config, reports, pool, deadline, checkpoint_run_id, history=None):
+    """
+    Queue each (report id, recipients, html_body, text_body, jobs) report of
+    run checkpoint_run_id and drain the outbox; returns the set of
+    recipients sent each report. Every delivery, including mail left over
+    from earlier runs, is recorded by record_outbox_delivery.
+    """
+    from outbox import Outbox
+    outbox = Outbox(config.OUTBOX_FILE)
+    for report_id, recipients, html_body, text_body, jobs in reports:
+        outbox.enqueue(report_id, config.SENDER_EMAIL, recipients, config.EMAIL_SUBJECT, html_body, text_body,
+                       jobs=[{field: job.get(field) for field in ('title', 'company', 'link')}
+                             for job in to_records(jobs)],
+                       checkpoint_run_id=checkpoint_run_id)
+    drain_outbox(config, outbox, pool, deadline, history)
+    queued = sum(outbox.counts(report_id).get('queued', 0) for report_id, *_ in reports)
+    if queued:
+        cloud = ' --cloud' if config.__name__ == 'cloud_config' else ''
+        print(f"{queued} emails still queued; they go out on the next run (or: python outbox.py drain{cloud})")
+    outbox.purge()
+    return [outbox.sent_recipients(report_id) for report_id, *_ in reports]
+
+def run_report(config, resume_run_id=None, recipients=None, run_id=None, prepare_only=False,
+               smtp_pool=None, locations=None):
+    """
+    Scrape jobs, generate the report and send it, with settings from `config`
+    (the config or cloud_config module). Entry points print the banner and
+    check the email credentials before calling this.
+
+    Every stage is checkpointed under config.CHECKPOINT_DIR. Passing
+    resume_run_id picks up that run where it stopped: completed stages are
+    loaded instead of re-run and recipients already sent to are skipped.
+    smtp_pool lets a long-running caller keep its SMTP connection warm.
+    `recipients` overrides config.RECIPIENT_EMAILS and `locations`
+    config.LOCATION_FILTER (e.g. per schedule).
+
+    With prepare_only=True the run stops after rendering, leaving its stages
+    checkpointed under `run_id` for a later resume to deliver (pre-warming).
+    """
+    recipients = [r for r in (recipients or config.RECIPIENT_EMAILS) if r]  # Skip None/empty recipients
+    locations = config.LOCATION_FILTER if locations is None else locations
+    
+    if resume_run_id:
+        print(f"Resuming run {resume_run_id}\n")
+    elif not prepare_only:
+        # Pre-warms don't prune, and nothing prunes a run staged for another schedule's send
+        prune_checkpoints(config.CHECKPOINT_DIR, keep=config.CHECKPOINT_KEEP_RUNS - 1,
+                          staged_max_age=config.PREWARM_MAX_AGE_MINUTES * 60)
+    checkpoint = RunCheckpoint(config.CHECKPOINT_DIR, resume_run_id or run_id)
+    if prepare_only:
+        checkpoint.mark_staged()
+    
+    budget = RunBudget(config.RUN_TIME_BUDGET, config.STAGE_BUDGET_SHARES)
+    skipped_sources = []
+    source_plan = []  # Why each source was scraped the way it was
+    source_stats = SourceStats(config.SOURCE_STATS_FILE) if config.PLAN_SOURCES else None
+    # Spare candidates for recipients who have already been sent some of the top jobs
+    history_backups = config.SENT_HISTORY_BACKUPS if config.USE_SENT_HISTORY else 0
+    candidate_count = config.TOP_N_JOBS + history_backups
+    
+    jobs_df = None
+    top_jobs = None
+    if checkpoint.has('parsed'):
+        parsed = checkpoint.load('parsed')
+        skipped_sources = [tuple(skipped) for skipped in parsed['skipped_sources']]
+        source_plan = parsed.get('source_plan', [])
+        if 'jobs' in parsed:
+            jobs_df = from_checkpoint(parsed['jobs'])
+            total_jobs = len(jobs_df)
+        else:
+            total_jobs = parsed['total_jobs']  # Streamed run: only the top jobs were kept
+        print(f"Step 1: Using {total_jobs} checkpointed jobs\n")
+    elif config.STREAMING_MODE:
+        # Steps 1-3 in one pass: jobs stream through dedupe and the CSV archive
+        # into top-N selection, so only the top jobs are ever held in memory
+        print("Step 1: Streaming job listings into the top jobs...")
+        archive = None
+        if config.SAVE_DATA_TO_CSV:
+            # Written to a side file while streaming, and saved once the top jobs are enriched
+            csv_filename = config.CSV_FILENAME.format(date=datetime.now().strftime('%Y-%m-%d'))
+            archive = BatchCsvWriter(csv_filename + '.tmp', batch_size=config.ARCHIVE_BATCH_SIZE)
+        try:
+            top_jobs, total_jobs = stream_top_jobs(
+                iter_ai_jobs(
+                    circuit_state_file=config.CIRCUIT_STATE_FILE,
+                    deadline=budget.stage('scrape'),
+                    skipped_sources=skipped_sources,
+                    checkpoint=checkpoint,
+                    parse_cache=ParseCache(
+                        config.PARSE_CACHE_DIR,
+                        max_age_days=config.PARSE_CACHE_MAX_AGE_DAYS,
+                        max_bytes=config.PARSE_CACHE_MAX_MB * 1024 * 1024
+                    ),
+                    parse_workers=config.PARSE_WORKERS,
+                    fetch_workers=config.FETCH_WORKERS,
+                    source_stats=source_stats,
+                    keywords=config.JOB_SEARCH_KEYWORDS,
+                    source_plan=source_plan,
+                    stream_parse=config.STREAM_PARSE
+                ),
+                keywords=config.JOB_SEARCH_KEYWORDS,
+                top_n=config.TOP_N_JOBS,
+                archive=archive,
+                backups=(config.LINK_CHECK_BACKUPS if config.VERIFY_LINKS else 0) + history_backups,
+                seniority=config.SENIORITY_FILTER,
+                families=config.ROLE_FAMILY_FILTER,
+                locations=locations
+            )
+        except Exception as e:
+            print(f"Error scraping jobs: {e}")
+            if archive:
+                archive.close()
+                discard_archive(archive)
+            sys.exit(1)
+        if archive:
+            archive.close()
+        print(f"Successfully scraped {total_jobs} jobs, kept the top {len(top_jobs)}\n")
+        
+        if config.VERIFY_LINKS:
+            top_jobs = verify_links(config, top_jobs, budget, candidate_count)
+        
+        # Only the selected jobs need detail pages
+        if config.ENRICH_JOB_DETAILS:
+            print("Step 1b: Fetching job detail pages...")
+            from job_enricher import enrich_jobs
+            top_jobs = enrich_jobs(
+                top_jobs,
+                max_workers=config.ENRICH_MAX_WORKERS,
+                per_host_limit=config.ENRICH_PER_HOST_LIMIT,
+                cache_file=config.DETAIL_CACHE_FILE,
+                deadline=budget.stage('enrich')
+            )
+            print()
+        
+        if archive:
+            save_archive(archive, csv_filename, top_jobs if config.ENRICH_JOB_DETAILS else None)
+        
+        checkpoint.save('ranked', to_checkpoint(top_jobs))
+        checkpoint.save('parsed', {'total_jobs': total_jobs, 'skipped_sources': skipped_sources,
+                                   'source_plan': source_plan})
+    else:
+        # Step 1: Scrape jobs
+        print("Step 1: Scraping job listings...")
+        parse_cache = ParseCache(
+            config.PARSE_CACHE_DIR,
+            max_age_days=config.PARSE_CACHE_MAX_AGE_DAYS,
+            max_bytes=config.PARSE_CACHE_MAX_MB * 1024 * 1024
+        )
+        try:
+            if config.DISTRIBUTED_SCRAPE:
+                from work_queue import scrape_distributed
+                jobs_df = scrape_distributed(
+                    config.WORK_QUEUE_FILE,
+                    workers=config.SCRAPE_WORKERS,
+                    run_id=checkpoint.run_id,
+                    lease_seconds=config.WORK_LEASE_SECONDS,
+                    circuit_state_file=config.CIRCUIT_STATE_FILE,
+                    deadline=budget.stage('scrape'),
+                    skipped_sources=skipped_sources,
+                    parse_cache=parse_cache,
+                    as_records=config.RECORD_MODE
+                )
+            else:
+                jobs_df = scrape_ai_jobs(
+                    max_pages=config.MAX_PAGES_TO_SCRAPE,
+                    circuit_state_file=config.CIRCUIT_STATE_FILE,
+                    deadline=budget.stage('scrape'),
+                    skipped_sources=skipped_sources,
+                    checkpoint=checkpoint,
+                    as_records=config.RECORD_MODE,
+                    parse_cache=parse_cache,
+                    parse_workers=config.PARSE_WORKERS,
+                    fetch_workers=config.FETCH_WORKERS,
+                    source_stats=source_stats,
+                    keywords=config.JOB_SEARCH_KEYWORDS,
+                    source_plan=source_plan,
+                    stream_parse=config.STREAM_PARSE
+                )
+            print(f"Successfully scraped {len(jobs_df)} jobs\n")
+        except Exception as e:
+            print(f"Error scraping jobs: {e}")
+            sys.exit(1)
+        
+        if len(jobs_df) == 0:
+            print("No jobs found. Exiting.")
+            sys.exit(0)
+        
+        # Title level, role family and location, as cheap columns for filtering
+        jobs_df = locate_jobs(classify_jobs(jobs_df))
+        
+        # Step 1b: Enrich with detail pages (optional)
+        if config.ENRICH_JOB_DETAILS:
+            print("Step 1b: Fetching job detail pages...")
+            from job_enricher import enrich_jobs
+            jobs_df = enrich_jobs(
+                jobs_df,
+                max_workers=config.ENRICH_MAX_WORKERS,
+                per_host_limit=config.ENRICH_PER_HOST_LIMIT,
+                cache_file=config.DETAIL_CACHE_FILE,
+                deadline=budget.stage('enrich')
+            )
+            print()
+        
+        total_jobs = len(jobs_df)
+        checkpoint.save('parsed', {'jobs': to_checkpoint(jobs_df), 'skipped_sources': skipped_sources,
+                                   'source_plan': source_plan})
+    
+    # Step 2: Filter and analyze
+    if top_jobs is not None:
+        pass  # Already selected while streaming
+    elif checkpoint.has('ranked'):
+        top_jobs = from_checkpoint(checkpoint.load('ranked'))
+        print(f"Step 2: Using {len(top_jobs)} checkpointed top jobs\n")
+    else:
+        print("Step 2: Filtering top jobs...")
+        if config.VERIFY_LINKS:
+            top_jobs = verify_links(config, rank_candidates(
+                jobs_df,
+                keywords=config.JOB_SEARCH_KEYWORDS,
+                top_n=config.TOP_N_JOBS,
+                backups=config.LINK_CHECK_BACKUPS + history_backups,
+                seniority=config.SENIORITY_FILTER,
+                families=config.ROLE_FAMILY_FILTER,
+                locations=locations
+            ), budget, candidate_count)
+        elif history_backups:
+            top_jobs = rank_candidates(
+                jobs_df,
+                keywords=config.JOB_SEARCH_KEYWORDS,
+                top_n=config.TOP_N_JOBS,
+                backups=history_backups,
+                seniority=config.SENIORITY_FILTER,
+                families=config.ROLE_FAMILY_FILTER,
+                locations=locations
+            )
+        else:
+            top_jobs = filter_top_jobs(
+                jobs_df, 
+                keywords=config.JOB_SEARCH_KEYWORDS,
+                top_n=config.TOP_N_JOBS,
+                seniority=config.SENIORITY_FILTER,
+                families=config.ROLE_FAMILY_FILTER,
+                locations=locations
+            )
+        checkpoint.save('ranked', to_checkpoint(top_jobs))
+        print(f"Found {len(top_jobs)} top jobs matching criteria\n")
+    
+    # Steps 3-4: save the CSV, pick and render each recipient's report and log in
+    # to the mail server, each stage starting as soon as what it needs is ready
+    graph = StageGraph(max_workers=config.STAGE_WORKERS)
+    if config.SAVE_DATA_TO_CSV and jobs_df is not None:
+        print("Step 3: Saving data to CSV in the background...")
+        graph.add('csv', lambda: save_data(config, jobs_df), required=False)
+    if config.USE_SENT_HISTORY:
+        graph.add('history', lambda: open_sent_history(config))
+    rendered = checkpoint.load('rendered') if checkpoint.has('rendered') else None
+    if rendered is None:
+        print("Step 4: Generating email content...")
+        graph.add('plan', lambda history=None: plan_editions(config, recipients, top_jobs, history),
+                  inputs=['history'] if config.USE_SENT_HISTORY else [])
+        graph.add('html', lambda plan: [render_html(config, jobs_df, jobs, skipped_sources, total_jobs)
+                                        for jobs, group in plan], inputs=['plan'])
+        graph.add('text', lambda plan: [create_plain_text_email(jobs_df, jobs, skipped_sources, total_jobs=total_jobs)
+                                        for jobs, group in plan], inputs=['plan'])
+    if not prepare_only:
+        pool = smtp_pool or SMTPConnectionPool(config.SMTP_HOST, config.SMTP_PORT, use_ssl=config.SMTP_USE_SSL)
+        if set(recipients) - checkpoint.delivered():
+            graph.add('smtp', lambda: pool.connect(config.SENDER_EMAIL, config.SENDER_PASSWORD), required=False)
+    graph.run()
+    history = graph.result('history')
+    
+    if rendered is not None:
+        if 'editions' in rendered:
+            editions = [(from_checkpoint(edition['jobs']), edition['recipients'], edition['html'], edition['text'])
+                        for edition in rendered['editions']]
+        else:
+            editions = [(top_jobs, recipients, rendered['html'], rendered['text'])]
+        print("Step 4: Using checkpointed email content\n")
+    else:
+        editions = [(jobs, group, html_body, text_body) for (jobs, group), html_body, text_body
+                    in zip(graph.result('plan'), graph.result('html'), graph.result('text'))]
+        checkpoint.save('rendered', {'editions': [
+            {'jobs': to_checkpoint(jobs), 'recipients': group, 'html': html_body, 'text': text_body}
+            for jobs, group, html_body, text_body in editions
+        ]})
+        for jobs, group, html_body, text_body in editions:
+            print(f"Email content generated for {len(group)} recipient(s): {len(jobs)} jobs, "
+                  f"{len(html_body.encode('utf-8')) / 1024:.1f} KB HTML, "
+                  f"{len(text_body.encode('utf-8')) / 1024:.1f} KB text")
+        print()
+    
+    if prepare_only:
+        graph.finish()
+        print(f"Report staged as run {checkpoint.run_id}, delivery deferred")
+        return checkpoint.run_id
+    
+    # Step 5: Send email
+    print("Step 5: Sending email report...")
+    
+    deliver_deadline = budget.stage('deliver')
+    already_sent = checkpoint.delivered()
+    success_count = 0
+    if config.USE_OUTBOX:
+        # Report ids: the run id, suffixed when recipients get different jobs
+        sent = deliver_via_outbox(config, [
+            (checkpoint.run_id if n == 0 else f"{checkpoint.run_id}.{n}",
+             [r for r in group if r not in already_sent], html_body, text_body, jobs)
+            for n, (jobs, group, html_body, text_body) in enumerate(editions)
+        ], pool, deliver_deadline, checkpoint.run_id, history)
+        for (jobs, group, html_body, text_body), sent_to in zip(editions, sent):
+            success_count += len(sent_to | (already_sent & set(group)))
+    else:
+        for jobs, group, html_body, text_body in editions:
+            for recipient in group:
+                if recipient in already_sent:
+                    print(f"Already sent to {recipient} in this run, skipping")
+                    success_count += 1
+                    continue
+                try:
+                    timeout = deliver_deadline.cap(30)
+                except DeadlineExceeded:
+                    print(f"Time budget used up, not sending to {recipient}")
+                    continue
+                if send_email(
+                    config.SENDER_EMAIL,
+                    config.SENDER_PASSWORD,
+                    recipient,
+                    config.EMAIL_SUBJECT,
+                    html_body,
+                    text_body,
+                    timeout=timeout,
+                    pool=pool
+                ):
+                    checkpoint.mark_delivered(recipient)
+                    if history:
+                        history.record(recipient, jobs)
+                    success_count += 1
+    graph.finish()  # The CSV may still be writing
+    checkpoint.clear_staged()
+    if smtp_pool is None:
+        pool.close()
+    if history:
+        history.save()
+    
+    print(f"\nSuccessfully sent {success_count}/{len(recipients)} emails")
+    
+    # Step 6: Summary
+    print("\n" + "=" * 50)
+    print("REPORT SUMMARY")
+    print("=" * 50)
+    print(f"Total jobs scraped: {total_jobs}")
+    print(f"Top jobs selected: {min(len(top_jobs), config.TOP_N_JOBS)}")
+    if len(editions) > 1:
+        print(f"Reports sent: {len(editions)} (recipients skip jobs they've already been sent)")
+    print(f"Emails sent: {success_count}")
+    if skipped_sources:
+        print(f"Sources skipped: {', '.join(name for name, reason in skipped_sources)}")
+    if source_plan:
+        print("Source plan:")
+        for note in source_plan:
+            print(f"  {note}")
+    print(f"Run id: {checkpoint.run_id} (resume with --resume {checkpoint.run_id})")
+    print(f"Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 50)
+    
+    return success_count > 0
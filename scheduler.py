@@ -1,69 +1,356 @@
 """
 Scheduler for Weekly Job Report Emailer
 Runs the report generation at scheduled times
+
+Schedules are cron expressions (minute hour day-of-month month day-of-week),
+each in its own timezone and optionally with its own recipient list. The loop
+sleeps until the next trigger is due and hands runs to a worker pool, so a slow
+report never delays or blocks other schedules.
 """
 
-import schedule
-import time
-from datetime import datetime
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
 from main import generate_and_send_report
+from checkpoint import RunCheckpoint, new_run_id
 import config
 
-def job():
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+# How far ahead next_after() searches before deciding an expression never fires
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def _parse_field(field, low, high, names=None):
+    """Parse one cron field ('*', '1,3', '1-5', '*/15', 'mon-fri') into a set of ints"""
+    values = set()
+    for part in field.lower().split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+        if part == '*':
+            start, end = low, high
+        else:
+            bounds = part.split('-', 1)
+            numbers = []
+            for bound in bounds:
+                if names and bound[:3] in names:
+                    numbers.append(names.index(bound[:3]) + (1 if low == 1 else 0))
+                else:
+                    numbers.append(int(bound))
+            start = numbers[0]
+            end = numbers[1] if len(numbers) > 1 else (high if step > 1 else start)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field '{field}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A standard 5-field cron expression evaluated in a given timezone
+    (an IANA name such as 'Asia/Kolkata', or None for the machine's local time)
+    """
+
+    def __init__(self, expression, tz=None):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.expression = expression
+        self.tz = ZoneInfo(tz) if tz else None
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES)
+        # 0 and 7 are both Sunday, so '1-7' and '*/2' work as they do in cron
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7, DAY_NAMES)}
+        # Like cron: if both day fields are restricted, either one matching is enough
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+
+    def _day_matches(self, moment):
+        cron_weekday = (moment.weekday() + 1) % 7  # Python: Monday=0, cron: Sunday=0
+        day_ok = moment.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """First trigger time strictly after `moment` (an aware datetime)"""
+        local = moment.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        limit = candidate + timedelta(days=MAX_LOOKAHEAD_DAYS)
+
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (1 if candidate.month == 12 else 0)
+                month = 1 if candidate.month == 12 else candidate.month + 1
+                candidate = datetime(year, month, 1)
+            elif not self._day_matches(candidate):
+                candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate.replace(tzinfo=self.tz) if self.tz else candidate.astimezone()
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+
+class Scheduler:
+    """
+    Event-driven scheduler for many cron schedules
+
+    - The loop sleeps until exactly the earliest due trigger (or until a
+      schedule is added / the scheduler is stopped).
+    - Runs are dispatched to a thread pool; the loop never runs a job itself.
+    - A schedule whose previous run is still going skips that trigger instead
+      of starting an overlapping run.
+    - The next trigger is always computed from the one just fired, so a slow
+      run can't cause a trigger to fire twice. Triggers missed while the
+      process was suspended are coalesced into a single run.
+    - A schedule can have a pre-warm job that fires `lead` seconds before
+      each trigger; its Future is passed to the main job as `staged`.
+      Pre-warms run on their own pool: a send waiting on its pre-warm holds
+      a worker, so sharing one could leave the pre-warm queued behind it.
+    """
+
+    def __init__(self, max_workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self.prewarm_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prewarm')
+        self.queue = []  # (fire_at, sequence, entry, kind)
+        self.entries = []
+        self.wakeup = threading.Condition()
+        self.stopped = False
+        self._sequence = 0
+
+    def add(self, name, cron, job, tz=None, prewarm_job=None, lead=0, **job_kwargs):
+        """
+        Register `job(**job_kwargs)` to run whenever `cron` fires
+
+        If prewarm_job is given it runs with the same kwargs `lead` seconds
+        before each trigger, and job is additionally called with staged=<Future>.
+        """
+        entry = {
+            'name': name,
+            'cron': CronSchedule(cron, tz),
+            'job': job,
+            'kwargs': job_kwargs,
+            'prewarm_job': prewarm_job,
+            'lead': timedelta(seconds=lead),
+            'running': threading.Lock(),
+            'last_fired': None,
+        }
+        with self.wakeup:
+            self.entries.append(entry)
+            self._push(entry, entry['cron'].next_after(self._now()))
+            self.wakeup.notify()
+        return entry
+
+    def _now(self):
+        return datetime.now().astimezone()
+
+    def _push(self, entry, fire_at, kind='send'):
+        self._sequence += 1
+        heapq.heappush(self.queue, (fire_at, self._sequence, entry, kind))
+        if kind == 'send':
+            entry['next_fire'] = fire_at
+            if entry['prewarm_job']:
+                self._push(entry, max(self._now(), fire_at - entry['lead']), kind='prewarm')
+
+    def _dispatch_prewarm(self, entry, fire_at):
+        print(f"[{entry['name']}] Pre-warming report for {entry['next_fire']}")
+        entry['staged'] = self.prewarm_pool.submit(entry['prewarm_job'], **entry['kwargs'])
+
+    def _dispatch(self, entry, fire_at):
+        staged = entry.pop('staged', None)
+        if not entry['running'].acquire(blocking=False):
+            print(f"[{entry['name']}] Previous run still in progress, skipping trigger at {fire_at}")
+            return
+        entry['last_fired'] = fire_at
+
+        kwargs = dict(entry['kwargs'])
+        if entry['prewarm_job']:
+            kwargs['staged'] = staged
+
+        def run():
+            try:
+                entry['job'](**kwargs)
+            except Exception as e:
+                print(f"[{entry['name']}] Error running scheduled job: {e}")
+            finally:
+                entry['running'].release()
+
+        self.pool.submit(run)
+
+    def run_forever(self):
+        """Block, firing triggers as they fall due, until stop() is called"""
+        with self.wakeup:
+            while not self.stopped:
+                if not self.queue:
+                    self.wakeup.wait()
+                    continue
+                fire_at, _, entry, kind = self.queue[0]
+                delay = (fire_at - self._now()).total_seconds()
+                if delay > 0:
+                    self.wakeup.wait(timeout=delay)
+                    continue  # Re-check: woken early by add()/stop(), or the clock moved
+
+                heapq.heappop(self.queue)
+                if kind == 'prewarm':
+                    self._dispatch_prewarm(entry, fire_at)
+                    continue
+                next_fire = entry['cron'].next_after(fire_at)
+                now = self._now()
+                if next_fire <= now:
+                    # We slept through several triggers (e.g. laptop suspended): run once, then resume from now
+                    next_fire = entry['cron'].next_after(now)
+                self._push(entry, next_fire)
+                self._dispatch(entry, fire_at)
+
+    def stop(self, wait=True):
+        with self.wakeup:
+            self.stopped = True
+            self.wakeup.notify_all()
+        self.prewarm_pool.shutdown(wait=wait, cancel_futures=True)
+        self.pool.shutdown(wait=wait)
+
+
+def prewarm(recipients=None, schedule_name='weekly', **report_kwargs):
+    """
+    Scrape, enrich, rank and render ahead of the send time
+    Returns the run id the staged report is checkpointed under
+    """
+    print(f"\n{'='*60}")
+    print(f"PRE-WARM TRIGGERED: {datetime.now()} ({schedule_name})")
+    print(f"{'='*60}\n")
+
+    try:
+        return generate_and_send_report(
+            run_id=f"{new_run_id()}-{schedule_name}",
+            recipients=recipients,
+            prepare_only=True,
+            **report_kwargs
+        )
+    except SystemExit as e:
+        print(f"Pre-warm exited early (code {e.code})")
+    except Exception as e:
+        print(f"Error pre-warming report: {e}")
+    return None
+
+
+def _staged_run_id(staged):
+    """Run id of a finished, fresh pre-warm, or None if it can't be used"""
+    if staged is None:
+        return None
+    try:
+        run_id = staged.result(timeout=config.PREWARM_WAIT_SECONDS)
+    except Exception as e:
+        print(f"Pre-warmed report not ready ({e or 'timed out'}), running from scratch")
+        return None
+    if not run_id:
+        return None
+    age = RunCheckpoint(config.CHECKPOINT_DIR, run_id).age('rendered')
+    if age is None or age > config.PREWARM_MAX_AGE_MINUTES * 60:
+        print(f"Pre-warmed report {run_id} is stale or incomplete, running from scratch")
+        return None
+    return run_id
+
+
+def job(recipients=None, schedule_name='weekly', staged=None, **report_kwargs):
     """Wrapper function for the scheduled job"""
     print(f"\n{'='*60}")
-    print(f"SCHEDULED JOB TRIGGERED: {datetime.now()}")
+    print(f"SCHEDULED JOB TRIGGERED: {datetime.now()} ({schedule_name})")
     print(f"{'='*60}\n")
-    
+
     try:
-        generate_and_send_report()
+        run_id = _staged_run_id(staged)
+        if run_id:
+            print(f"Delivering pre-warmed report {run_id}")
+        else:
+            # A fresh run gets its own checkpoint, even if another schedule fires in the same second
+            report_kwargs.setdefault('run_id', f"{new_run_id()}-{schedule_name}")
+        return generate_and_send_report(resume_run_id=run_id, recipients=recipients, **report_kwargs)
+    except SystemExit as e:
+        print(f"Scheduled job exited early (code {e.code})")
     except Exception as e:
         print(f"Error running scheduled job: {e}")
 
-def start_scheduler():
+
+def schedules_from_config():
     """
-    Start the scheduler to run weekly reports
+    config.SCHEDULES if set, otherwise one weekly slot from SEND_DAY/SEND_TIME
     """
-    # Schedule based on config
+    schedules = getattr(config, 'SCHEDULES', None)
+    if schedules:
+        return schedules
+
     day = config.SEND_DAY.lower()
-    send_time = config.SEND_TIME
-    
-    # Map day names to schedule methods
-    day_mapping = {
-        'monday': schedule.every().monday,
-        'tuesday': schedule.every().tuesday,
-        'wednesday': schedule.every().wednesday,
-        'thursday': schedule.every().thursday,
-        'friday': schedule.every().friday,
-        'saturday': schedule.every().saturday,
-        'sunday': schedule.every().sunday,
-    }
-    
-    if day not in day_mapping:
+    if day[:3] not in DAY_NAMES:
         print(f"Invalid day: {day}. Using Monday as default.")
         day = 'monday'
-    
-    # Schedule the job
-    day_mapping[day].at(send_time).do(job)
-    
+    hour, minute = config.SEND_TIME.split(':')
+    return [{
+        'name': 'weekly',
+        'cron': f"{int(minute)} {int(hour)} * * {day[:3]}",
+        'timezone': config.SEND_TIMEZONE,
+    }]
+
+
+def build_scheduler(**job_kwargs):
+    """
+    Create a Scheduler with every configured schedule registered
+    Extra job_kwargs are passed to each run (e.g. a shared smtp_pool)
+    """
+    scheduler = Scheduler(max_workers=config.SCHEDULER_WORKERS)
+    for schedule in schedules_from_config():
+        recipients = schedule.get('recipients') or config.RECIPIENT_EMAILS
+        entry = scheduler.add(
+            schedule['name'],
+            schedule['cron'],
+            job,
+            tz=schedule.get('timezone'),
+            prewarm_job=prewarm if config.PREWARM_LEAD_MINUTES else None,
+            lead=config.PREWARM_LEAD_MINUTES * 60,
+            recipients=recipients,
+            locations=schedule.get('locations'),
+            schedule_name=schedule['name'],
+            **job_kwargs
+        )
+        print(f"Schedule '{schedule['name']}': {schedule['cron']} ({schedule.get('timezone') or 'local time'})")
+        print(f"   Next run: {entry['next_fire'].strftime('%Y-%m-%d %H:%M %Z')}")
+        print(f"   Recipients: {', '.join(r for r in recipients if r)}")
+        if schedule.get('locations'):
+            print(f"   Locations: {schedule['locations']}")
+    return scheduler
+
+
+def start_scheduler():
+    """
+    Start the scheduler to run weekly reports
+    """
     print("=" * 60)
-    print("WEEKLY JOB REPORT SCHEDULER STARTED")
+    print("JOB REPORT SCHEDULER STARTED")
     print("=" * 60)
-    print(f"Schedule: Every {day.capitalize()} at {send_time}")
-    print(f"Recipients: {', '.join(config.RECIPIENT_EMAILS)}")
+    scheduler = build_scheduler()
     print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
     print("\nPress Ctrl+C to stop the scheduler\n")
-    
+
     # Keep the script running
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+        scheduler.run_forever()
     except KeyboardInterrupt:
+        scheduler.stop(wait=False)
         print("\n\n" + "=" * 60)
         print("SCHEDULER STOPPED")
         print("=" * 60)
 
 if __name__ == "__main__":
-    start_scheduler()
\ No newline at end of file
+    start_scheduler()
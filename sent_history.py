@@ -0,0 +1,291 @@
+"""
+Per-recipient sent history
+Remembers which postings each recipient has already been sent, so top-N
+selection can pass over them. Every (recipient, job) pair is stored exactly in
+SQLite, and a Bloom filter on disk answers "never sent" without touching the
+database; only its positive hits are checked against the exact table.
+
+The filter grows in fixed-size slices. Once there are max_filters of them,
+the oldest slice (and the rows it covers) is dropped, so memory and lookup
+cost stay flat however long the history gets; a posting sent that long ago
+can be sent again.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from records import like, to_records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent (
+    recipient TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (recipient, job_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sent_at ON sent (sent_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+FILTER_MAGIC = b'SENTBLOOM1\n'
+
+# SQLite's limit on ? parameters per statement is 999 on older builds
+QUERY_CHUNK = 500
+
+
+def job_key(job):
+    """Identity of a posting: its link without the fragment, else title and company"""
+    link = str(job.get('link') or '').split('#')[0].rstrip('/')
+    if link.startswith('http'):
+        return link
+    return f"{job.get('title') or ''}|{job.get('company') or ''}".lower()
+
+
+def _recipient(recipient):
+    return recipient.strip().lower()
+
+
+def _digest(recipient, key):
+    return hashlib.blake2b(f"{recipient}\0{key}".encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over 16-byte digests (double hashing, k probes)
+    """
+
+    def __init__(self, capacity, error_rate, created_at=None, count=0, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.created_at = created_at or time.time()
+        self.count = count
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def add(self, digest):
+        """Set the digest's bits; returns False if they were all set already"""
+        added = False
+        for position in self._positions(digest):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def header(self):
+        return {'capacity': self.capacity, 'error_rate': self.error_rate, 'created_at': self.created_at,
+                'count': self.count, 'bytes': len(self.bits)}
+
+
+class SentHistory:
+    """
+    Which jobs each recipient has been sent, backed by `path` (SQLite) and
+    `path`.bloom (the filter slices)
+    """
+
+    def __init__(self, path, capacity=1000000, error_rate=0.001, max_filters=4):
+        self.path = path
+        self.filter_file = path + '.bloom'
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_filters = max_filters
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+        self.generation = 0  # Generation of the table the in-memory filters cover
+        self.filters = self._load_filters()
+        self.stats = {'checked': 0, 'filter_hits': 0, 'already_sent': 0}
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def _generation(self, db):
+        row = db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _load_filters(self):
+        """Read the slices from disk, rebuilding them from SQLite if they're missing or stale"""
+        with self._connect() as db:
+            generation = self._generation(db)
+        try:
+            with open(self.filter_file, 'rb') as f:
+                if f.readline() != FILTER_MAGIC:
+                    raise ValueError('not a sent-history filter file')
+                meta = json.loads(f.readline())
+                if meta['generation'] == generation and meta['capacity'] == self.capacity \
+                        and meta['error_rate'] == self.error_rate:
+                    self.generation = generation
+                    return [BloomFilter(header['capacity'], header['error_rate'], header['created_at'],
+                                        header['count'], bytearray(f.read(header['bytes'])))
+                            for header in meta['filters']]
+        except FileNotFoundError:
+            if generation == 0:
+                self.generation = 0
+                return [BloomFilter(self.capacity, self.error_rate)]
+        except Exception as e:
+            print(f"Could not read sent-history filter: {e}")
+        return self._rebuild()
+
+    def _rebuild(self):
+        """Build the slices again from the exact table, oldest rows first"""
+        print("Rebuilding sent-history filter...")
+        filters = []
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')  # No rows recorded between reading the generation and the table
+            generation = self._generation(db)
+            for recipient, key, sent_at in db.execute('SELECT recipient, job_key, sent_at FROM sent ORDER BY sent_at'):
+                if not filters or filters[-1].full:
+                    filters.append(BloomFilter(self.capacity, self.error_rate, created_at=sent_at))
+                filters[-1].add(_digest(recipient, key))
+            if len(filters) > self.max_filters:
+                filters = filters[-self.max_filters:]
+                db.execute('DELETE FROM sent WHERE sent_at < ?', (filters[0].created_at,))
+            db.execute('COMMIT')
+        filters = filters or [BloomFilter(self.capacity, self.error_rate)]
+        self.generation = generation
+        self._write_filters(filters, generation)
+        return filters
+
+    def save(self):
+        """
+        Write the filter slices to disk (after record(); if this never
+        happens, the next load rebuilds them from SQLite)
+
+        The file is labelled with the generation the filters were loaded or
+        rebuilt at, advanced by this process's own record() calls. If another
+        process has recorded sends since, the filters don't have them, so
+        they are rebuilt from the table instead.
+        """
+        with self._connect() as db:
+            generation = self._generation(db)
+        if generation != self.generation:
+            self.filters = self._rebuild()
+            return
+        self._write_filters(self.filters, generation)
+
+    def _write_filters(self, filters, generation):
+        meta = {'generation': generation, 'capacity': self.capacity, 'error_rate': self.error_rate,
+                'filters': [bloom.header() for bloom in filters]}
+        try:
+            tmp_file = self.filter_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(FILTER_MAGIC)
+                f.write(json.dumps(meta).encode('utf-8') + b'\n')
+                for bloom in filters:
+                    f.write(bloom.bits)
+            os.replace(tmp_file, self.filter_file)
+        except Exception as e:
+            print(f"Could not save sent-history filter: {e}")
+
+    def _maybe_sent(self, digest):
+        return any(digest in bloom for bloom in self.filters)
+
+    def already_sent(self, recipient, jobs):
+        """The job keys among `jobs` that `recipient` has been sent before"""
+        recipient = _recipient(recipient)
+        keys = [job_key(job) for job in jobs]
+        hits = [key for key in keys if self._maybe_sent(_digest(recipient, key))]
+        self.stats['checked'] += len(keys)
+        self.stats['filter_hits'] += len(hits)
+        sent = set()
+        if hits:
+            with self._connect() as db:
+                for start in range(0, len(hits), QUERY_CHUNK):
+                    chunk = hits[start:start + QUERY_CHUNK]
+                    placeholders = ', '.join('?' for _ in chunk)
+                    rows = db.execute(f'SELECT job_key FROM sent WHERE recipient = ? AND job_key IN ({placeholders})',
+                                      (recipient, *chunk))
+                    sent.update(row[0] for row in rows.fetchall())
+        self.stats['already_sent'] += len(sent)
+        return sent
+
+    def unsent(self, recipient, jobs, top_n):
+        """The first top_n of `jobs` (ranked best first) that `recipient` hasn't been sent, as dicts"""
+        jobs = to_records(jobs)
+        sent = self.already_sent(recipient, jobs)
+        return [job for job in jobs if job_key(job) not in sent][:top_n]
+
+    def record(self, recipient, jobs):
+        """Remember that `recipient` has been sent `jobs` (call save() when done recording)"""
+        recipient = _recipient(recipient)
+        now = time.time()
+        keys = [job_key(job) for job in to_records(jobs)]
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            generation = self._generation(db)
+            db.executemany('INSERT OR IGNORE INTO sent (recipient, job_key, sent_at) VALUES (?, ?, ?)',
+                           [(recipient, key, now) for key in keys])
+            for key in keys:
+                if self.filters[-1].full:
+                    self._rotate(db, now)
+                self.filters[-1].add(_digest(recipient, key))
+            db.execute("INSERT INTO meta (key, value) VALUES ('generation', '1') "
+                       "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+            db.execute('COMMIT')
+        if generation == self.generation:
+            self.generation += 1  # Still only this process's rows on top of what the filters were built from
+
+    def _rotate(self, db, now):
+        """Start a new slice, dropping the oldest (and its rows) beyond max_filters"""
+        self.filters.append(BloomFilter(self.capacity, self.error_rate, created_at=now))
+        if len(self.filters) > self.max_filters:
+            self.filters.pop(0)
+            db.execute('DELETE FROM sent WHERE sent_at < ?', (self.filters[0].created_at,))
+
+    def plan(self, recipients, candidates, top_n):
+        """
+        Pick each recipient's top_n from `candidates` (ranked best first),
+        skipping what they've already been sent
+
+        Returns [(jobs, recipients)]: recipients who get the same jobs share
+        one entry, so each distinct report is only rendered once. jobs come
+        back in the same representation as `candidates`.
+        """
+        self.stats = dict.fromkeys(self.stats, 0)
+        editions = {}
+        for recipient in recipients:
+            jobs = self.unsent(recipient, candidates, top_n)
+            key = tuple(job_key(job) for job in jobs)
+            editions.setdefault(key, (jobs, []))[1].append(recipient)
+        print(f"Sent history: {self.stats['already_sent']} of {self.stats['checked']} candidate jobs already sent "
+              f"({self.stats['filter_hits']} filter hits), {len(editions)} distinct report(s)")
+        return [(like(candidates, jobs), group) for jobs, group in editions.values()]
+
+
+if __name__ == "__main__":
+    from config_loader import load_config
+    config = load_config()
+
+    history = SentHistory(config.SENT_HISTORY_FILE, capacity=config.SENT_HISTORY_CAPACITY,
+                          error_rate=config.SENT_HISTORY_ERROR_RATE, max_filters=config.SENT_HISTORY_MAX_FILTERS)
+    with history._connect() as db:
+        for recipient, count in db.execute('SELECT recipient, COUNT(*) FROM sent GROUP BY recipient'):
+            print(f"{recipient}: {count} jobs sent")
+    for bloom in history.filters:
+        print(f"Filter slice from {time.strftime('%Y-%m-%d', time.localtime(bloom.created_at))}: "
+              f"{bloom.count}/{bloom.capacity} pairs, {len(bloom.bits) / 1024:.0f} KB")
@@ -0,0 +1,193 @@
+"""
+Per-source scrape statistics and the source planner
+Each run's latency, page size, rows parsed, relevant rows and failures per
+job board are folded into moving averages kept on disk. plan_sources uses
+them to scrape the boards in order of relevant jobs per second, give the
+productive ones more of the row and time budget, and only try boards that
+have been coming back empty every few runs.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+# Weight of the latest run in the moving averages
+SMOOTHING = 0.3
+
+# A board with no relevant rows for EMPTY_RUNS runs in a row is only tried every PROBE_EVERY runs
+EMPTY_RUNS = 5
+PROBE_EVERY = 4
+
+# A board's row cap stays between these multiples of its default max_jobs
+MIN_ROW_SHARE = 0.5
+MAX_ROW_SHARE = 2.0
+
+# Seconds any board that is tried gets, however low its yield
+MIN_TIME_LIMIT = 10
+
+
+def _ewma(old, new):
+    return new if old is None else old + SMOOTHING * (new - old)
+
+
+def relevant_per_second(entry):
+    """Relevant jobs a board yields per second of fetching, discounted by how often it fails"""
+    if entry.get('relevant') is None or not entry.get('latency'):
+        return None
+    return entry['relevant'] / max(entry['latency'], 0.1) * (1 - entry.get('failure_rate', 0))
+
+
+class SourceStats:
+    """
+    Moving averages of how each source performed, saved to state_file
+    Record calls are thread-safe; end_run() folds this run in and saves.
+    """
+
+    def __init__(self, state_file=None):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.state = self._load()
+        self.run = {}  # This run's observations, by source
+        self.skipped = set()  # Sources the planner left out this run
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Could not read source stats: {e}")
+            return {}
+
+    def get(self, source):
+        """Averages for a source, or None if it has never been tried"""
+        return self.state.get(source)
+
+    def record_fetch(self, source, seconds, size):
+        """A page was fetched (seconds is None for a page reused from a checkpoint)"""
+        with self.lock:
+            self.run.setdefault(source, {}).update(fetched=True, seconds=seconds, bytes=size)
+
+    def record_failure(self, source):
+        with self.lock:
+            self.run.setdefault(source, {})['failed'] = True
+
+    def record_rows(self, source, rows, relevant):
+        """Rows parsed from a fetched page, and how many of them matched the search keywords"""
+        with self.lock:
+            observed = self.run.get(source)
+            if observed and observed.get('fetched'):
+                observed.update(rows=rows, relevant=relevant)
+
+    def record_skip(self, source):
+        with self.lock:
+            self.skipped.add(source)
+
+    def end_run(self):
+        """Roll this run's observations into the saved averages"""
+        with self.lock:
+            now = datetime.now().isoformat(timespec='seconds')
+            for source, observed in self.run.items():
+                entry = self.state.setdefault(source, {'runs': 0, 'empty_runs': 0, 'skipped_runs': 0})
+                entry['runs'] += 1
+                entry['skipped_runs'] = 0
+                entry['last_run'] = now
+                entry['failure_rate'] = _ewma(entry.get('failure_rate'), 1.0 if observed.get('failed') else 0.0)
+                if observed.get('seconds') is not None:
+                    entry['latency'] = _ewma(entry.get('latency'), observed['seconds'])
+                    entry['bytes'] = _ewma(entry.get('bytes'), observed['bytes'])
+                if 'rows' in observed:
+                    entry['rows'] = _ewma(entry.get('rows'), observed['rows'])
+                    entry['relevant'] = _ewma(entry.get('relevant'), observed['relevant'])
+                    entry['empty_runs'] = entry['empty_runs'] + 1 if not observed['relevant'] else 0
+            for source in self.skipped - set(self.run):
+                entry = self.state.get(source)
+                if entry:
+                    entry['skipped_runs'] = entry.get('skipped_runs', 0) + 1
+            self.run = {}
+            self.skipped = set()
+            self._save()
+
+    def _save(self):
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"Could not save source stats: {e}")
+
+
+def plan_sources(sources, stats, time_budget=None):
+    """
+    Decide which sources to scrape this run, in what order, with what row
+    cap and time limit
+
+    Sources with a history are ordered by relevant jobs per second; new ones
+    are treated as average until they have one. Row caps (max_jobs) and
+    shares of time_budget (seconds, or None for no per-source limit) go up
+    and down with a source's yield relative to the average. A source that
+    has come back without relevant rows EMPTY_RUNS times in a row is left
+    out, except for a probe every PROBE_EVERY runs, which goes last.
+
+    Returns (planned sources, notes): copies of the source dicts with
+    max_jobs, time_limit, rate and expected (rate, or its stand-in) set,
+    and one line of reasoning per source.
+    """
+    planned = []
+    probes = []
+    notes = []
+    for source in sources:
+        entry = stats.get(source['name']) or {}
+        rate = relevant_per_second(entry)
+        if entry.get('empty_runs', 0) >= EMPTY_RUNS:
+            skipped_runs = entry.get('skipped_runs', 0)
+            if skipped_runs < PROBE_EVERY - 1:
+                stats.record_skip(source['name'])
+                notes.append(f"{source['name']}: left out, no relevant jobs in {entry['empty_runs']} runs "
+                             f"(next try in {PROBE_EVERY - 1 - skipped_runs} runs)")
+                continue
+            probes.append(dict(source, rate=None, expected=0, probe=True))
+            continue
+        planned.append(dict(source, rate=rate, probe=False))
+
+    rates = [source['rate'] for source in planned if source['rate'] is not None]
+    average = sum(rates) / len(rates) if rates else 1.0
+    for source in planned:
+        # Sources without a yield yet count as average, less their failure rate
+        entry = stats.get(source['name']) or {}
+        source['expected'] = source['rate'] if source['rate'] is not None \
+            else average * (1 - entry.get('failure_rate', 0))
+    planned.sort(key=lambda source: -source['expected'])
+    total = sum(source['expected'] for source in planned)
+
+    for source in planned:
+        share = min(MAX_ROW_SHARE, max(MIN_ROW_SHARE, source['expected'] / average)) if average else 1.0
+        share = round(share * 2) / 2  # Steps of half the default, so caps (and parse cache keys) rarely change
+        source['max_jobs'] = max(1, round(source['max_jobs'] * share))
+        source['time_limit'] = None
+        if time_budget:
+            weight = source['expected'] / total if total else 1 / len(planned)
+            source['time_limit'] = max(MIN_TIME_LIMIT, time_budget * weight)
+    for source in probes:
+        source['time_limit'] = MIN_TIME_LIMIT if time_budget else None
+
+    for source in planned + probes:
+        entry = stats.get(source['name'])
+        limit = f", up to {source['time_limit']:.0f}s" if source['time_limit'] else ''
+        if source['probe']:
+            reason = f"probing after {entry['empty_runs']} runs without relevant jobs"
+        elif source['rate'] is None and entry:
+            reason = f"no yield measured yet ({entry.get('failure_rate', 0):.0%} failures), treated as average"
+        elif source['rate'] is None:
+            reason = "no history yet, treated as average"
+        else:
+            reason = (f"{source['rate']:.1f} relevant jobs/s ({entry['relevant']:.0f} of {entry['rows']:.0f} rows "
+                      f"in {entry['latency']:.1f}s, {entry['failure_rate']:.0%} failures)")
+        notes.append(f"{source['name']}: {reason} -> {source['max_jobs']} rows{limit}")
+    return planned + probes, notes
@@ -0,0 +1,137 @@
+"""
+Stage-graph executor for the report pipeline
+Each stage names the stages whose results it needs and starts on a thread
+pool as soon as they are ready, so independent work (writing the CSV,
+rendering the HTML and text bodies, logging in to the mail server) overlaps
+instead of running one after another. Optional stages fail on their own:
+their error is printed, the stages that need them are skipped, and nothing
+else waits for them.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+Stage = namedtuple('Stage', ['name', 'func', 'inputs', 'required'])
+
+
+class StageSkipped(Exception):
+    """Raised for a required stage that couldn't run because a stage it needs failed"""
+
+
+class StageGraph:
+    """
+    Stages and their inputs, run concurrently in dependency order
+
+        graph = StageGraph()
+        graph.add('plan', make_plan)
+        graph.add('html', lambda plan: render_html(plan), inputs=['plan'])
+        graph.add('csv', save_csv, required=False)
+        graph.run()                  # returns once 'plan' and 'html' are done
+        html = graph.result('html')
+        graph.finish()               # waits for 'csv', prints timings
+
+    A stage's function is called with its inputs' results as keyword
+    arguments named after them.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.results = {}
+        self.errors = {}
+        self.skipped = set()
+        self.timings = {}
+        self.started = set()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pool = None
+
+    def add(self, name, func, inputs=(), required=True):
+        """Add a stage; `inputs` must name stages added before it"""
+        missing = [stage for stage in inputs if stage not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} needs unknown stages: {', '.join(missing)}")
+        self.stages[name] = Stage(name, func, tuple(inputs), required)
+
+    def _finished(self, name):
+        return name in self.results or name in self.errors or name in self.skipped
+
+    def _start_ready(self):
+        """Start (or skip) every stage whose inputs are settled; call with the lock held"""
+        progress = True
+        while progress:
+            progress = False
+            for stage in self.stages.values():
+                if stage.name in self.started:
+                    continue
+                failed = [name for name in stage.inputs if name in self.errors or name in self.skipped]
+                if failed:
+                    print(f"Stage {stage.name} skipped: {', '.join(failed)} failed")
+                    self.started.add(stage.name)
+                    self.skipped.add(stage.name)
+                    progress = True
+                elif all(name in self.results for name in stage.inputs):
+                    self.started.add(stage.name)
+                    self.pool.submit(self._run_stage, stage)
+        self.changed.notify_all()
+
+    def _run_stage(self, stage):
+        started = time.monotonic()
+        try:
+            result = stage.func(**{name: self.results[name] for name in stage.inputs})
+        except Exception as e:
+            print(f"Stage {stage.name} failed: {e}")
+            with self.lock:
+                self.timings[stage.name] = time.monotonic() - started
+                self.errors[stage.name] = e
+                self._start_ready()
+            return
+        with self.lock:
+            self.timings[stage.name] = time.monotonic() - started
+            self.results[stage.name] = result
+            self._start_ready()
+
+    def run(self):
+        """
+        Start the graph and wait for its required stages; optional ones may
+        still be running (see finish()). Raises the error of the first
+        required stage that failed, or StageSkipped.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        required = [stage.name for stage in self.stages.values() if stage.required]
+        with self.lock:
+            self._start_ready()
+            while not all(self._finished(name) for name in required) \
+                    and not any(name in self.errors or name in self.skipped for name in required):
+                self.changed.wait()
+        for name in required:
+            if name in self.errors:
+                self.finish()
+                raise self.errors[name]
+            if name in self.skipped:
+                self.finish()
+                raise StageSkipped(f"Stage {name} needs a stage that failed")
+        return self
+
+    def result(self, name, default=None):
+        """A stage's result, or `default` if it failed, was skipped or isn't done yet"""
+        with self.lock:
+            return self.results.get(name, default)
+
+    def finish(self):
+        """Wait for any stages still running, then print how long each took"""
+        if self.pool is None:
+            return
+        with self.lock:
+            while any(name in self.started and not self._finished(name) for name in self.stages):
+                self.changed.wait()
+        self.pool.shutdown(wait=True)
+        self.pool = None
+        if self.timings:
+            timings = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items())
+            print(f"Stage timings: {timings}")
+        failed = sorted(set(self.errors) | self.skipped)
+        if failed:
+            print(f"Stages that didn't complete: {', '.join(failed)}")
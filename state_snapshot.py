@@ -0,0 +1,216 @@
+"""
+Portable snapshot of the local state directory
+Packs the caches, per-source statistics, circuit state, sent history and
+outbox under STATE_DIR into one compressed file, so a fresh CI runner can
+start where the last run left off. The file is a magic line, a JSON header
+(format version, and each file's path, size, mtime and hash) and one zlib
+stream with the files back to back. Restoring checks every hash before
+anything is written.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from contextlib import closing
+
+SNAPSHOT_MAGIC = b'JOBSTATE1\n'
+SNAPSHOT_VERSION = 1
+
+# Run-scoped state that isn't worth carrying to the next run
+EXCLUDE = {'checkpoints', 'work_queue.sqlite'}
+EXCLUDE_SUFFIXES = ('.tmp', '.restore', '-wal', '-shm', '-journal')
+
+# Dropped first to last (oldest first within each) when a snapshot is over
+# its size limit; everything else (history, outbox, statistics) is always kept
+PRUNE_ORDER = ['parse_cache/', 'detail_cache.json', 'link_cache.json', 'structure_snapshot.json',
+               'sent_history.sqlite.bloom']
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _read(path):
+    """A file's bytes; SQLite databases are copied through the backup API so the WAL is included"""
+    if path.endswith('.sqlite'):
+        with closing(sqlite3.connect(path, timeout=30)) as source, closing(sqlite3.connect(':memory:')) as copy:
+            source.backup(copy)
+            return copy.serialize()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _state_files(state_dir):
+    """(path relative to state_dir with / separators, full path) of every file worth keeping"""
+    found = []
+    for root, dirs, files in os.walk(state_dir):
+        relative_root = os.path.relpath(root, state_dir)
+        if relative_root == '.':
+            dirs[:] = [name for name in dirs if name not in EXCLUDE]
+        for name in files:
+            relative = name if relative_root == '.' else f"{relative_root.replace(os.sep, '/')}/{name}"
+            if relative in EXCLUDE or name.endswith(EXCLUDE_SUFFIXES):
+                continue
+            found.append((relative, os.path.join(root, name)))
+    return sorted(found)
+
+
+def _prune_rank(entry):
+    """Position in PRUNE_ORDER (None if never dropped), then age"""
+    for rank, prefix in enumerate(PRUNE_ORDER):
+        if entry['path'] == prefix or (prefix.endswith('/') and entry['path'].startswith(prefix)):
+            return rank, entry['mtime']
+    return None
+
+
+def _prune(entries, max_bytes):
+    """Drop cache files, least valuable and oldest first, until the total fits in max_bytes"""
+    total = sum(entry['size'] for entry in entries)
+    dropped = set()
+    droppable = sorted((entry for entry in entries if _prune_rank(entry) is not None), key=_prune_rank)
+    for entry in droppable:
+        if total <= max_bytes:
+            break
+        dropped.add(entry['path'])
+        total -= entry['size']
+    if total > max_bytes:
+        print(f"State snapshot is {total / 1024 / 1024:.1f} MB without any caches, over the "
+              f"{max_bytes / 1024 / 1024:.0f} MB limit; keeping it anyway")
+    return [entry for entry in entries if entry['path'] not in dropped]
+
+
+def export_snapshot(state_dir, snapshot_file, max_bytes=None, level=6):
+    """
+    Write state_dir to snapshot_file, leaving out caches (oldest first) if
+    the files add up to more than max_bytes. Returns the header written.
+    """
+    started = time.monotonic()
+    entries = []
+    for relative, path in _state_files(state_dir):
+        try:
+            data = _read(path)
+        except Exception as e:
+            print(f"Could not read {path} for the state snapshot: {e}")
+            continue
+        entries.append({'path': relative, 'size': len(data), 'mtime': os.path.getmtime(path),
+                        'hash': _digest(data), 'data': data})
+    kept = _prune(entries, max_bytes) if max_bytes else entries
+
+    header = {'version': SNAPSHOT_VERSION, 'created_at': time.time(),
+              'files': [{key: entry[key] for key in ('path', 'size', 'mtime', 'hash')} for entry in kept]}
+    os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+    tmp_file = snapshot_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(json.dumps(header).encode('utf-8') + b'\n')
+        compressor = zlib.compressobj(level)
+        for entry in kept:
+            f.write(compressor.compress(entry['data']))
+        f.write(compressor.flush())
+    os.replace(tmp_file, snapshot_file)
+
+    raw = sum(entry['size'] for entry in kept)
+    dropped = f", left out {len(entries) - len(kept)} cache files over the limit" if len(kept) < len(entries) else ''
+    print(f"State snapshot: {len(kept)} files, {raw / 1024 / 1024:.1f} MB -> "
+          f"{os.path.getsize(snapshot_file) / 1024 / 1024:.1f} MB in {time.monotonic() - started:.2f}s{dropped}")
+    return header
+
+
+def read_snapshot(snapshot_file):
+    """
+    Read and check a snapshot; returns (header, [(file entry, data)]) or raises
+    ValueError if the file is damaged or from a newer version
+    """
+    with open(snapshot_file, 'rb') as f:
+        if f.readline() != SNAPSHOT_MAGIC:
+            raise ValueError('not a state snapshot')
+        header = json.loads(f.readline())
+        if header.get('version', 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot format {header['version']} is newer than this code ({SNAPSHOT_VERSION})")
+        decompressor = zlib.decompressobj()
+        payload = bytearray()
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            payload += decompressor.decompress(chunk)
+        payload += decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError('snapshot is truncated')
+
+    files = []
+    offset = 0
+    view = memoryview(payload)
+    for entry in header['files']:
+        parts = entry['path'].split('/')
+        if entry['path'].startswith('/') or '..' in parts or '' in parts:
+            raise ValueError(f"unsafe path in snapshot: {entry['path']}")
+        data = view[offset:offset + entry['size']]
+        offset += entry['size']
+        if len(data) != entry['size'] or _digest(data) != entry['hash']:
+            raise ValueError(f"{entry['path']} doesn't match its checksum")
+        files.append((entry, data))
+    if offset != len(payload):
+        raise ValueError('snapshot has trailing data')
+    return header, files
+
+
+def import_snapshot(snapshot_file, state_dir):
+    """
+    Restore state_dir from snapshot_file, replacing the files it contains
+    Returns the number of files restored; nothing is written if the
+    snapshot fails its checks.
+    """
+    started = time.monotonic()
+    if not os.path.exists(snapshot_file):
+        print(f"No state snapshot at {snapshot_file}, starting cold")
+        return 0
+    try:
+        header, files = read_snapshot(snapshot_file)
+    except Exception as e:
+        print(f"Could not restore state snapshot: {e}")
+        return 0
+
+    for entry, data in files:
+        path = os.path.join(state_dir, *entry['path'].split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = path + '.restore'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.utime(tmp_file, (entry['mtime'], entry['mtime']))  # The parse cache evicts by mtime
+        if path.endswith('.sqlite'):
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        os.replace(tmp_file, path)
+    age = (time.time() - header['created_at']) / 3600
+    print(f"Restored {len(files)} state files from a snapshot taken {age:.1f} hours ago "
+          f"in {time.monotonic() - started:.2f}s")
+    return len(files)
+
+
+if __name__ == "__main__":
+    from config_loader import load_config
+    config = load_config()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    snapshot_file = sys.argv[2] if len(sys.argv) > 2 else config.STATE_SNAPSHOT_FILE
+    if command == 'export':
+        export_snapshot(config.STATE_DIR, snapshot_file, max_bytes=config.STATE_SNAPSHOT_MAX_MB * 1024 * 1024)
+    elif command == 'import':
+        import_snapshot(snapshot_file, config.STATE_DIR)
+    elif command == 'verify':
+        try:
+            header, files = read_snapshot(snapshot_file)
+        except Exception as e:
+            print(f"Snapshot check failed: {e}")
+            sys.exit(1)
+        for entry, data in files:
+            print(f"{entry['path']}: {entry['size'] / 1024:.0f} KB")
+        print(f"OK: {len(files)} files, taken {time.strftime('%Y-%m-%d %H:%M', time.localtime(header['created_at']))}")
+    else:
+        print("Usage: python state_snapshot.py [export|import|verify] [snapshot file] [--cloud]")
+        sys.exit(1)
@@ -0,0 +1,199 @@
+"""
+Incremental listing-page parsing
+Feeds an HTML page to the standard library's HTMLParser chunk by chunk as
+it downloads and hands back each job row as soon as its closing tag
+arrives. Only the row being read is kept as a tree; everything outside
+rows, and every row already handed back, is dropped, so memory stays flat
+however large the page is.
+
+Rows are small Node trees with the parts of BeautifulSoup's Tag interface
+the job_scraper row parsers use (find, get, [] and get_text), so the same
+code reads a row from either parser.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+# Elements that never have a closing tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                 'source', 'track', 'wbr'}
+
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+class Node:
+    """An element inside a row: tag name, attributes and children (Nodes and strings)"""
+
+    __slots__ = ('name', 'attrs', 'children')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def _matches(self, name, attrs):
+        if name is not None and self.name != name:
+            return False
+        for key, wanted in attrs.items():
+            value = self.attrs.get(key)
+            values = value.split() if key == 'class' and value is not None else [value]
+            if wanted is True:
+                if value is None:
+                    return False
+            elif callable(wanted):
+                if not any(wanted(v) for v in values):
+                    return False
+            elif wanted != value and wanted not in values:
+                return False
+        return True
+
+    def find(self, name=None, attrs=None, **kwargs):
+        """First descendant matching, like Tag.find (class_ for class, True for "present")"""
+        wanted = dict(attrs or {})
+        for key, value in kwargs.items():
+            wanted['class' if key == 'class_' else key] = value
+        for child in self.children:
+            if isinstance(child, Node):
+                if child._matches(name, wanted):
+                    return child
+                found = child.find(name, wanted)
+                if found is not None:
+                    return found
+        return None
+
+    @property
+    def descendants(self):
+        """Every Node and string inside this one, in document order (like Tag.descendants)"""
+        for child in self.children:
+            yield child
+            if isinstance(child, Node):
+                yield from child.descendants
+
+    def _strings(self):
+        for child in self.children:
+            if isinstance(child, Node):
+                yield from child._strings()
+            else:
+                yield child
+
+    def get_text(self, separator='', strip=False):
+        strings = self._strings()
+        if strip:
+            strings = (text.strip() for text in strings)
+            strings = (text for text in strings if text)
+        return separator.join(strings)
+
+
+class RowParser(HTMLParser):
+    """
+    HTMLParser that builds a Node tree for each element `is_row(tag, attrs)`
+    accepts and passes it to `on_row` when it closes. Rows don't nest: an
+    element inside a row is part of that row.
+    """
+
+    def __init__(self, is_row, on_row):
+        super().__init__(convert_charrefs=True)
+        self.is_row = is_row
+        self.on_row = on_row
+        self.stack = []  # Open elements of the current row, outermost first
+        self.text_ended = False  # A comment came after the last text, so new text starts a new string
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: value if value is not None else '' for key, value in attrs}
+        if not self.stack:
+            if tag not in VOID_ELEMENTS and self.is_row(tag, attrs):
+                self.stack.append(Node(tag, attrs))
+            return
+        node = Node(tag, attrs)
+        self.stack[-1].children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+
+    def handle_endtag(self, tag):
+        # Closes the nearest open element with this name, and anything left unclosed inside it
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth].name == tag:
+                row = self.stack[0]
+                del self.stack[depth:]
+                if depth == 0:
+                    self.on_row(row)
+                return
+
+    def handle_data(self, data):
+        if self.stack:
+            children = self.stack[-1].children
+            # Text split across chunks arrives in pieces; keep it one string
+            if children and isinstance(children[-1], str) and not self.text_ended:
+                children[-1] += data
+            else:
+                children.append(data)
+            self.text_ended = False
+
+    def handle_comment(self, data):
+        # Not text, but (as in BeautifulSoup) it separates the strings around it
+        self.text_ended = True
+
+
+def response_encoding(content_type):
+    """The charset named in a Content-Type header, else UTF-8"""
+    match = CHARSET_PATTERN.search(content_type or '')
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def iter_rows(chunks, is_row, encoding='utf-8'):
+    """
+    Parse an iterable of byte chunks, yielding each row Node as soon as the
+    chunk that closes it has been fed. Stopping early (closing the
+    generator) stops reading `chunks`.
+    """
+    rows = []
+    parser = RowParser(is_row, rows.append)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield from rows
+        rows.clear()
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from rows
+
+
+def preferred_rows(rows, is_row, limit):
+    """
+    For pages with a fallback row type (an older layout's <article>s): up to
+    `limit` of the rows `is_row` accepts, taken from fallback rows too when
+    they are nested in one, and the fallback rows themselves only if the page
+    had no preferred rows at all. This is what the BeautifulSoup parsers get
+    from find_all(preferred) or find_all(fallback). Fallback rows are held
+    until the page ends, since a preferred row may still be coming.
+    """
+    fallback = []
+    found = 0
+    for row in rows:
+        if is_row(row.name, row.attrs):
+            nested = [row]
+        else:
+            nested = [node for node in row.descendants if isinstance(node, Node) and is_row(node.name, node.attrs)]
+            if not nested:
+                if not found and len(fallback) < limit:
+                    fallback.append(row)
+                continue
+        fallback.clear()
+        for node in nested:
+            if found == limit:
+                return
+            found += 1
+            yield node
+    yield from fallback
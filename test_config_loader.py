@@ -0,0 +1,31 @@
+"""
+Tests for config_loader
+
+    python -m unittest test_config_loader
+"""
+
+import os
+import unittest
+from unittest import mock
+
+from config_loader import load_config
+
+
+class LoadConfigTest(unittest.TestCase):
+    def test_local_config_by_default(self):
+        with mock.patch.dict(os.environ, {'CLOUD_DEPLOYMENT': 'false'}):
+            self.assertEqual(load_config(['outbox.py', 'drain']).__name__, 'config')
+
+    def test_cloud_flag(self):
+        argv = ['outbox.py', 'drain', '--cloud']
+        with mock.patch.dict(os.environ, {'CLOUD_DEPLOYMENT': 'false'}):
+            self.assertEqual(load_config(argv).__name__, 'cloud_config')
+        self.assertEqual(argv, ['outbox.py', 'drain'])
+
+    def test_cloud_deployment_env(self):
+        with mock.patch.dict(os.environ, {'CLOUD_DEPLOYMENT': 'true'}):
+            self.assertEqual(load_config(['state_snapshot.py', 'export']).__name__, 'cloud_config')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the daemon's POST /run checks
+
+    python -m unittest test_daemon
+"""
+
+import http.client
+import json
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+import daemon
+
+TOKEN = 'test-token'
+RECIPIENTS = ['reader@example.com', 'Team@Example.com']
+
+
+class FakeDaemon:
+    def __init__(self):
+        self.triggered = []
+
+    def trigger(self, recipients=None):
+        self.triggered.append(recipients)
+        return 'run-1'
+
+
+class RunEndpointTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(daemon.config, DAEMON_TOKEN=TOKEN, RECIPIENT_EMAILS=RECIPIENTS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.daemon = FakeDaemon()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), daemon.make_handler(self.daemon))
+        self.server.RequestHandlerClass.log_message = lambda *args: None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def post(self, body=b'{}', token=TOKEN, content_type='application/json'):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+        headers = {}
+        if token is not None:
+            headers['X-Daemon-Token'] = token
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+        connection.request('POST', '/run', body=body, headers=headers)
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+        connection.close()
+        return response.status, payload
+
+    def test_starts_a_run(self):
+        self.assertEqual(self.post(), (202, {'run_id': 'run-1'}))
+        self.assertEqual(self.daemon.triggered, [None])
+
+    def test_needs_the_token(self):
+        self.assertEqual(self.post(token=None)[0], 403)
+        self.assertEqual(self.post(token='wrong')[0], 403)
+        with mock.patch.object(daemon.config, 'DAEMON_TOKEN', ''):
+            self.assertEqual(self.post(token='')[0], 403)
+        self.assertEqual(self.daemon.triggered, [])
+
+    def test_needs_a_json_content_type(self):
+        # What a cross-origin form post from a web page can send
+        self.assertEqual(self.post(content_type='text/plain')[0], 415)
+        self.assertEqual(self.post(content_type=None)[0], 415)
+        self.assertEqual(self.post(content_type='application/json; charset=utf-8')[0], 202)
+
+    def test_rejects_malformed_bodies(self):
+        for body in (b'not json', b'[]', b'"me@example.com"', b'{"recipients": "reader@example.com"}',
+                     b'{"recipients": [1]}'):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body)[0], 400)
+        self.assertEqual(self.daemon.triggered, [])
+
+    def test_recipients_must_be_configured(self):
+        status, payload = self.post(b'{"recipients": ["reader@example.com", "stranger@example.com"]}')
+        self.assertEqual(status, 400)
+        self.assertIn('stranger@example.com', payload['error'])
+        self.assertEqual(self.post(b'{"recipients": ["team@example.com"]}')[0], 202)
+        self.assertEqual(self.daemon.triggered, [['Team@Example.com']])
+
+
+if __name__ == '__main__':
+    unittest.main()
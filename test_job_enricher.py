@@ -0,0 +1,131 @@
+"""
+Tests for job_enricher: the URL cache, the per-host limit and slow pages
+
+    python -m unittest test_job_enricher
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from collections import defaultdict
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlparse
+
+import job_enricher
+
+DETAIL_PAGE = b"""<html><head><script type="application/ld+json">
+{"@type": "JobPosting", "description": "<p>Build models</p>", "datePosted": "2026-10-01",
+ "baseSalary": {"currency": "USD", "value": {"minValue": 150000, "maxValue": 180000, "unitText": "YEAR"}},
+ "jobLocation": {"address": {"addressLocality": "Berlin", "addressCountry": "DE"}}}
+</script></head><body></body></html>"""
+
+
+def jobs(*links):
+    return [{'title': f"AI Engineer {number}", 'company': 'Acme', 'location': 'Remote', 'link': link}
+            for number, link in enumerate(links)]
+
+
+def details(link):
+    return {'description': f"About {link}", 'salary': '', 'location': 'Berlin, DE', 'posted_date': '2026-10-01'}
+
+
+def quietly(func, *args, **kwargs):
+    with redirect_stdout(StringIO()):
+        return func(*args, **kwargs)
+
+
+class DetailCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_file = os.path.join(directory.name, 'detail_cache.json')
+
+    def enrich(self, rows):
+        with mock.patch.object(job_enricher, 'fetch_job_details', side_effect=lambda link, **kwargs: details(link)) \
+                as fetch:
+            enriched = quietly(job_enricher.enrich_jobs, rows, cache_file=self.cache_file)
+        return enriched, sorted(call.args[0] for call in fetch.call_args_list)
+
+    def test_each_page_is_fetched_once(self):
+        links = ['https://a.example/1', 'https://a.example/2']
+        enriched, fetched = self.enrich(jobs(*links))
+        self.assertEqual(fetched, links)
+        self.assertEqual([job['location'] for job in enriched], ['Berlin, DE', 'Berlin, DE'])
+
+        enriched, fetched = self.enrich(jobs(*links, 'https://b.example/3'))
+        self.assertEqual(fetched, ['https://b.example/3'])  # Only the miss
+        self.assertEqual(enriched[0]['description'], 'About https://a.example/1')  # Hit, from the cache
+
+    def test_cache_survives_a_restart(self):
+        self.enrich(jobs('https://a.example/1'))
+        job_enricher._loaded_caches.clear()
+        self.assertEqual(self.enrich(jobs('https://a.example/1'))[1], [])
+
+    def test_failed_pages_are_not_cached(self):
+        with mock.patch.object(job_enricher, 'fetch_job_details', side_effect=OSError('connection reset')):
+            enriched = quietly(job_enricher.enrich_jobs, jobs('https://a.example/1'), cache_file=self.cache_file)
+        self.assertEqual(enriched[0]['location'], 'Remote')
+        self.assertEqual(self.enrich(jobs('https://a.example/1'))[1], ['https://a.example/1'])
+
+
+class PerHostLimitTest(unittest.TestCase):
+    def test_in_flight_requests_per_host_stay_under_the_limit(self):
+        lock = threading.Lock()
+        in_flight = defaultdict(int)
+        most = defaultdict(int)
+
+        def slow_fetch(link, **kwargs):
+            host = urlparse(link).netloc
+            with lock:
+                in_flight[host] += 1
+                most[host] = max(most[host], in_flight[host])
+            time.sleep(0.05)
+            with lock:
+                in_flight[host] -= 1
+            return details(link)
+
+        links = [f"https://{host}.example/{number}" for host in ('a', 'b') for number in range(10)]
+        with mock.patch.object(job_enricher, 'fetch_job_details', side_effect=slow_fetch):
+            enriched = quietly(job_enricher.enrich_jobs, jobs(*links), max_workers=8, per_host_limit=2)
+        self.assertEqual(dict(most), {'a.example': 2, 'b.example': 2})
+        self.assertTrue(all(job['description'] for job in enriched))
+
+
+class SlowPage(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(3)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(DETAIL_PAGE)))
+        self.end_headers()
+        self.wfile.write(DETAIL_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowPageTest(unittest.TestCase):
+    def test_slow_page_times_out_without_holding_up_the_rest(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowPage)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        started = time.monotonic()
+        enriched = quietly(job_enricher.enrich_jobs, jobs(f"{base}/slow", f"{base}/fast"), timeout=0.3)
+        self.assertLess(time.monotonic() - started, 2.5)  # Well before the slow page would have answered
+        slow, fast = enriched
+        self.assertEqual((slow['location'], slow['description']), ('Remote', ''))
+        self.assertEqual(fast['location'], 'Berlin, DE')
+        self.assertEqual(fast['salary'], 'USD 150000-180000 per year')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for outbox: claims and leases on queued messages
+
+    python -m unittest test_outbox
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from outbox import Outbox
+
+SENDER = 'sender@example.com'
+
+
+class OutboxClaimTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.outbox = Outbox(os.path.join(directory.name, 'outbox.sqlite'))
+        self.outbox.enqueue('run-1', SENDER, ['a@example.com', 'b@example.com'], 'Weekly jobs', '<p>hi</p>', 'hi',
+                            jobs=[{'title': 'AI Engineer'}], checkpoint_run_id='run-0')
+
+    def due_ids(self, now=None):
+        return [message['id'] for message in self.outbox.due([SENDER], now=now)]
+
+    def test_due_messages_carry_their_report(self):
+        message = self.outbox.due([SENDER])[0]
+        self.assertEqual((message['recipient'], message['subject'], message['text']),
+                         ('a@example.com', 'Weekly jobs', 'hi'))
+        self.assertEqual(message['jobs'], [{'title': 'AI Engineer'}])
+        self.assertEqual(message['checkpoint_run_id'], 'run-0')
+
+    def test_enqueue_twice_queues_once(self):
+        self.outbox.enqueue('run-1', SENDER, ['a@example.com'], 'Weekly jobs', '<p>hi</p>', 'hi')
+        self.assertEqual(self.outbox.counts('run-1'), {'queued': 2})
+
+    def test_only_one_dispatcher_gets_a_message(self):
+        first = self.due_ids()[0]
+        self.assertTrue(self.outbox.claim(first, 'dispatcher-1'))
+        self.assertFalse(self.outbox.claim(first, 'dispatcher-2'))
+        self.assertNotIn(first, self.due_ids())
+        self.assertEqual(self.outbox.counts('run-1'), {'queued': 1, 'sending': 1})
+
+    def test_expired_lease_is_requeued(self):
+        first = self.due_ids()[0]
+        self.assertTrue(self.outbox.claim(first, 'dispatcher-1', lease_seconds=0))
+        time.sleep(0.01)
+        self.assertIn(first, self.due_ids())
+        self.assertTrue(self.outbox.claim(first, 'dispatcher-2'))
+
+    def test_live_lease_is_kept(self):
+        first = self.due_ids()[0]
+        self.outbox.claim(first, 'dispatcher-1', lease_seconds=60)
+        self.assertNotIn(first, self.due_ids(now=time.time() + 30))
+        self.assertIn(first, self.due_ids(now=time.time() + 120))
+
+    def test_release_gives_the_message_back(self):
+        first = self.due_ids()[0]
+        self.outbox.claim(first, 'dispatcher-1')
+        self.outbox.release(first)
+        self.assertTrue(self.outbox.claim(first, 'dispatcher-2'))
+
+    def test_finished_messages_cannot_be_claimed(self):
+        first, second = self.due_ids()
+        self.outbox.claim(first, 'dispatcher-1')
+        self.outbox.mark_sent(first)
+        self.outbox.claim(second, 'dispatcher-1')
+        self.outbox.mark_failed(second, 'mailbox unavailable')
+        self.assertFalse(self.outbox.claim(first, 'dispatcher-2'))
+        self.assertFalse(self.outbox.claim(second, 'dispatcher-2'))
+        self.assertEqual(self.outbox.sent_recipients('run-1'), {'a@example.com'})
+
+    def test_retry_waits_for_its_time(self):
+        first = self.due_ids()[0]
+        self.outbox.claim(first, 'dispatcher-1')
+        self.outbox.mark_retry(first, 'timed out', time.time() + 60)
+        self.assertNotIn(first, self.due_ids())
+        self.assertIn(first, self.due_ids(now=time.time() + 120))
+
+    def test_purge_keeps_unfinished_messages(self):
+        first, second = self.due_ids()
+        self.outbox.claim(first, 'dispatcher-1')
+        self.outbox.mark_sent(first)
+        self.outbox.purge(older_than_days=-1)
+        self.assertEqual(self.outbox.counts(), {'queued': 1})
+        self.assertEqual(self.due_ids(), [second])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for parse_cache, including processes sharing the directory
+
+    python -m unittest test_parse_cache
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import parse_cache
+from parse_cache import ParseCache
+
+SOURCE = {'name': 'RemoteOK', 'parser_version': 1}
+RECORDS = [{'title': 'AI Engineer', 'company': 'Acme'}]
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = ParseCache(self.directory)
+
+    def age(self, path, seconds):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def test_hit_and_miss(self):
+        key = ParseCache.key(SOURCE, b'<html>page</html>', 25)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, RECORDS)
+        self.assertEqual(self.cache.get(key), RECORDS)
+        self.assertNotEqual(key, ParseCache.key(dict(SOURCE, parser_version=2), b'<html>page</html>', 25))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_entry_evicted_while_being_read(self):
+        self.cache.put('abc', RECORDS)
+        with mock.patch.object(parse_cache.os, 'utime', side_effect=FileNotFoundError):
+            self.assertEqual(self.cache.get('abc'), RECORDS)
+
+    def test_prune_leaves_young_temp_files(self):
+        young = os.path.join(self.directory, 'abc.json.1-2.tmp')
+        old = os.path.join(self.directory, 'def.json.3-4.tmp')
+        for path in (young, old):
+            with open(path, 'w') as f:
+                f.write('{}')
+        self.age(old, parse_cache.TMP_GRACE_SECONDS + 60)
+        self.cache.prune()
+        self.assertTrue(os.path.exists(young))  # Another process may still be writing it
+        self.assertFalse(os.path.exists(old))
+
+    def test_prune_evicts_old_then_least_recently_used(self):
+        for key in ('old', 'used', 'unused'):
+            self.cache.put(key, RECORDS)
+        self.age(self.cache._path('old'), 15 * 86400)
+        self.age(self.cache._path('unused'), 60)
+        self.cache.max_bytes = os.path.getsize(self.cache._path('used'))
+        self.cache.prune()
+        self.assertEqual(sorted(os.listdir(self.directory)), ['used.json'])
+
+    def test_prune_tolerates_files_removed_by_another_process(self):
+        self.cache.put('old', RECORDS)
+        self.age(self.cache._path('old'), 15 * 86400)
+        with mock.patch.object(parse_cache.os, 'remove', side_effect=FileNotFoundError):
+            self.cache.prune()
+
+    def test_prune_without_a_directory(self):
+        ParseCache(os.path.join(self.directory, 'missing')).prune()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for polite_get's retries and the circuit breaker
+
+    python -m unittest test_rate_limiter
+"""
+
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+import requests
+
+import rate_limiter
+from deadline import Deadline
+from rate_limiter import CircuitBreaker, CircuitOpenError, HostRateLimiter, polite_get
+
+URL = 'https://boards.example/jobs'
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.url = URL
+
+    def iter_content(self, chunk_size):
+        yield b'<html></html>'
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Answers each get() with the next outcome: an exception to raise or a status code"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+class PoliteGetTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(rate_limiter.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3)
+
+    def get(self, session, **kwargs):
+        with redirect_stdout(StringIO()):
+            return polite_get(URL, source='Board', breaker=self.breaker, session=session,
+                              limiter=HostRateLimiter(rate=1000, capacity=1000), **kwargs)
+
+    def backoffs(self):
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_retries_back_off_exponentially(self):
+        session = FakeSession(requests.ConnectionError('reset'), requests.Timeout('slow'), 200)
+        self.assertEqual(self.get(session, max_retries=2).status_code, 200)
+        self.assertEqual(session.calls, 3)
+        self.assertEqual(self.backoffs(), [rate_limiter.RETRY_BACKOFF, rate_limiter.RETRY_BACKOFF * 2])
+
+    def test_one_failed_fetch_is_one_breaker_failure(self):
+        session = FakeSession(*[requests.ConnectionError('reset')] * 3)
+        with self.assertRaises(requests.ConnectionError):
+            self.get(session, max_retries=2)
+        self.assertEqual(self.breaker.failures['Board'], 1)
+        self.assertTrue(self.breaker.allow('Board'))
+
+    def test_circuit_opens_after_threshold_failed_fetches(self):
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                self.get(FakeSession(503, 503), max_retries=1)
+        with self.assertRaises(CircuitOpenError):
+            self.get(FakeSession(200))
+
+    def test_success_after_retries_counts_no_failure(self):
+        self.get(FakeSession(requests.ConnectionError('reset'), 500, 200), max_retries=2)
+        self.assertEqual(self.breaker.failures['Board'], 0)
+
+    def test_backoff_stops_at_the_deadline(self):
+        deadline = Deadline(0.2)
+        session = FakeSession(requests.ConnectionError('reset'), 200)
+        self.get(session, max_retries=1, deadline=deadline)
+        self.assertLessEqual(self.backoffs()[0], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
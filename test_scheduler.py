@@ -0,0 +1,117 @@
+"""
+Tests for scheduler: cron parsing and scheduled runs' run ids
+
+    python -m unittest test_scheduler
+"""
+
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import scheduler
+from checkpoint import new_run_id
+from scheduler import CronSchedule, _parse_field, DAY_NAMES, MONTH_NAMES
+
+UTC = ZoneInfo('UTC')
+
+
+def at(*parts, tz=UTC):
+    return datetime(*parts, tzinfo=tz)
+
+
+class ParseFieldTest(unittest.TestCase):
+    def test_forms(self):
+        self.assertEqual(_parse_field('*', 0, 5), {0, 1, 2, 3, 4, 5})
+        self.assertEqual(_parse_field('1,3', 0, 59), {1, 3})
+        self.assertEqual(_parse_field('1-4', 0, 59), {1, 2, 3, 4})
+        self.assertEqual(_parse_field('*/15', 0, 59), {0, 15, 30, 45})
+        self.assertEqual(_parse_field('10/20', 0, 59), {10, 30, 50})
+        self.assertEqual(_parse_field('0-10/5,30', 0, 59), {0, 5, 10, 30})
+
+    def test_names(self):
+        self.assertEqual(_parse_field('mon-fri', 0, 6, DAY_NAMES), {1, 2, 3, 4, 5})
+        self.assertEqual(_parse_field('Sunday', 0, 6, DAY_NAMES), {0})
+        self.assertEqual(_parse_field('jan,dec', 1, 12, MONTH_NAMES), {1, 12})
+
+    def test_out_of_range(self):
+        for field, low, high in [('60', 0, 59), ('0', 1, 31), ('5-2', 0, 59), ('13', 1, 12)]:
+            with self.subTest(field=field):
+                with self.assertRaises(ValueError):
+                    _parse_field(field, low, high)
+
+
+class CronScheduleTest(unittest.TestCase):
+    def test_needs_five_fields(self):
+        with self.assertRaises(ValueError):
+            CronSchedule('0 9 * *')
+
+    def test_weekly(self):
+        schedule = CronSchedule('0 9 * * mon', tz='UTC')
+        # 2026-10-18 is a Sunday
+        self.assertEqual(schedule.next_after(at(2026, 10, 18, 12, 0)), at(2026, 10, 19, 9, 0))
+        self.assertEqual(schedule.next_after(at(2026, 10, 19, 9, 0)), at(2026, 10, 26, 9, 0))
+
+    def test_strictly_after(self):
+        schedule = CronSchedule('*/15 * * * *', tz='UTC')
+        self.assertEqual(schedule.next_after(at(2026, 1, 1, 0, 15, 30)), at(2026, 1, 1, 0, 30))
+        self.assertEqual(schedule.next_after(at(2026, 12, 31, 23, 59)), at(2027, 1, 1, 0, 0))
+
+    def test_seven_is_sunday(self):
+        schedule = CronSchedule('30 6 * * 7', tz='UTC')
+        self.assertEqual(schedule.next_after(at(2026, 10, 19, 0, 0)), at(2026, 10, 25, 6, 30))
+
+    def test_weekday_ranges_ending_in_seven(self):
+        self.assertEqual(CronSchedule('* * * * 1-7').weekdays, {0, 1, 2, 3, 4, 5, 6})
+        self.assertEqual(CronSchedule('* * * * 5-7').weekdays, {5, 6, 0})
+        self.assertEqual(CronSchedule('* * * * 0,7').weekdays, {0})
+        self.assertEqual(CronSchedule('* * * * */2').weekdays, {0, 2, 4, 6})
+        with self.assertRaises(ValueError):
+            CronSchedule('* * * * 8')
+
+    def test_either_day_field_matches_when_both_are_restricted(self):
+        schedule = CronSchedule('0 0 1 * fri', tz='UTC')
+        # Friday 2026-10-23 comes before the 1st of November
+        self.assertEqual(schedule.next_after(at(2026, 10, 19, 0, 0)), at(2026, 10, 23, 0, 0))
+        self.assertEqual(schedule.next_after(at(2026, 10, 30, 0, 0)), at(2026, 11, 1, 0, 0))
+
+    def test_month_names_and_leap_day(self):
+        schedule = CronSchedule('0 12 29 feb *', tz='UTC')
+        self.assertEqual(schedule.next_after(at(2026, 3, 1, 0, 0)), at(2028, 2, 29, 12, 0))
+
+    def test_never_fires(self):
+        with self.assertRaises(ValueError):
+            CronSchedule('0 0 30 feb *', tz='UTC').next_after(at(2026, 1, 1, 0, 0))
+
+    def test_timezone(self):
+        schedule = CronSchedule('0 9 * * *', tz='Asia/Kolkata')
+        trigger = schedule.next_after(at(2026, 10, 19, 4, 0))  # 09:30 in Kolkata
+        self.assertEqual(trigger, at(2026, 10, 20, 9, 0, tz=ZoneInfo('Asia/Kolkata')))
+        self.assertEqual(trigger.astimezone(UTC), at(2026, 10, 20, 3, 30))
+
+
+class JobRunIdTest(unittest.TestCase):
+    def run_job(self, **kwargs):
+        with mock.patch.object(scheduler, 'generate_and_send_report') as report, redirect_stdout(StringIO()):
+            scheduler.job(**kwargs)
+        return report.call_args.kwargs
+
+    def test_run_ids_are_unique_within_a_second(self):
+        self.assertEqual(len({new_run_id() for _ in range(100)}), 100)
+
+    def test_fresh_runs_get_their_own_checkpoint(self):
+        first = self.run_job(schedule_name='emea')
+        second = self.run_job(schedule_name='apac')
+        self.assertIsNone(first['resume_run_id'])
+        self.assertTrue(first['run_id'].endswith('-emea'))
+        self.assertTrue(second['run_id'].endswith('-apac'))
+
+    def test_given_run_id_is_kept(self):
+        self.assertEqual(self.run_job(schedule_name='adhoc', run_id='20260101-000000-abc123-adhoc')['run_id'],
+                         '20260101-000000-abc123-adhoc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for sent_history: the Bloom filter and the history built on it
+
+    python -m unittest test_sent_history
+"""
+
+import hashlib
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from sent_history import BloomFilter, SentHistory
+
+
+def digest(number):
+    return hashlib.blake2b(str(number).encode('utf-8'), digest_size=16).digest()
+
+
+def jobs(*numbers):
+    return [{'title': f"Job {number}", 'company': 'Acme', 'link': f"https://example.com/jobs/{number}"}
+            for number in numbers]
+
+
+class BloomFilterTest(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(digest(number))
+        self.assertTrue(all(digest(number) in bloom for number in range(1000)))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(digest(number))
+        false_positives = sum(digest(number) in bloom for number in range(1000, 21000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_add_counts_new_digests_once(self):
+        bloom = BloomFilter(2, 0.01)
+        self.assertTrue(bloom.add(digest(1)))
+        self.assertFalse(bloom.add(digest(1)))
+        self.assertEqual(bloom.count, 1)
+        self.assertFalse(bloom.full)
+        bloom.add(digest(2))
+        self.assertTrue(bloom.full)
+
+    def test_round_trips_through_its_header(self):
+        bloom = BloomFilter(100, 0.001)
+        bloom.add(digest(1))
+        header = bloom.header()
+        copy = BloomFilter(header['capacity'], header['error_rate'], header['created_at'], header['count'],
+                           bytearray(bloom.bits))
+        self.assertEqual(len(copy.bits), header['bytes'])
+        self.assertIn(digest(1), copy)
+        self.assertNotIn(digest(2), copy)
+
+
+class SentHistoryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'sent_history.sqlite')
+
+    def open(self, **kwargs):
+        with redirect_stdout(StringIO()):
+            return SentHistory(self.path, capacity=100, error_rate=0.01, **kwargs)
+
+    def test_record_and_check(self):
+        history = self.open()
+        history.record('Reader@Example.com ', jobs(1, 2))
+        self.assertEqual(history.already_sent('reader@example.com', jobs(1, 2, 3)),
+                         {'https://example.com/jobs/1', 'https://example.com/jobs/2'})
+        self.assertEqual(history.already_sent('other@example.com', jobs(1)), set())
+        self.assertEqual([job['title'] for job in history.unsent('reader@example.com', jobs(1, 3, 2, 4), 2)],
+                         ['Job 3', 'Job 4'])
+
+    def test_saved_filters_are_reused(self):
+        history = self.open()
+        history.record('reader@example.com', jobs(1))
+        history.save()
+        output = StringIO()
+        with redirect_stdout(output):
+            reopened = SentHistory(self.path, capacity=100, error_rate=0.01)
+        self.assertNotIn('Rebuilding', output.getvalue())
+        self.assertEqual(reopened.already_sent('reader@example.com', jobs(1)), {'https://example.com/jobs/1'})
+
+    def test_sends_recorded_by_another_process_are_not_lost(self):
+        first = self.open()
+        second = self.open()
+        first.record('reader@example.com', jobs(1))
+        first.save()
+        second.record('reader@example.com', jobs(2))
+        second.save()  # Its filters lack job 1, so it rebuilds rather than overwrite first's file
+        reopened = self.open()
+        self.assertEqual(reopened.already_sent('reader@example.com', jobs(1, 2)),
+                         {'https://example.com/jobs/1', 'https://example.com/jobs/2'})
+
+    def test_unsaved_filters_are_rebuilt(self):
+        history = self.open()
+        history.record('reader@example.com', jobs(1))
+        self.assertFalse(os.path.exists(history.filter_file))  # Never saved
+        reopened = self.open()
+        self.assertEqual(reopened.already_sent('reader@example.com', jobs(1)), {'https://example.com/jobs/1'})
+
+    def test_oldest_slice_is_dropped(self):
+        history = self.open(max_filters=2)
+        for number in range(250):
+            history.record('reader@example.com', jobs(number))
+        self.assertEqual(len(history.filters), 2)
+        self.assertEqual(history.already_sent('reader@example.com', jobs(0)), set())
+        self.assertEqual(history.already_sent('reader@example.com', jobs(249)), {'https://example.com/jobs/249'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Tests for stream_parser: the job dicts stream_source reads from a page as it
+downloads must match what the BeautifulSoup parsers read from the whole page
+
+    python -m unittest test_stream_parser
+"""
+
+import unittest
+from unittest import mock
+
+import job_scraper
+from stream_parser import iter_rows, preferred_rows
+
+REMOTEOK_PAGE = b"""<html><body><table>
+<tr class="job" data-url="/remote-jobs/1"><td class="company_and_position">
+  <h2 itemprop="title">Senior AI Engineer &amp; Researcher</h2><h3 itemprop="name">Acme</h3></td></tr>
+<tr class="ad"><td><h2>Sponsored</h2></td></tr>
+<tr class="job"><td><h2>ML <!-- promoted --> Platform Engineer</h2><h3 class="company">Beta &#8211; Labs</h3>
+  <a class="preventLink" href="/remote-jobs/2">apply</a><br><img src="x.png"></td></tr>
+<tr class="job expand" data-url="/remote-jobs/3"><td><h2>Data Scientist, NLP</h2><p>unclosed<h3>Gamma</h3></td></tr>
+<tr class="job" data-url="/remote-jobs/4"><td><h2>AI</h2></td></tr>
+</table></body></html>"""
+
+WEWORKREMOTELY_PAGE = """<ul>
+<li class="feature"><a href="/remote-jobs/acme-ml-engineer"><span class="title">Machine Learning Engineer</span>
+  <span class="company">Acme</span><span class="region">Europe Only</span></a></li>
+<li class="view-all"><a href="/all">All jobs</a></li>
+<li class="feature new"><a href="/remote-jobs/beta-data"><span class="title">Data Scientist – Ünïcode</span>
+  <span class="company">Beta</span></a></li>
+</ul>""".encode('utf-8')
+
+HIMALAYAS_CARDS = b"""<main>
+<div data-test="job-card"><h3>AI Research Engineer</h3><span data-test="job-card-company">Acme</span>
+  <a href="/companies/acme/jobs/1">View</a></div>
+<div data-test="job-card"><a href="https://himalayas.app/companies/beta/jobs/2">LLM Engineer</a>
+  <div class="companyName">Beta</div></div>
+</main>"""
+
+HIMALAYAS_ARTICLES = b"""<main>
+<article><h3>Computer Vision Engineer</h3><div class="company-name">Gamma</div><a href="/jobs/3">View</a></article>
+<article><h3>MLOps Engineer</h3><a href="/jobs/4">View</a></article>
+</main>"""
+
+# A newer layout that wraps each card in an <article>, after an article without one
+HIMALAYAS_MIXED = b"""<main>
+<article><h3>Old Layout Engineer</h3><a href="/jobs/5">View</a></article>
+<article><div data-test="job-card"><h3>Applied Scientist</h3><a href="/jobs/6">View</a></div></article>
+<div data-test="job-card"><h3>Prompt Engineer</h3><a href="/jobs/7">View</a></div>
+</main>"""
+
+
+class FakeResponse:
+    """Just enough of a streamed requests.Response for stream_source"""
+
+    def __init__(self, content, content_type='text/html; charset=utf-8'):
+        self.content = content
+        self.headers = {'Content-Type': content_type}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def streamed_jobs(source, page, chunk_size, max_jobs=None):
+    with mock.patch.object(job_scraper, 'polite_get', return_value=FakeResponse(page)), \
+            mock.patch.object(job_scraper, 'STREAM_CHUNK_SIZE', chunk_size):
+        return job_scraper.stream_source(source, max_jobs or source['max_jobs'])
+
+
+class StreamParserEquivalenceTest(unittest.TestCase):
+    def assert_same_jobs(self, source_name, page, max_jobs=None):
+        source = job_scraper.SOURCES_BY_NAME[source_name]
+        expected = source['parser'](page, max_jobs=max_jobs or source['max_jobs'])
+        self.assertTrue(expected, 'the page should have parseable rows')
+        for chunk_size in (1, 7, 64, len(page)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(streamed_jobs(source, page, chunk_size, max_jobs), expected)
+
+    def test_remoteok(self):
+        self.assert_same_jobs('RemoteOK', REMOTEOK_PAGE)
+
+    def test_remoteok_row_limit(self):
+        self.assert_same_jobs('RemoteOK', REMOTEOK_PAGE, max_jobs=2)
+
+    def test_weworkremotely_multibyte_text(self):
+        self.assert_same_jobs('WeWorkRemotely', WEWORKREMOTELY_PAGE)
+
+    def test_himalayas_cards(self):
+        self.assert_same_jobs('Himalayas', HIMALAYAS_CARDS)
+
+    def test_himalayas_falls_back_to_articles(self):
+        self.assert_same_jobs('Himalayas', HIMALAYAS_ARTICLES)
+
+    def test_himalayas_prefers_cards_nested_in_articles(self):
+        self.assert_same_jobs('Himalayas', HIMALAYAS_MIXED)
+        self.assert_same_jobs('Himalayas', HIMALAYAS_MIXED, max_jobs=1)
+
+
+class IterRowsTest(unittest.TestCase):
+    def test_rows_arrive_before_the_page_ends(self):
+        chunks = [b'<table><tr class="job"><td>one</td></tr>', b'<tr class="job"><td>two</td>', b'</tr></table>']
+        fed = []
+
+        def feed():
+            for chunk in chunks:
+                fed.append(chunk)
+                yield chunk
+
+        rows = iter_rows(feed(), job_scraper.is_remoteok_row)
+        self.assertEqual(next(rows).get_text(), 'one')
+        self.assertEqual(len(fed), 1)
+        self.assertEqual(next(rows).get_text(), 'two')
+        self.assertEqual(len(fed), 3)
+
+    def test_split_multibyte_character(self):
+        page = '<li class="feature"><span>Zürich</span></li>'.encode('utf-8')
+        rows = list(iter_rows((page[i:i + 1] for i in range(len(page))), job_scraper.is_weworkremotely_row))
+        self.assertEqual([row.get_text() for row in rows], ['Zürich'])
+
+    def test_preferred_rows_holds_fallbacks_until_the_page_ends(self):
+        rows = iter_rows([HIMALAYAS_ARTICLES],
+                         lambda tag, attrs: job_scraper.is_himalayas_row(tag, attrs) or tag == 'article')
+        picked = list(preferred_rows(rows, job_scraper.is_himalayas_row, 5))
+        self.assertEqual([row.name for row in picked], ['article', 'article'])
+
+
+if __name__ == '__main__':
+    unittest.main()
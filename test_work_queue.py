@@ -0,0 +1,85 @@
+"""
+Tests for work_queue: leases, their expiry, retries and time budgets
+
+    python -m unittest test_work_queue
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from work_queue import WorkQueue
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'work_queue.sqlite')
+
+    def queue(self, **kwargs):
+        queue = WorkQueue(self.path, **kwargs)
+        queue.enqueue('run-1', [('RemoteOK', 1)])
+        return queue
+
+    def test_lease_and_complete(self):
+        queue = self.queue()
+        unit = queue.lease('worker-1')
+        self.assertEqual((unit['run_id'], unit['source'], unit['page']), ('run-1', 'RemoteOK', 1))
+        self.assertIsNone(queue.lease('worker-2'))
+        self.assertTrue(queue.complete(unit['id'], 'worker-1', [{'title': 'AI Engineer'}]))
+        self.assertEqual(queue.units('run-1')[0]['records'], [{'title': 'AI Engineer'}])
+        self.assertFalse(queue.has_pending())
+
+    def test_expired_lease_goes_to_another_worker(self):
+        queue = self.queue()
+        unit = queue.lease('worker-1', lease_seconds=0)
+        time.sleep(0.01)
+        retaken = queue.lease('worker-2')
+        self.assertEqual(retaken['id'], unit['id'])
+        self.assertFalse(queue.complete(unit['id'], 'worker-1', []))  # Lost its lease
+        self.assertTrue(queue.complete(unit['id'], 'worker-2', []))
+        self.assertEqual(queue.units('run-1')[0]['attempts'], 2)
+
+    def test_unit_fails_after_its_last_lease_expires(self):
+        queue = self.queue(max_attempts=2)
+        for worker in ('worker-1', 'worker-2'):
+            self.assertIsNotNone(queue.lease(worker, lease_seconds=0))
+            time.sleep(0.01)
+        self.assertIsNone(queue.lease('worker-3'))
+        self.assertEqual(queue.counts('run-1'), {'failed': 1})
+        self.assertEqual(queue.units('run-1')[0]['error'], 'lease expired')
+
+    def test_failed_attempt_waits_before_retrying(self):
+        queue = self.queue(retry_base_seconds=60)
+        unit = queue.lease('worker-1')
+        queue.fail(unit['id'], 'worker-1', 'HTTP 503')
+        self.assertIsNone(queue.lease('worker-1'))
+        self.assertTrue(queue.has_pending())
+
+        queue = self.queue(retry_base_seconds=0)  # Re-queueing clears the wait
+        self.assertEqual(queue.lease('worker-1')['id'], unit['id'])
+
+    def test_units_past_their_time_budget_are_cancelled(self):
+        queue = WorkQueue(self.path)
+        queue.enqueue('run-1', [('RemoteOK', 1)], not_after=time.time() - 1)
+        self.assertIsNone(queue.lease('worker-1'))
+        self.assertEqual(queue.counts('run-1'), {'cancelled': 1})
+
+        queue.enqueue('run-1', [('RemoteOK', 1)], not_after=time.time() + 60)  # Resumed with a new budget
+        self.assertIsNotNone(queue.lease('worker-1'))
+
+    def test_requeue_keeps_finished_and_leased_units(self):
+        queue = self.queue()
+        queue.enqueue('run-1', [('RemoteOK', 1), ('RemoteOK', 2)])
+        done = queue.lease('worker-1')
+        queue.complete(done['id'], 'worker-1', [])
+        leased = queue.lease('worker-1')
+        queue.enqueue('run-1', [('RemoteOK', 1), ('RemoteOK', 2)])
+        self.assertEqual(queue.counts('run-1'), {'done': 1, 'leased': 1})
+        self.assertTrue(queue.complete(leased['id'], 'worker-1', []))
+
+
+if __name__ == '__main__':
+    unittest.main()
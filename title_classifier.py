@@ -0,0 +1,181 @@
+"""
+Job title classification
+Maps each title to a normalized form, a seniority level and a role family
+("Senior ML Engineer", "ML Engineer II" and "Staff Machine Learning
+Engineer" all become machine learning engineer / mle, at different levels),
+so filters and ranking can work on categorical columns instead of
+re-reading title text. Titles repeat a lot across sources, so results are
+memoized and a DataFrame is classified once per distinct title.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from records import is_frame
+
+TitleClass = namedtuple('TitleClass', ['normalized', 'seniority', 'family'])
+
+TITLE_FIELDS = ['title_normalized', 'seniority', 'role_family']
+
+# Lowest to highest; 'mid' is assumed when a title doesn't say
+SENIORITY_LEVELS = ['intern', 'junior', 'mid', 'senior', 'lead', 'staff', 'principal', 'director']
+
+SENIORITY_TOKENS = {
+    'intern': 'intern', 'internship': 'intern', 'trainee': 'intern',
+    'junior': 'junior', 'jr': 'junior', 'entry': 'junior', 'graduate': 'junior', 'grad': 'junior',
+    'associate': 'junior',
+    'mid': 'mid', 'intermediate': 'mid',
+    'senior': 'senior', 'sr': 'senior',
+    'lead': 'lead',
+    'staff': 'staff',
+    'principal': 'principal', 'distinguished': 'principal',
+    'head': 'director', 'director': 'director', 'vp': 'director', 'chief': 'director',
+}
+
+# Level suffixes ("ML Engineer II", "Data Scientist L5"); only read at the end of a title
+LEVEL_TOKENS = {
+    'i': 'junior', 'ii': 'mid', 'iii': 'senior', 'iv': 'staff', 'v': 'principal',
+    'l3': 'junior', 'l4': 'mid', 'l5': 'senior', 'l6': 'staff', 'l7': 'principal',
+}
+
+ABBREVIATIONS = {
+    'ml': ('machine', 'learning'),
+    'mle': ('machine', 'learning', 'engineer'),
+    'dl': ('deep', 'learning'),
+    'cv': ('computer', 'vision'),
+    'swe': ('software', 'engineer'),
+    'sde': ('software', 'engineer'),
+    'eng': ('engineer',),
+    'engr': ('engineer',),
+    'mgr': ('manager',),
+    'fullstack': ('full', 'stack'),
+}
+
+# Dropped from the normalized form: employment terms, gender markers like (m/f/d), filler words
+NOISE_TOKENS = {'remote', 'hybrid', 'onsite', 'contract', 'contractor', 'freelance', 'full', 'part', 'time',
+                'fulltime', 'parttime', 'temporary', 'm', 'f', 'd', 'w', 'x', 'all', 'genders',
+                'of', 'the', 'and', 'for'}
+
+# Checked in order; the first family with a matching phrase wins
+ROLE_FAMILIES = [
+    ('mlops', ['mlops', 'llmops', 'machine learning platform', 'machine learning infrastructure',
+               'machine learning operations', 'machine learning ops', 'ai platform', 'ai infrastructure']),
+    ('research', ['research scientist', 'research engineer', 'researcher', 'applied scientist', 'research']),
+    ('data_science', ['data scientist', 'data science', 'decision scientist']),
+    ('product', ['product manager', 'product owner', 'program manager']),
+    # "AI" on its own also turns up in sales and marketing titles ("Account Executive - AI"),
+    # so it only counts next to an engineering or science noun
+    ('mle', ['machine learning', 'ai engineer', 'ai developer', 'ai scientist', 'ai architect', 'deep learning',
+             'nlp', 'computer vision', 'llm', 'prompt engineer']),
+    ('data_engineering', ['data engineer', 'analytics engineer', 'data platform', 'etl']),
+    ('analytics', ['data analyst', 'analyst', 'business intelligence']),
+    ('software', ['software engineer', 'backend', 'frontend', 'full stack', 'developer', 'engineer',
+                  'engineering', 'architect', 'devops']),
+]
+
+FAMILIES = [family for family, _ in ROLE_FAMILIES] + ['other']
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+# Where a title's team / location / employment suffix starts: "ML Engineer - Search", "... | Berlin", "... (Remote)"
+SUFFIX_PATTERN = re.compile(r"\s+[-–—|@]\s+|\s*\(|\s+at\s+")
+
+# Phrase tokens -> (priority, family), precompiled from ROLE_FAMILIES
+_PHRASES = {}
+for _priority, (_family, _phrases) in enumerate(ROLE_FAMILIES):
+    for _phrase in _phrases:
+        _PHRASES.setdefault(tuple(_phrase.split()), (_priority, _family))
+_PHRASE_LENGTHS = sorted({len(phrase) for phrase in _PHRASES}, reverse=True)
+
+
+def _tokens(text):
+    """Lowercase tokens with abbreviations expanded"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.extend(ABBREVIATIONS.get(token, (token,)))
+    return tokens
+
+
+def _family(tokens):
+    best = None
+    for length in _PHRASE_LENGTHS:
+        for start in range(len(tokens) - length + 1):
+            match = _PHRASES.get(tuple(tokens[start:start + length]))
+            if match and (best is None or match[0] < best[0]):
+                best = match
+    return best[1] if best else 'other'
+
+
+@lru_cache(maxsize=50000)
+def classify_title(title):
+    """Return the TitleClass (normalized, seniority, family) for a title string"""
+    title = str(title or '')
+    tokens = _tokens(title)
+
+    level = None
+    if tokens and tokens[-1] in LEVEL_TOKENS:
+        level = LEVEL_TOKENS[tokens[-1]]
+    for token in tokens:
+        seniority = SENIORITY_TOKENS.get(token)
+        if seniority and (level is None or SENIORITY_LEVELS.index(seniority) > SENIORITY_LEVELS.index(level)):
+            level = seniority
+
+    def role_words(words):
+        return [word for word in words
+                if word not in SENIORITY_TOKENS and word not in NOISE_TOKENS
+                and not word.isdigit() and not word.startswith('#')]
+
+    head = role_words(_tokens(SUFFIX_PATTERN.split(title, maxsplit=1)[0]))
+    if head and head[-1] in LEVEL_TOKENS:
+        head = head[:-1]
+    normalized = ' '.join(head or role_words(tokens))
+    return TitleClass(normalized, level or 'mid', _family(tokens))
+
+
+def classify_jobs(jobs):
+    """
+    Add title_normalized, seniority and role_family to every job
+    Accepts a DataFrame or a list of job dicts and returns the same kind;
+    a DataFrame gets seniority and role_family as categorical columns.
+    """
+    if not is_frame(jobs):
+        for job in jobs:
+            job['title_normalized'], job['seniority'], job['role_family'] = classify_title(job.get('title'))
+        return jobs
+
+    import pandas as pd
+    codes, titles = pd.factorize(jobs['title'].fillna('').astype(str))
+    table = pd.DataFrame([classify_title(title) for title in titles], columns=TITLE_FIELDS).take(codes)
+    return jobs.assign(
+        title_normalized=table['title_normalized'].to_numpy(),
+        seniority=pd.Categorical(table['seniority'], categories=SENIORITY_LEVELS),
+        role_family=pd.Categorical(table['role_family'], categories=FAMILIES),
+    )
+
+
+def iter_classified(jobs):
+    """Streaming classify_jobs for an iterable of job dicts"""
+    for job in jobs:
+        job['title_normalized'], job['seniority'], job['role_family'] = classify_title(job.get('title'))
+        yield job
+
+
+def title_allowed(job, seniority=None, families=None):
+    """True if a classified job dict is at one of `seniority` and in one of `families` (None or empty allows all)"""
+    if seniority and job.get('seniority') not in seniority:
+        return False
+    if families and job.get('role_family') not in families:
+        return False
+    return True
+
+
+def title_mask(jobs_df, seniority=None, families=None):
+    """Boolean Series of the classified DataFrame rows title_allowed would keep"""
+    import pandas as pd
+    mask = pd.Series(True, index=jobs_df.index)
+    if seniority:
+        mask &= jobs_df['seniority'].isin(seniority)
+    if families:
+        mask &= jobs_df['role_family'].isin(families)
+    return mask
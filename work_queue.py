@@ -0,0 +1,346 @@
+"""
+Durable local work queue for sharded scraping
+A run is split into (source, page) work units stored in a SQLite file.
+Worker processes, on this machine or any host that can open the file, lease
+a unit, fetch and parse it, and commit the job records back; the coordinator
+merges the results into what scrape_ai_jobs returns. Leases that expire (a
+crashed or stuck worker) are put back in the queue.
+
+Run extra workers against the same queue file with:
+
+    python work_queue.py worker .job_state/work_queue.sqlite
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+from checkpoint import new_run_id
+from deadline import Deadline
+from rate_limiter import CircuitBreaker
+from records import dedupe_records, to_frame
+
+# Delay before a failed unit's first retry; it doubles with each further attempt
+RETRY_BASE_SECONDS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, leased, done, failed, cancelled
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_after REAL,                           -- wall-clock time after which the unit isn't started
+    retry_at REAL,                            -- a failed unit isn't leased again before this time
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (run_id, source, page)
+)
+"""
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of (source, page) units with expiring leases
+    """
+
+    def __init__(self, path, max_attempts=3, retry_base_seconds=RETRY_BASE_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(SCHEMA)
+            columns = {row[1] for row in db.execute('PRAGMA table_info(units)')}
+            if 'retry_at' not in columns:  # Queue file from before retries were spaced out
+                db.execute('ALTER TABLE units ADD COLUMN retry_at REAL')
+
+    def _connect(self):
+        # Autocommit mode; multi-statement changes use explicit BEGIN IMMEDIATE
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def enqueue(self, run_id, units, not_after=None):
+        """
+        Add (source, page) units for a run
+        Re-queueing a run (on resume) leaves its finished units alone, gives
+        failed and cancelled ones a fresh set of attempts, and moves every
+        unfinished unit's not_after to the new one.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO units (run_id, source, page, not_after, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (run_id, source, page) DO UPDATE SET "
+                "status = CASE WHEN status = 'leased' THEN status ELSE 'pending' END, "
+                "attempts = CASE WHEN status = 'leased' THEN attempts ELSE 0 END, "
+                "not_after = excluded.not_after, retry_at = NULL, error = NULL "
+                "WHERE status != 'done'",
+                [(run_id, source, page, not_after, now) for source, page in units]
+            )
+
+    def lease(self, worker_id, lease_seconds=120):
+        """
+        Claim the oldest pending unit that is due for `lease_seconds`
+        Units whose not_after has passed are cancelled instead of handed out.
+        Returns {'id', 'run_id', 'source', 'page', 'not_after'} or None
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                self._requeue_expired(db, now)
+                db.execute(
+                    "UPDATE units SET status = 'cancelled', error = 'time budget' "
+                    "WHERE status = 'pending' AND not_after < ?",
+                    (now,)
+                )
+                row = db.execute(
+                    "SELECT id, run_id, source, page, not_after FROM units "
+                    "WHERE status = 'pending' AND (retry_at IS NULL OR retry_at <= ?) ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row:
+                    db.execute(
+                        "UPDATE units SET status = 'leased', owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1 WHERE id = ?",
+                        (worker_id, now + lease_seconds, row[0])
+                    )
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+        if not row:
+            return None
+        return dict(zip(('id', 'run_id', 'source', 'page', 'not_after'), row))
+
+    def _requeue_expired(self, db, now):
+        db.execute(
+            "UPDATE units SET status = 'failed', owner = NULL, error = 'lease expired' "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, self.max_attempts)
+        )
+        db.execute(
+            "UPDATE units SET status = 'pending', owner = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now,)
+        )
+
+    def complete(self, unit_id, worker_id, records):
+        """
+        Commit a unit's job records
+        Returns False if the lease was lost (expired and taken by another worker)
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE units SET status = 'done', result = ?, error = NULL "
+                "WHERE id = ? AND owner = ? AND status = 'leased'",
+                (json.dumps(records), unit_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, unit_id, worker_id, error):
+        """
+        Give a unit back for another attempt after an exponential backoff,
+        or mark it failed after max_attempts
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, error = ?, retry_at = ? + ? * (1 << (attempts - 1)) "
+                "WHERE id = ? AND owner = ? AND status = 'leased'",
+                (self.max_attempts, str(error), time.time(), self.retry_base_seconds, unit_id, worker_id)
+            )
+
+    def cancel(self, run_id, reason='time budget'):
+        """Stop handing out a run's pending units"""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE units SET status = 'cancelled', error = ? WHERE run_id = ? AND status = 'pending'",
+                (reason, run_id)
+            )
+
+    def counts(self, run_id):
+        """{status: number of units} for a run"""
+        with self._connect() as db:
+            self._requeue_expired(db, time.time())
+            rows = db.execute('SELECT status, COUNT(*) FROM units WHERE run_id = ? GROUP BY status', (run_id,))
+            return dict(rows.fetchall())
+
+    def units(self, run_id):
+        """All of a run's units as dicts, with decoded results"""
+        with self._connect() as db:
+            rows = db.execute(
+                'SELECT source, page, status, attempts, result, error FROM units WHERE run_id = ?', (run_id,)
+            ).fetchall()
+        return [
+            {'source': source, 'page': page, 'status': status, 'attempts': attempts,
+             'records': json.loads(result) if result else [], 'error': error}
+            for source, page, status, attempts, result, error in rows
+        ]
+
+    def has_pending(self):
+        """True if any run still has units waiting or leased"""
+        with self._connect() as db:
+            self._requeue_expired(db, time.time())
+            row = db.execute("SELECT 1 FROM units WHERE status IN ('pending', 'leased') LIMIT 1").fetchone()
+            return row is not None
+
+    def purge(self, older_than_days=7):
+        """Delete units from runs queued more than `older_than_days` ago"""
+        with self._connect() as db:
+            db.execute('DELETE FROM units WHERE created_at < ?', (time.time() - older_than_days * 86400,))
+
+
+def run_worker(queue_file, worker_id=None, lease_seconds=120, parse_cache_dir=None,
+               stop_when_idle=True, poll_interval=1.0):
+    """
+    Lease, fetch, parse and commit units until the queue is empty
+    (or forever, polling every poll_interval seconds, if stop_when_idle is off)
+    """
+    from job_scraper import SOURCES_BY_NAME, fetch_source, parse_source
+    from parse_cache import ParseCache
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    work_queue = WorkQueue(queue_file)
+    parse_cache = ParseCache(parse_cache_dir) if parse_cache_dir else None
+
+    while True:
+        unit = work_queue.lease(worker_id, lease_seconds)
+        if unit is None:
+            if stop_when_idle and not work_queue.has_pending():
+                return
+            time.sleep(poll_interval)
+            continue
+
+        source = SOURCES_BY_NAME.get(unit['source'])
+        if source is None:
+            work_queue.fail(unit['id'], worker_id, f"unknown source {unit['source']}")
+            continue
+        deadline = Deadline(unit['not_after'] - time.time()) if unit['not_after'] else None
+        try:
+            print(f"[{worker_id}] Scraping {unit['source']} page {unit['page']}...")
+            content = fetch_source(source, deadline=deadline)
+            jobs_data = parse_source(source, content, source['max_jobs'], parse_cache=parse_cache)
+        except Exception as e:
+            print(f"[{worker_id}] Error scraping {unit['source']}: {e}")
+            work_queue.fail(unit['id'], worker_id, e)
+            continue
+        if not work_queue.complete(unit['id'], worker_id, jobs_data):
+            print(f"[{worker_id}] Lease on {unit['source']} expired, result discarded")
+
+
+def scrape_distributed(queue_file, workers=2, run_id=None, lease_seconds=120, circuit_state_file=None,
+                       deadline=None, skipped_sources=None, parse_cache=None, as_records=False):
+    """
+    Coordinator: queue one unit per source page, start `workers` local worker
+    processes, wait for the units to finish and merge the results
+
+    Returns the same jobs scrape_ai_jobs would (a DataFrame, or a list of
+    dicts if as_records is set). Workers on other hosts can help by running
+    run_worker against the same queue file. Re-running with the same run_id
+    (e.g. on --resume) only scrapes the units that didn't finish. Workers
+    share `parse_cache`'s directory; it is pruned once the run is merged.
+    """
+    from job_scraper import SOURCES, create_sample_data
+
+    work_queue = WorkQueue(queue_file)
+    work_queue.purge()
+    run_id = run_id or new_run_id()
+    breaker = CircuitBreaker(state_file=circuit_state_file)
+    deadline = deadline or Deadline()
+    if skipped_sources is None:
+        skipped_sources = []
+
+    print("\n" + "=" * 60)
+    print(f"STARTING DISTRIBUTED JOB SCRAPER ({workers} workers)")
+    print("=" * 60 + "\n")
+
+    units = []
+    for source in SOURCES:
+        if breaker.allow(source['name']):
+            units.append((source['name'], 1))
+        else:
+            print(f"{source['name']}: skipped (circuit open after repeated failures)")
+            skipped_sources.append((source['name'], 'repeated failures'))
+    remaining = deadline.remaining()
+    work_queue.enqueue(run_id, units, not_after=time.time() + remaining if remaining is not None else None)
+
+    # Spawned, not forked: this process may have scheduler, daemon or SMTP
+    # threads whose held locks a forked worker would inherit
+    spawn = multiprocessing.get_context('spawn')
+    processes = [
+        spawn.Process(target=run_worker, args=(queue_file,),
+                      kwargs={'lease_seconds': lease_seconds,
+                              'parse_cache_dir': parse_cache.directory if parse_cache else None},
+                      daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    while True:
+        counts = work_queue.counts(run_id)
+        if not counts.get('pending') and not counts.get('leased'):
+            break
+        if deadline.expired():
+            print("Scrape time budget used up, cancelling unfinished units")
+            work_queue.cancel(run_id)
+            break
+        time.sleep(0.2)
+
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+
+    # Merge in SOURCES order so output matches scrape_ai_jobs
+    all_jobs = []
+    by_source = {}
+    for unit in work_queue.units(run_id):
+        by_source.setdefault(unit['source'], []).append(unit)
+    for source in SOURCES:
+        name = source['name']
+        source_units = sorted(by_source.get(name, []), key=lambda unit: unit['page'])
+        for unit in source_units:
+            if unit['status'] == 'done':
+                breaker.record_success(name)
+                all_jobs.extend(unit['records'])
+                print(f"Added {len(unit['records'])} jobs from {name} page {unit['page']}")
+            elif unit['status'] == 'failed':
+                for _ in range(unit['attempts']):
+                    breaker.record_failure(name)
+                print(f"{name} page {unit['page']} failed: {unit['error']}")
+                skipped_sources.append((name, 'repeated failures'))
+            else:
+                skipped_sources.append((name, 'time budget'))
+    print()
+    breaker.end_run()
+    if parse_cache is not None:
+        parse_cache.prune()
+
+    # If no jobs found from any source, use sample data
+    if not all_jobs:
+        print("No jobs scraped from any source!")
+        print("Using sample data for demonstration...\n")
+        all_jobs = create_sample_data(as_records=True)
+
+    all_jobs = dedupe_records(all_jobs, subset=('title', 'company'))
+    return all_jobs if as_records else to_frame(all_jobs)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == 'worker':
+        run_worker(sys.argv[2], stop_when_idle='--forever' not in sys.argv)
+    else:
+        print("Usage: python work_queue.py worker <queue file> [--forever]")
+        sys.exit(1)